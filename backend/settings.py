@@ -76,15 +76,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # first, so its timing covers the rest
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilerMiddleware',  # after auth, so session staff are known
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -195,6 +198,80 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 25,
 }
 
+# Outbound HTTP to OFF/FDC (core/services/upstream.py). Timeouts in seconds.
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF_FACTOR = float(os.getenv("UPSTREAM_BACKOFF_FACTOR", "0.3"))
+UPSTREAM_BACKOFF_JITTER = float(os.getenv("UPSTREAM_BACKOFF_JITTER", "0.3"))
+UPSTREAM_MAX_IN_FLIGHT = int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "10"))  # per host
+UPSTREAM_ASYNC_MAX_IN_FLIGHT = int(os.getenv("UPSTREAM_ASYNC_MAX_IN_FLIGHT", "200"))  # per host and event loop
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+UPSTREAM_USER_AGENT = os.getenv("UPSTREAM_USER_AGENT", "TrainerTracker/1.0")
+
+# API roots for Open Food Facts and FoodData Central. Point them at `manage.py upstream_replay`
+# to record real responses as fixtures, or replay those with injected latency and failures.
+OFF_BASE_URL = os.getenv("OFF_BASE_URL", "https://world.openfoodfacts.org")
+FDC_BASE_URL = os.getenv("FDC_BASE_URL", "https://api.nal.usda.gov/fdc/v1/")
+
+# Caches. "upstream" holds FDC search/detail payloads; point UPSTREAM_CACHE_URL at a
+# shared Redis (maxmemory-policy allkeys-lru, needs the `redis` package) so every
+# worker shares it. Without it each process gets a bounded LRU LocMemCache.
+UPSTREAM_CACHE_URL = os.getenv("UPSTREAM_CACHE_URL")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "upstream": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": UPSTREAM_CACHE_URL,
+        "KEY_PREFIX": "upstream",
+    } if UPSTREAM_CACHE_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "upstream",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("UPSTREAM_CACHE_MAX_ENTRIES", "5000"))},
+    },
+}
+
+# FoodData Central response cache (seconds).
+FDC_SEARCH_CACHE_TTL = int(os.getenv("FDC_SEARCH_CACHE_TTL", str(60 * 60)))
+FDC_DETAIL_CACHE_TTL = int(os.getenv("FDC_DETAIL_CACHE_TTL", str(60 * 60 * 24)))
+
+# Open Food Facts lookup cache (seconds). "status: 0" not-found results expire sooner
+# so products added upstream show up without waiting a full TTL.
+OFF_CACHE_TTL = int(os.getenv("OFF_CACHE_TTL", str(60 * 60 * 24 * 7)))
+OFF_CACHE_NEGATIVE_TTL = int(os.getenv("OFF_CACHE_NEGATIVE_TTL", str(60 * 60 * 6)))
+
+# Longest wait (seconds) for a concurrent import of the same barcode / fdc_id to finish.
+IMPORT_LOCK_TIMEOUT = float(os.getenv("IMPORT_LOCK_TIMEOUT", "30"))
+
+# Serve OFF/FDC-bound endpoints from core/async_views.py; backend/asgi.py defaults this on.
+ASYNC_UPSTREAM_VIEWS = env_bool("ASYNC_UPSTREAM_VIEWS", "False")
+
+# GET /api/foods/search?mode=local: below this many catalog hits we also ask FDC.
+FOOD_SEARCH_MIN_LOCAL_RESULTS = int(os.getenv("FOOD_SEARCH_MIN_LOCAL_RESULTS", "5"))
+
+# POST /api/foods/import/barcodes/: max codes per request and concurrent OFF fetches.
+OFF_BULK_IMPORT_MAX = int(os.getenv("OFF_BULK_IMPORT_MAX", "500"))
+OFF_BULK_IMPORT_WORKERS = int(os.getenv("OFF_BULK_IMPORT_WORKERS", "8"))
+
+# POST /api/meals/batch/: max entries per request.
+MEAL_BATCH_MAX = int(os.getenv("MEAL_BATCH_MAX", "200"))
+
+# GET /api/meals/trends: longest start..end span, in days.
+MEAL_TRENDS_MAX_DAYS = int(os.getenv("MEAL_TRENDS_MAX_DAYS", "731"))
+
+# Request metrics (core/metrics.py): Server-Timing header on every response, and the
+# bearer token Prometheus sends to GET /api/metrics (staff sessions can read it too).
+SERVER_TIMING = env_bool("SERVER_TIMING", "True")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Request profiling (core/profiling.py): where .prof files go, how many to keep, and the
+# fraction of all requests profiled at random (e.g. 0.001); staff can always ask with ?profile=1.
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
 CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SECURE = True
 SECURE_BROWSER_XSS_FILTER = True
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
+from .models import TrainerClient
+
 # Register your models here.
+
+
+@admin.register(TrainerClient)
+class TrainerClientAdmin(admin.ModelAdmin):
+    list_display = ("trainer", "client", "created_at")
+    raw_id_fields = ("trainer", "client")
+    search_fields = ("trainer__username", "client__username")
@@ -0,0 +1,194 @@
+"""
+Async versions of the endpoints that wait on OFF/FDC, for ASGI deployments.
+
+core/urls.py routes these in front of the DRF views when settings.ASYNC_UPSTREAM_VIEWS
+is on (backend/asgi.py turns it on), so a worker awaits the upstream round trip
+instead of blocking a thread on it. URLs, permissions and response bodies match the
+sync views in views.py, which stay in place for WSGI deployments. DRF views can't be
+async, so authentication, permission checks and JSON rendering are done here with
+DRF's own classes; ORM work runs in sync_to_async.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import path, re_path
+from rest_framework import exceptions, status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import Food
+from .serializers import FoodSerializer
+from .services import fdc, off, singleflight
+from .services import search as catalog_search
+from .views import _checked_fdc_details, _create_off_food, _upsert_fdc_food
+
+
+def _render(data, status_code, headers=None):
+    response = HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def _authorize(request, permission_classes) -> Request:
+    """DRF authentication + permission checks for a plain Django request (runs in a thread: may hit the DB)."""
+    drf_request = Request(request, authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    for permission in permission_classes:
+        if not permission().has_permission(drf_request, None):
+            if drf_request.authenticators and not drf_request.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+    return drf_request
+
+
+def _error_response(exc: exceptions.APIException, request: Request | None):
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # same 401-vs-403 rule as APIView.handle_exception
+        authenticators = [cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        header = authenticators[0].authenticate_header(request) if authenticators else None
+        if header:
+            headers["WWW-Authenticate"] = header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    return _render(data, exc.status_code, headers)
+
+
+def async_api_view(methods, permission_classes=(IsAuthenticated,)):
+    """Decorate `async def handler(request, ...) -> (data, status)` into an async Django view."""
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in methods:
+                return _render({"detail": f'Method "{request.method}" not allowed.'},
+                               status.HTTP_405_METHOD_NOT_ALLOWED, {"Allow": ", ".join(methods)})
+            drf_request = None
+            try:
+                drf_request = await sync_to_async(_authorize)(request, permission_classes)
+                data, status_code = await handler(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _error_response(exc, drf_request)
+            return _render(data, status_code)
+
+        # django.views.decorators.csrf.csrf_exempt turns async views sync on Django 4.2;
+        # SessionAuthentication enforces CSRF itself, as for DRF views
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+@async_api_view(["GET"], permission_classes=[AllowAny])
+async def food_search(request):
+    query = request.query_params.get('q')
+    if not query:
+        return {'error': 'Missing query param q'}, 400
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 200)
+    except ValueError:
+        return {'error': 'page and page_size must be integers'}, 400
+    if request.query_params.get('mode') == 'local':
+        try:
+            foods, source = await catalog_search.asearch_catalog(query, limit=page_size)
+        except Exception as e:
+            return {'detail': str(e)}, 502
+        return {'source': source, 'results': FoodSerializer(foods, many=True).data}, 200
+    try:
+        results = await fdc.asearch_foods(query, page_number=page, page_size=page_size)
+    except Exception as e:
+        return {'detail': str(e)}, 502
+    return results, 200
+
+
+@async_api_view(["GET"])
+async def fdc_detail(request, fdc_id=None):
+    if not fdc_id:
+        return {'error': 'Missing fdc_id'}, 400
+    return await fdc.aget_food_details(fdc_id), 200
+
+
+@async_api_view(["GET"], permission_classes=[AllowAny])
+async def barcode_lookup(request, code=None):
+    code = off.normalize_barcode(code)
+    if not code:
+        return {'error': 'Missing barcode'}, 400
+    try:
+        product = await off.alookup_barcode_cached(code)
+    except Exception as e:
+        return {'detail': str(e)}, 502
+    return product, 200
+
+
+@async_api_view(["POST"])
+async def import_fdc(request, fdc_id=None):
+    if not fdc_id:
+        return {'detail': 'Missing fdc_id'}, 400
+    try:
+        async with singleflight.asingle_flight('fdc-import', fdc_id) as waited:
+            if waited:
+                food = await Food.objects.select_related('nutrients').filter(fdc_id=str(fdc_id)).afirst()
+                if food is not None:
+                    return FoodSerializer(food).data, 200
+            try:
+                fdc_data = _checked_fdc_details(await fdc.aget_food_details(fdc_id))
+            except ValueError as e:
+                return {'detail': str(e)}, 404
+            except Exception as e:
+                return {'detail': str(e)}, 502
+
+            @sync_to_async
+            def save():
+                food = _upsert_fdc_food(fdc_data, *fdc.parse_food_payload(fdc_data))
+                return FoodSerializer(food).data
+
+            return await save(), 200
+    except singleflight.ImportBusy as e:
+        return {'detail': str(e)}, 503
+
+
+@async_api_view(["POST"])
+async def import_food_by_barcode(request, code: str):
+    # same barcode handling as views.import_food_by_barcode
+    submitted, code = code, off.normalize_barcode(code)
+    if not code:
+        return {"detail": "Not a barcode"}, 400
+    existing = await Food.objects.select_related("nutrients").filter(barcode__in={submitted, code}).afirst()
+    if existing:
+        return FoodSerializer(existing).data, 200
+
+    try:
+        async with singleflight.asingle_flight("off-import", code):
+            existing = await Food.objects.select_related("nutrients").filter(barcode__in={submitted, code}).afirst()
+            if existing:
+                return FoodSerializer(existing).data, 200
+            try:
+                raw = await off.alookup_barcode_cached(code)
+            except Exception as e:
+                return {"detail": f"Lookup failed: {e}"}, 502
+
+            @sync_to_async
+            def save():
+                food, created = _create_off_food(code, raw)
+                return (FoodSerializer(food).data if food is not None else None), created
+
+            data, created = await save()
+    except singleflight.ImportBusy as e:
+        return {"detail": str(e)}, 503
+
+    if data is None:
+        return {"detail": "Product not found"}, 404
+    return data, 201 if created else 200
+
+
+# Same paths as the router/function routes in urls.py (router.trailing_slash = '/?')
+urlpatterns = [
+    re_path(r'^foods/search/?$', food_search),
+    re_path(r'^foods/fdc/(?P<fdc_id>[^/.]+)/?$', fdc_detail),
+    re_path(r'^foods/barcode/(?P<code>[^/]+)/?$', barcode_lookup),
+    re_path(r'^foods/import/fdc/(?P<fdc_id>[^/.]+)/?$', import_fdc),
+    path("foods/import/barcode/<str:code>/", import_food_by_barcode),
+]
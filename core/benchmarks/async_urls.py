@@ -0,0 +1,8 @@
+"""Root URLconf with the async upstream views mounted whatever ASYNC_UPSTREAM_VIEWS says (benchmarks, tests)."""
+from django.urls import include, path
+
+from core.urls import async_urlpatterns
+
+urlpatterns = [
+    path("api/", include(async_urlpatterns)),
+]
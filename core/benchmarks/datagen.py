@@ -0,0 +1,93 @@
+# core/benchmarks/datagen.py
+"""
+Seeded synthetic data for the benchmark suite: N users x D days x E meal entries
+over a catalog of F foods. The same arguments always produce the same rows, so
+results from different runs (and commits) are comparable. Everything it creates is
+marked (username prefix, data_source) and `clear()` removes it by that marker.
+"""
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_tz
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from ..models import MealEntry, Nutrients
+from ..services import catalog
+
+USERNAME_PREFIX = "benchgen-"
+DATA_SOURCE = "BENCHGEN"
+# where the suite's import scenarios start numbering codes; codes already in use are skipped
+IMPORT_BARCODE_PREFIX = "2999"
+IMPORT_FDC_PREFIX = "99"
+END_DATE = date(2024, 6, 30)  # last generated day; fixed so the data doesn't drift with the clock
+
+WORDS = (
+    "chicken", "breast", "thigh", "greek", "yogurt", "plain", "peanut", "butter", "crunchy", "oat",
+    "rolled", "banana", "brown", "rice", "salmon", "fillet", "egg", "whole", "protein", "bar",
+    "almond", "milk", "cheddar", "cheese", "turkey", "ham", "sliced", "bread", "wheat", "apple",
+)
+BRANDS = ("Acme", "Nutty Co", "Tyson", "Fage", "Quaker", None)
+QUANTITIES = (15, 30, 50, 80, 100, 125, 150, 200, 250, 300)
+
+
+def clear():
+    """
+    Delete every generated user (their entries and rollups cascade) and generated food,
+    found by the DATA_SOURCE marker only. Foods the suite imports are real-looking
+    OFF/FDC rows; suite.run() deletes those by primary key.
+    """
+    with transaction.atomic():
+        get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        # through the owning side: deleting a Nutrients row cascades to its Food, not the reverse
+        Nutrients.objects.filter(food__data_source=DATA_SOURCE).delete()
+
+
+def _foods(rng, count):
+    items = []
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 4))).capitalize()
+        items.append((
+            {"name": name, "brand": rng.choice(BRANDS), "data_source": DATA_SOURCE,
+             "fdc_id": f"benchgen-{i}", "barcode": f"2000{i:09d}"},
+            {"calories": round(rng.uniform(20, 600), 1), "protein": round(rng.uniform(0, 40), 1),
+             "carbs": round(rng.uniform(0, 80), 1), "fat": round(rng.uniform(0, 40), 1),
+             # sparse like real catalog data
+             "fiber": round(rng.uniform(0, 12), 1) if rng.random() < 0.7 else None,
+             "sugar": round(rng.uniform(0, 30), 1) if rng.random() < 0.7 else None,
+             "sodium": round(rng.uniform(0, 900), 0) if rng.random() < 0.8 else None},
+        ))
+    return catalog.bulk_create_foods(items)
+
+
+def generate(users=20, days=90, entries=5, foods=2000, seed=0, end=END_DATE) -> dict:
+    """
+    Replace any previous generated data with users x days x entries meal entries over
+    `foods` catalog foods. Returns {"users", "foods", "start", "end"} (user and food ids).
+    """
+    rng = random.Random(seed)
+    clear()
+    food_rows = _foods(rng, foods)
+    User = get_user_model()
+    user_rows = User.objects.bulk_create([User(username=f"{USERNAME_PREFIX}{i}") for i in range(users)])
+    start = end - timedelta(days=days - 1)
+
+    batch = []
+    for user in user_rows:
+        # people log the same handful of foods over and over
+        favourites = rng.sample(food_rows, min(len(food_rows), 40))
+        for d in range(days):
+            day_start = datetime.combine(start + timedelta(days=d), time(6), tzinfo=dt_tz.utc)
+            for _ in range(entries):
+                food = rng.choice(favourites) if rng.random() < 0.8 else rng.choice(food_rows)
+                quantity = rng.choice(QUANTITIES)
+                batch.append(MealEntry(
+                    user=user, food=food, quantity=quantity,
+                    meal_time=day_start + timedelta(minutes=rng.randrange(16 * 60)),
+                    notes=None if rng.random() < 0.8 else "bench",
+                    **MealEntry.totals_for(food, quantity),
+                ))
+                if len(batch) == 5000:
+                    MealEntry.objects.bulk_create(batch)
+                    batch = []
+    MealEntry.objects.bulk_create(batch)
+    return {"users": [u.pk for u in user_rows], "foods": [f.pk for f in food_rows], "start": start, "end": end}
@@ -0,0 +1,234 @@
+# core/benchmarks/replay.py
+"""
+Record/replay stand-in for one upstream (OFF or FDC), served over local HTTP so the
+app's real clients -- connection pools, in-flight caps, timeouts and retries in
+services/upstream.py and aupstream.py -- are what gets exercised.
+
+Point settings.OFF_BASE_URL / FDC_BASE_URL at a ReplayUpstream (see the
+upstream_replay command). In "record" mode it proxies each GET to the real API and
+saves the response as a JSON fixture; in "replay" mode it answers from those
+fixtures, after a delay drawn from a latency distribution and with configurable
+rates of stalls (client read timeouts), 429s and 5xx. FDC api_key query params are
+neither part of the fixture key nor written to disk.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+from .stub_server import _Server
+
+SECRET_PARAMS = ("api_key",)
+SERVER_ERRORS = (500, 502, 503, 504)
+
+
+def parse_latency(spec: str):
+    """
+    Latency distribution spec -> callable(rng, recorded_seconds) -> seconds:
+    fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | recorded[:SCALE]
+    (the recorded upstream time, optionally scaled). Negative draws clamp to 0.
+    """
+    kind, _, args = (spec or "fixed:0").partition(":")
+    try:
+        values = [float(a) for a in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Bad latency spec {spec!r}")
+    shapes = {
+        "fixed": (1, lambda rng, rec, s: s),
+        "uniform": (2, lambda rng, rec, lo, hi: rng.uniform(lo, hi)),
+        "normal": (2, lambda rng, rec, mu, sd: rng.gauss(mu, sd)),
+        "lognormal": (2, lambda rng, rec, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        "recorded": (1, lambda rng, rec, scale: rec * scale),
+    }
+    if kind == "recorded" and not values:
+        values = [1.0]
+    if kind not in shapes or len(values) != shapes[kind][0]:
+        raise ValueError(f"Bad latency spec {spec!r}; expected one of "
+                         "fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MEDIAN,SIGMA, recorded[:SCALE]")
+    draw = shapes[kind][1]
+    return lambda rng, recorded: max(draw(rng, recorded, *values), 0.0)
+
+
+class Faults:
+    """What replayed responses suffer: a latency distribution and failure rates (0..1 each)."""
+
+    def __init__(self, latency="fixed:0", timeout_rate=0.0, throttle_rate=0.0, error_rate=0.0,
+                 stall=30.0, retry_after=1, seed=None):
+        self.latency = parse_latency(latency)
+        self.timeout_rate, self.throttle_rate, self.error_rate = timeout_rate, throttle_rate, error_rate
+        self.stall = stall  # seconds a "timeout" response hangs before the connection is dropped
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self, recorded: float):
+        """((fault, 5xx status), delay seconds) for one request; fault is "timeout", "throttle", "error" or None."""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency(self._rng, recorded)
+            status = self._rng.choice(SERVER_ERRORS)
+        for fault, rate in (("timeout", self.timeout_rate), ("throttle", self.throttle_rate),
+                            ("error", self.error_rate)):
+            if roll < rate:
+                return (fault, status), delay
+            roll -= rate
+        return (None, None), delay
+
+
+class FixtureStore:
+    """One JSON file per (path, query) under root/name/, named <last path segment>-<hash>.json."""
+
+    def __init__(self, root, name: str):
+        self.dir = Path(root) / name
+
+    @staticmethod
+    def _query(query: str) -> list:
+        return sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in SECRET_PARAMS)
+
+    def path_for(self, path: str, query: str) -> Path:
+        canonical = path + "?" + urlencode(self._query(query))
+        digest = hashlib.sha1(canonical.encode()).hexdigest()[:16]
+        slug = re.sub(r"[^A-Za-z0-9._]+", "_", path.rstrip("/").rsplit("/", 1)[-1])[:48] or "root"
+        return self.dir / f"{slug}-{digest}.json"
+
+    def load(self, path: str, query: str):
+        try:
+            return json.loads(self.path_for(path, query).read_text())
+        except FileNotFoundError:
+            return None
+
+    def save(self, path: str, query: str, response: requests.Response, elapsed: float) -> dict:
+        content_type = response.headers.get("Content-Type", "application/json")
+        try:
+            body = {"json": response.json()}
+        except ValueError:
+            body = {"text": response.text}
+        fixture = {
+            "path": path, "query": dict(self._query(query)), "status": response.status_code,
+            "content_type": content_type, "elapsed": round(elapsed, 4), **body,
+        }
+        target = self.path_for(path, query)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(fixture, indent=1, sort_keys=True) + "\n")
+        return fixture
+
+
+class ReplayUpstream:
+    """
+    Local HTTP server for one upstream. mode="record" needs `upstream_base` (the real
+    API root, e.g. https://api.nal.usda.gov/fdc/v1); mode="replay" serves fixtures
+    with `faults` applied. Use as a context manager, like StubUpstream.
+    """
+
+    def __init__(self, fixtures, name: str, mode: str = "replay", upstream_base: str = "",
+                 faults: Faults | None = None, host: str = "127.0.0.1", port: int = 0, record_timeout=(3.05, 30)):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        if mode == "record" and not upstream_base:
+            raise ValueError("record mode needs the upstream base URL")
+        self.store = FixtureStore(fixtures, name)
+        self.mode = mode
+        self.upstream_base = upstream_base.rstrip("/")
+        self.faults = faults or Faults()
+        self.record_timeout = record_timeout
+        self.stats = dict.fromkeys(("requests", "recorded", "served", "misses", "timeout", "throttle", "error"), 0)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _record(self, path, query):
+        t0 = time.perf_counter()
+        response = requests.get(f"{self.upstream_base}{path}", params=parse_qsl(query, keep_blank_values=True),
+                                timeout=self.record_timeout)
+        fixture = self.store.save(path, query, response, time.perf_counter() - t0)
+        self._count("recorded")
+        return fixture
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _send(self, status, body: bytes, content_type="application/json", headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                upstream._count("requests")
+                parts = urlsplit(self.path)
+                if upstream.mode == "record":
+                    try:
+                        fixture = upstream._record(parts.path, parts.query)
+                    except requests.RequestException as e:
+                        return self._send(502, json.dumps({"error": f"record failed: {e}"}).encode())
+                    return self._reply(fixture)
+
+                fixture = upstream.store.load(parts.path, parts.query)
+                (fault, status), delay = upstream.faults.draw(fixture["elapsed"] if fixture else 0.0)
+                if fault == "timeout":
+                    upstream._count("timeout")
+                    time.sleep(upstream.faults.stall)
+                    self.close_connection = True  # hang up without a response
+                    return
+                if delay:
+                    time.sleep(delay)
+                if fault == "throttle":
+                    upstream._count("throttle")
+                    return self._send(429, b'{"error": "rate limited (injected)"}',
+                                      headers=[("Retry-After", str(upstream.faults.retry_after))])
+                if fault == "error":
+                    upstream._count("error")
+                    return self._send(status, b'{"error": "upstream error (injected)"}')
+                if fixture is None:
+                    upstream._count("misses")
+                    return self._send(404, json.dumps({"error": "no recorded response", "path": self.path}).encode())
+                upstream._count("served")
+                self._reply(fixture)
+
+            def _reply(self, fixture):
+                if "json" in fixture:
+                    body = json.dumps(fixture["json"]).encode()
+                else:
+                    body = fixture.get("text", "").encode()
+                self._send(fixture["status"], body, fixture.get("content_type", "application/json"))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self, poll_interval=0.05):
+        # short poll: shutdown() waits up to one interval
+        self._server.serve_forever(poll_interval)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
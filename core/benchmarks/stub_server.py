@@ -0,0 +1,78 @@
+# core/benchmarks/stub_server.py
+"""
+Local stand-in for OFF/FDC used by the benchmarks and tests: a threaded HTTP/1.1
+server (keep-alive capable) that answers every GET with a small JSON body after
+an optional delay, optionally failing the first few requests with a given status.
+`body` is a JSON-able dict, or a callable(path) -> dict for per-request bodies.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 512  # listen backlog: load tests open hundreds of connections at once
+
+
+DEFAULT_BODY = {"status": 1, "product": {"product_name": "Stub Bar", "nutriments": {"energy-kcal_100g": 100}}}
+
+
+class StubUpstream:
+    def __init__(self, body=None, latency: float = 0.0, fail_first: int = 0, fail_status: int = 503):
+        self.body = body if callable(body) else json.dumps(DEFAULT_BODY if body is None else body).encode()
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _body(self, path: str) -> bytes:
+        return json.dumps(self.body(path)).encode() if callable(self.body) else self.body
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = b'{"error": "stub failure"}' if failing else stub._body(self.path)
+                self.send_response(stub.fail_status if failing else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,224 @@
+# core/benchmarks/suite.py
+"""
+Offline latency / query-count benchmarks for the hot endpoints, run in-process
+through the test client against a datagen.generate() dataset. OFF/FDC are served by
+a local StubUpstream, so no scenario touches the network. Each scenario reports
+p50/p95/mean wall time and the median number of SQL queries per request.
+"""
+import random
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import date, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..models import BarcodeLookup, DailyTotals, Food, Nutrients
+from ..services import fdc, meals, off
+from . import datagen
+from .stub_server import DEFAULT_BODY, StubUpstream
+
+SEARCH_QUERIES = ("chicken breast", "greek yogurt", "peanut butter", "oat", "banana", "brown rice", "salmon", "egg")
+
+
+def _fdc_body(path):
+    # food/<id> details for imports, a small page for searches
+    fdc_id = path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+    if not fdc_id.isdigit():
+        return {"foods": [], "totalHits": 0}
+    return {
+        "fdcId": int(fdc_id), "description": f"Stub food {fdc_id}", "brandOwner": "Stub",
+        "foodNutrients": [
+            {"nutrient": {"number": "208", "name": "Energy", "unitName": "kcal"}, "amount": 120},
+            {"nutrient": {"number": "203", "name": "Protein", "unitName": "g"}, "amount": 4.5},
+        ],
+    }
+
+
+class Context:
+    """What scenarios need: a logged-in client per user, the dataset and a seeded rng."""
+
+    def __init__(self, dataset, seed):
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+        users = get_user_model().objects.in_bulk(dataset["users"])
+        self.clients = []
+        for pk in dataset["users"]:
+            client = APIClient()
+            client.force_authenticate(user=users[pk])
+            self.clients.append(client)
+        self.days = (dataset["end"] - dataset["start"]).days + 1
+        self.imports = 0
+        self.target = None  # (client index, day) or import code picked by a scenario's setup
+        # what the import scenarios created, so cleanup removes exactly that
+        self.created_foods = []
+        self.created_lookups = []
+
+    def client(self):
+        return self.clients[self.rng.randrange(len(self.clients))]
+
+    def day(self):
+        return (self.dataset["start"] + timedelta(days=self.rng.randrange(self.days))).isoformat()
+
+    def next_import(self, make_code, taken):
+        """The next code from make_code(n) that `taken(code)` doesn't report as already in use."""
+        while True:
+            self.imports += 1
+            code = make_code(self.imports)
+            if not taken(code):
+                return code
+
+
+def _meals_list(ctx):
+    return ctx.client().get("/api/meals/")
+
+
+def _meals_list_cursor(ctx):
+    return ctx.client().get("/api/meals/", {"mode": "cursor"})
+
+
+def _meals_list_day(ctx):
+    return ctx.client().get("/api/meals/", {"date": ctx.day(), "tz": "America/New_York"})
+
+
+def _materialized_day(ctx):
+    ctx.target = ctx.rng.randrange(len(ctx.clients)), ctx.day()
+    user_id = ctx.dataset["users"][ctx.target[0]]
+    meals.get_daily_totals(get_user_model()(pk=user_id), date.fromisoformat(ctx.target[1]), ZoneInfo("UTC"))
+
+
+def _unmaterialized_day(ctx):
+    ctx.target = ctx.rng.randrange(len(ctx.clients)), ctx.day()
+    DailyTotals.objects.filter(user_id=ctx.dataset["users"][ctx.target[0]]).delete()
+
+
+def _summary(ctx):
+    index, day = ctx.target
+    return ctx.clients[index].get("/api/meals/summary", {"date": day, "tz": "UTC"})
+
+
+def _trends(ctx):
+    end = ctx.dataset["end"]
+    return ctx.client().get("/api/meals/trends", {
+        "start": (end - timedelta(days=29)).isoformat(), "end": end.isoformat(), "tz": "UTC",
+    })
+
+
+def _search_local(ctx):
+    return ctx.client().get("/api/foods/search", {"q": ctx.rng.choice(SEARCH_QUERIES), "mode": "local"})
+
+
+def _clear_upstream_cache(ctx):
+    caches[fdc.CACHE_ALIAS].clear()
+
+
+def _search_fdc(ctx):
+    return ctx.client().get("/api/foods/search", {"q": ctx.rng.choice(SEARCH_QUERIES)})
+
+
+def _fresh_barcode(ctx):
+    # never a barcode the catalog or the OFF cache already has: the stub's payload would replace it
+    _clear_upstream_cache(ctx)
+    ctx.target = ctx.next_import(
+        lambda n: f"{datagen.IMPORT_BARCODE_PREFIX}{n:09d}",
+        lambda code: Food.objects.filter(barcode=code).exists() or BarcodeLookup.objects.filter(barcode=code).exists(),
+    )
+
+
+def _fresh_fdc_id(ctx):
+    # never an fdc_id the catalog has: importing it would overwrite the real row with stub data
+    _clear_upstream_cache(ctx)
+    ctx.target = ctx.next_import(
+        lambda n: f"{datagen.IMPORT_FDC_PREFIX}{n:07d}", lambda code: Food.objects.filter(fdc_id=code).exists(),
+    )
+
+
+def _import_barcode(ctx):
+    response = ctx.client().post(f"/api/foods/import/barcode/{ctx.target}/")
+    ctx.created_lookups.append(ctx.target)
+    if response.status_code == 201:
+        ctx.created_foods.append(response.json()["id"])
+    return response
+
+
+def _import_fdc(ctx):
+    response = ctx.client().post(f"/api/foods/import/fdc/{ctx.target}/")
+    if response.status_code == 200:
+        ctx.created_foods.append(response.json()["id"])
+    return response
+
+
+# name -> (setup(ctx) run untimed before each request, request(ctx) -> response, expected status)
+SCENARIOS = {
+    "meals_list": (None, _meals_list, 200),
+    "meals_list_cursor": (None, _meals_list_cursor, 200),
+    "meals_list_day": (None, _meals_list_day, 200),
+    "meals_summary": (_materialized_day, _summary, 200),
+    "meals_summary_cold": (_unmaterialized_day, _summary, 200),
+    "meals_trends_30d": (None, _trends, 200),
+    "food_search_local": (None, _search_local, 200),
+    "food_search_fdc": (_clear_upstream_cache, _search_fdc, 200),
+    "import_barcode": (_fresh_barcode, _import_barcode, 201),
+    "import_fdc": (_fresh_fdc_id, _import_fdc, 200),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(int(round(len(sorted_values) * pct / 100.0)) - 1, 0)]
+
+
+def run_scenario(ctx, setup, request, expected, iterations, warmup=2):
+    timings, queries = [], []
+    for i in range(warmup + iterations):
+        if setup is not None:
+            setup(ctx)
+        with CaptureQueriesContext(connection) as captured:
+            t0 = time.perf_counter()
+            response = request(ctx)
+            elapsed = (time.perf_counter() - t0) * 1000
+        if response.status_code != expected:
+            raise AssertionError(f"expected {expected}, got {response.status_code}: {response.content[:200]!r}")
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(len(captured.captured_queries))
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "queries": statistics.median_low(queries),
+    }
+
+
+def run(dataset, iterations=30, scenarios=None, seed=0, upstream_latency=0.0):
+    """Run `scenarios` (default: all) against `dataset`; returns {name: result}."""
+    names = scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    ctx = Context(dataset, seed)
+
+    def body(path):
+        return _fdc_body(path) if "/fdc/" in path else DEFAULT_BODY
+
+    results = {}
+    try:
+        with StubUpstream(body=body, latency=upstream_latency) as stub, ExitStack() as stack:
+            stack.enter_context(patch.object(fdc, "FDC_BASE", stub.url + "/fdc/"))
+            stack.enter_context(patch.object(fdc, "FDC_API_KEY", "bench"))
+            stack.enter_context(patch.object(off, "_product_url", lambda code: f"{stub.url}/off/{code}.json"))
+            for name in names:
+                setup, request, expected = SCENARIOS[name]
+                results[name] = run_scenario(ctx, setup, request, expected, iterations)
+    finally:
+        Nutrients.objects.filter(food__pk__in=ctx.created_foods).delete()  # cascades to the foods
+        BarcodeLookup.objects.filter(barcode__in=ctx.created_lookups).delete()
+    return results
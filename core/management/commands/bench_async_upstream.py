@@ -0,0 +1,67 @@
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.benchmarks.stub_server import StubUpstream
+from core.services import aupstream, fdc
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test GET /api/foods/search through the ASGI app against a stub FDC with injected "
+        "latency: sync DRF view vs its async version, same concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, dest="count")
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.2, help="Stub upstream delay per request, seconds.")
+
+    def handle(self, *args, count=200, concurrency=100, latency=0.2, **options):
+        app = get_asgi_application()
+        with StubUpstream(body={"foods": [], "totalHits": 0}, latency=latency) as stub, \
+                patch.object(fdc, "FDC_BASE", stub.url + "/"), patch.object(fdc, "FDC_API_KEY", "bench"):
+            results = {}
+            for label, urlconf in (("sync view (ASGI)", "backend.urls"), ("async view (ASGI)", "core.benchmarks.async_urls")):
+                caches[fdc.CACHE_ALIAS].clear()  # measure upstream round trips, not the response cache
+                with override_settings(ROOT_URLCONF=urlconf):
+                    results[label] = asyncio.run(self._load(app, count, concurrency))
+            upstream_calls = stub.requests
+
+        self.stdout.write(f"{count} requests, concurrency {concurrency}, upstream latency {latency * 1000:.0f} ms "
+                          f"({upstream_calls} upstream calls)")
+        for label, (wall, ms, errors) in results.items():
+            p95 = ms[max(int(len(ms) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{label:18} wall={wall:7.2f}s  {count / wall:8.1f} req/s  "
+                f"p50={statistics.median(ms):8.1f}ms  p95={p95:8.1f}ms  errors={errors}"
+            )
+        (sync_wall, *_), (async_wall, *_) = results.values()
+        self.stdout.write(self.style.SUCCESS(f"async is {sync_wall / async_wall:.1f}x the sync throughput"))
+
+    async def _load(self, app, count, concurrency):
+        gate = asyncio.Semaphore(concurrency)
+        timings = []
+        errors = 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=None) as client:
+            async def one(i):
+                nonlocal errors
+                async with gate:
+                    t0 = time.perf_counter()
+                    response = await client.get("/api/foods/search", params={"q": f"bench food {i}"})
+                    timings.append((time.perf_counter() - t0) * 1000)
+                    errors += response.status_code != 200
+
+            began = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(count)))
+            wall = time.perf_counter() - began
+        await aupstream.aclose_all()
+        return wall, sorted(timings), errors
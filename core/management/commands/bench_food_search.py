@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core.benchmarks.stub_server import StubUpstream
+from core.models import Food, Nutrients
+from core.services import catalog, fdc
+from core.services.search import search_local
+
+QUERIES = ("chicken breast", "greek yogurt", "peanut butter", "oat", "banana", "brown rice", "salmon", "egg")
+WORDS = (
+    "chicken", "breast", "thigh", "greek", "yogurt", "plain", "peanut", "butter", "crunchy", "oat",
+    "rolled", "banana", "brown", "rice", "salmon", "fillet", "egg", "whole", "protein", "bar",
+    "almond", "milk", "cheddar", "cheese", "turkey", "ham", "sliced", "bread", "wheat", "apple",
+)
+BRANDS = ("Acme", "Nutty Co", "Tyson", "Fage", "Quaker", None)
+DATA_SOURCE = "BENCH"  # marks the --seed foods, which are removed again afterwards
+
+
+class Command(BaseCommand):
+    help = "Compare local catalog search latency against the proxied FDC search call."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Insert this many synthetic foods first (data_source=BENCH); removed "
+                                 "when the run ends unless --keep is given.")
+        parser.add_argument("--keep", action="store_true", help="Leave the --seed foods in the catalog.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--stub-latency", type=float, default=0.4,
+                            help="Injected latency for the stub FDC used when FDC_API_KEY is unset.")
+
+    def handle(self, *args, seed=0, iterations=50, stub_latency=0.4, keep=False, **options):
+        if seed:
+            self._seed(seed)
+        try:
+            self._run(iterations, stub_latency)
+        finally:
+            if seed and not keep:
+                # nutrients own their food (CASCADE), so this removes both
+                deleted, _ = Nutrients.objects.filter(food__data_source=DATA_SOURCE).delete()
+                self.stdout.write(f"removed {deleted} seeded rows")
+
+    def _run(self, iterations, stub_latency):
+        self.stdout.write(f"catalog size: {Food.objects.count()} foods")
+
+        local = self._time(iterations, lambda q: search_local(q, limit=25))
+        self._report("local catalog", local)
+
+        if fdc.FDC_API_KEY:
+            proxied = self._time(iterations, self._proxied)
+            self._report("proxied FDC (live)", proxied)
+        else:
+            with StubUpstream(body={"foods": []}, latency=stub_latency) as stub, \
+                    patch.object(fdc, "FDC_BASE", stub.url + "/"), patch.object(fdc, "FDC_API_KEY", "bench"):
+                proxied = self._time(iterations, self._proxied)
+            self._report(f"proxied FDC (stub, {stub_latency * 1000:.0f} ms)", proxied)
+
+    def _proxied(self, q):
+        caches[fdc.CACHE_ALIAS].clear()  # measure the round trip, not the response cache
+        return fdc.search_foods(q)
+
+    def _seed(self, n):
+        rng = random.Random(42)
+        batch = []
+        for i in range(n):
+            name = " ".join(rng.sample(WORDS, rng.randint(2, 4))).capitalize()
+            batch.append((
+                {"name": name, "brand": rng.choice(BRANDS), "fdc_id": f"bench-{i}", "data_source": DATA_SOURCE},
+                {"calories": rng.uniform(20, 600)},
+            ))
+            if len(batch) == 5000:
+                catalog.bulk_upsert_foods(batch, key="fdc_id")
+                batch = []
+        catalog.bulk_upsert_foods(batch, key="fdc_id")
+
+    def _time(self, iterations, call):
+        timings = []
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            call(QUERIES[i % len(QUERIES)])
+            timings.append((time.perf_counter() - t0) * 1000)
+        return sorted(timings)
+
+    def _report(self, label, ms):
+        p95 = ms[max(int(len(ms) * 0.95) - 1, 0)]
+        self.stdout.write(f"{label:32} p50={statistics.median(ms):8.2f}ms  p95={p95:8.2f}ms  mean={statistics.mean(ms):8.2f}ms")
@@ -0,0 +1,92 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_tz
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Food, MealEntry, Nutrients
+from core.pagination import MealHistoryPagination
+from core.views import MealEntryViewSet
+
+BENCH_USER = "bench-history"
+DATA_SOURCE = "BENCH_HISTORY"  # marks this command's food; removed with the user after the run
+
+
+class Command(BaseCommand):
+    help = "Compare deep-page latency of page-number vs cursor pagination on GET /api/meals/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=100000,
+                            help="History size for the bench user (topped up if smaller).")
+        parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 2000, 3999])
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--keep", action="store_true",
+                            help="Leave the bench user, its history and food in place (reused by the next run).")
+
+    def handle(self, *args, entries=100000, pages=(1, 100, 1000, 2000, 3999), iterations=10, keep=False, **options):
+        user = self._seed(entries)
+        try:
+            self._run(user, entries, pages, iterations)
+        finally:
+            if not keep:
+                self._clear()
+
+    def _clear(self):
+        # the user's entries and rollups cascade; the food goes through its nutrients (which own it)
+        get_user_model().objects.filter(username=BENCH_USER).delete()
+        Nutrients.objects.filter(food__data_source=DATA_SOURCE).delete()
+        self.stdout.write("removed the seeded history")
+
+    def _run(self, user, entries, pages, iterations):
+        view = MealEntryViewSet.as_view({"get": "list"})
+        factory = APIRequestFactory()
+        page_size = MealHistoryPagination.page_size
+        newest_first = MealEntry.objects.filter(user=user).order_by("-meal_time", "-id")
+
+        def timed(params):
+            timings = []
+            for _ in range(iterations):
+                request = factory.get("/api/meals/", params)
+                force_authenticate(request, user=user)
+                t0 = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - t0) * 1000)
+                assert response.status_code == 200, response.status_code
+            return statistics.median(timings)
+
+        self.stdout.write(f"{MealEntry.objects.filter(user=user).count()} entries, page size {page_size}")
+        self.stdout.write(f"{'page':>6}  {'page-number':>12}  {'cursor':>10}")
+        for page in pages:
+            offset = (page - 1) * page_size
+            if offset >= entries:
+                continue
+            numbered = timed({"page": page})
+            params = {"mode": "cursor"}
+            if offset:
+                # the link a client would hold after scrolling to this depth
+                params["after"] = MealHistoryPagination.encode_cursor(newest_first[offset - 1])
+            cursor = timed(params)
+            self.stdout.write(f"{page:>6}  {numbered:>10.2f}ms  {cursor:>8.2f}ms")
+
+    def _seed(self, n):
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USER)
+        have = MealEntry.objects.filter(user=user).count()
+        if have >= n:
+            return user
+        food = Food.objects.filter(data_source=DATA_SOURCE).first() or Food.objects.create(
+            name="Bench oats", data_source=DATA_SOURCE, nutrients=Nutrients.objects.create(calories=380, protein=13),
+        )
+        start = datetime(2015, 1, 1, tzinfo=dt_tz.utc)
+        batch = []
+        for i in range(have, n):
+            # ~5 entries a day over years of history, with same-timestamp ties to exercise the id tiebreak
+            batch.append(MealEntry(user=user, food=food, quantity=50,
+                                   meal_time=start + timedelta(hours=(i // 2) * 9.6)))
+            if len(batch) == 5000:
+                MealEntry.objects.bulk_create(batch)
+                batch = []
+        MealEntry.objects.bulk_create(batch)
+        return user
@@ -0,0 +1,72 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_tz
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Food, MealEntry, Nutrients
+from core.serializers import MealEntryReadSerializer, MealEntrySerializer
+
+BENCH_USER = "bench-serializer"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare MealEntrySerializer with the lean MealEntryReadSerializer used by GET /api/meals/: "
+        "fetch + serialize + render N rows, and check both produce the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, rows=(10, 100, 1000), iterations=20, **options):
+        user = self._seed(max(rows))
+        entries = MealEntry.objects.filter(user=user).order_by("-meal_time", "-id")
+        renderer = JSONRenderer()
+
+        def full(n):
+            qs = entries.select_related("food__nutrients")[:n]
+            return renderer.render(MealEntrySerializer(qs, many=True).data)
+
+        def lean(n):
+            qs = entries.values(*MealEntryReadSerializer.VALUES)[:n]
+            return renderer.render(MealEntryReadSerializer(qs, many=True).data)
+
+        def timed(fn, n):
+            timings = []
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                fn(n)
+                timings.append((time.perf_counter() - t0) * 1000)
+            return statistics.median(timings)
+
+        self.stdout.write(f"{'rows':>6}  {'serializer':>11}  {'lean':>9}  {'speedup':>7}")
+        for n in rows:
+            if full(n) != lean(n):
+                raise CommandError(f"lean output differs from MealEntrySerializer at {n} rows")
+            before, after = timed(full, n), timed(lean, n)
+            self.stdout.write(f"{n:>6}  {before:>9.2f}ms  {after:>7.2f}ms  {before / after:>6.1f}x")
+
+    def _seed(self, n):
+        user, _ = get_user_model().objects.get_or_create(username=BENCH_USER)
+        have = MealEntry.objects.filter(user=user).count()
+        if have >= n:
+            return user
+        foods = list(Food.objects.filter(data_source="BENCH", name__startswith="Bench serializer ")[:20])
+        for i in range(len(foods), 20):
+            foods.append(Food.objects.create(
+                name=f"Bench serializer {i}", brand="Bench" if i % 2 else None, data_source="BENCH",
+                nutrients=Nutrients.objects.create(calories=100 + i * 7.3, protein=i * 1.1, carbs=20.5,
+                                                   fat=None if i % 3 else 4.2, sodium=0.12),
+            ))
+        start = datetime(2024, 1, 1, tzinfo=dt_tz.utc)
+        batch = []
+        for i in range(have, n):
+            food, quantity = foods[i % len(foods)], 25 + i % 200 * 1.5
+            batch.append(MealEntry(user=user, food=food, quantity=quantity, meal_time=start + timedelta(minutes=97 * i),
+                                   notes="bench" if i % 4 == 0 else None, **MealEntry.totals_for(food, quantity)))
+        MealEntry.objects.bulk_create(batch)
+        return user
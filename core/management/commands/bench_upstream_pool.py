@@ -0,0 +1,53 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from core.benchmarks.stub_server import StubUpstream
+from core.services import upstream
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark: N sequential GETs against a local stub server, "
+        "unpooled requests.get() vs the pooled upstream client."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, dest="count")
+        parser.add_argument("--latency", type=float, default=0.0,
+                            help="Server-side delay per request, seconds.")
+
+    def handle(self, *args, count=500, latency=0.0, **options):
+        n = count
+        with StubUpstream(latency=latency) as stub:
+            url = f"{stub.url}/api/v0/product/0000000000000.json"
+            unpooled = self._run(n, lambda: requests.get(url, timeout=10))
+            unpooled_conns = stub.connections
+
+            upstream.close_all()
+            pooled = self._run(n, lambda: upstream.get(url))
+            pooled_conns = stub.connections - unpooled_conns
+            upstream.close_all()
+
+        self._report("unpooled requests.get", unpooled, unpooled_conns)
+        self._report("pooled upstream.get", pooled, pooled_conns)
+        speedup = sum(unpooled) / sum(pooled) if sum(pooled) else float("inf")
+        self.stdout.write(self.style.SUCCESS(f"pooled is {speedup:.2f}x faster over {n} sequential lookups"))
+
+    def _run(self, n, call):
+        timings = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            call().raise_for_status()
+            timings.append(time.perf_counter() - t0)
+        return timings
+
+    def _report(self, label, timings, connections):
+        ms = sorted(t * 1000 for t in timings)
+        p95 = ms[int(len(ms) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:24} total={sum(ms):8.1f}ms  mean={statistics.mean(ms):6.3f}ms  "
+            f"p50={statistics.median(ms):6.3f}ms  p95={p95:6.3f}ms  connections={connections}"
+        )
@@ -0,0 +1,164 @@
+import csv
+import sys
+import time
+from itertools import groupby, islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import catalog
+from core.services.fdc import parse_food_payloads
+
+csv.field_size_limit(sys.maxsize)
+
+
+class UnsortedInput(Exception):
+    pass
+
+
+def _rows(path: Path):
+    with open(path, newline="", encoding="utf-8") as fh:
+        yield from csv.DictReader(fh)
+
+
+def _grouped(rows, name: str):
+    """Group consecutive rows by fdc_id, insisting the ids ascend (merge-join precondition)."""
+    last = -1
+    for fdc_id, group in groupby(rows, key=lambda r: int(r["fdc_id"])):
+        if fdc_id <= last:
+            raise UnsortedInput(f"{name} is not sorted by fdc_id ({fdc_id} after {last})")
+        last = fdc_id
+        yield fdc_id, list(group)
+
+
+def _sorted_foods(foods):
+    last = -1
+    for f in foods:
+        fdc_id = int(f["fdc_id"])
+        if fdc_id <= last:
+            raise UnsortedInput(f"food.csv is not sorted by fdc_id ({fdc_id} after {last})")
+        last = fdc_id
+        yield f
+
+
+def _merge(foods, *sides):
+    """
+    Streaming merge join: walk food.csv once and, in lockstep, each fdc_id-grouped side
+    file, attaching that food's rows (or []) from every side. Memory is one group per file.
+    """
+    heads = [next(side, None) for side in sides]
+    for food in foods:
+        fdc_id = int(food["fdc_id"])
+        attached = []
+        for i, side in enumerate(sides):
+            while heads[i] is not None and heads[i][0] < fdc_id:
+                heads[i] = next(side, None)
+            if heads[i] is not None and heads[i][0] == fdc_id:
+                attached.append(heads[i][1])
+                heads[i] = next(side, None)
+            else:
+                attached.append([])
+        yield food, *attached
+
+
+def _chunked_join(foods, nutrient_path: Path, branded_path: Path | None, chunk_size: int):
+    """Fallback for unsorted input: buffer `chunk_size` foods, then one pass over each side file per chunk."""
+    foods = iter(foods)
+    while chunk := list(islice(foods, chunk_size)):
+        ids = {int(f["fdc_id"]) for f in chunk}
+        nutrients, branded = {}, {}
+        for r in _rows(nutrient_path):
+            if int(r["fdc_id"]) in ids:
+                nutrients.setdefault(int(r["fdc_id"]), []).append(r)
+        if branded_path:
+            for r in _rows(branded_path):
+                if int(r["fdc_id"]) in ids:
+                    branded.setdefault(int(r["fdc_id"]), []).append(r)
+        for f in chunk:
+            yield f, nutrients.get(int(f["fdc_id"]), []), branded.get(int(f["fdc_id"]), [])
+
+
+def _payload(food, nutrient_rows, branded_rows, nutrient_defs):
+    """Rebuild the FDC API food payload shape so CSV and API foods go through the same mapping."""
+    branded = branded_rows[0] if branded_rows else {}
+    food_nutrients = []
+    for r in nutrient_rows:
+        nd = nutrient_defs.get(r["nutrient_id"])
+        if not nd or r.get("amount") in (None, ""):
+            continue
+        food_nutrients.append({
+            "nutrientId": int(r["nutrient_id"]),
+            "nutrientName": nd["name"],
+            "nutrientNumber": nd["nutrient_nbr"],
+            "unitName": nd["unit_name"],
+            "value": float(r["amount"]),
+        })
+    payload = {
+        "fdcId": int(food["fdc_id"]),
+        "description": food.get("description", ""),
+        "dataType": food.get("data_type"),
+        "foodNutrients": food_nutrients,
+    }
+    if branded.get("brand_owner"):
+        payload["brandOwner"] = branded["brand_owner"]
+    return payload
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the FoodData Central bulk CSV download (food.csv, food_nutrient.csv, "
+        "nutrient.csv, optional branded_food.csv) into Food/Nutrients, upserting on fdc_id. "
+        "Nutrient rows are joined by streaming, never loaded whole."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Unzipped FDC CSV download.")
+        parser.add_argument("--mode", choices=("sorted", "chunked"), default="sorted",
+                            help="sorted: single-pass merge join (files ordered by fdc_id, as FDC ships them). "
+                                 "chunked: buffer --chunk-size foods and rescan the side files per chunk.")
+        parser.add_argument("--chunk-size", type=int, default=50000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--data-type", action="append", dest="data_types",
+                            help="Only import these data_type values, e.g. branded_food (repeatable).")
+
+    def handle(self, *args, directory, mode="sorted", chunk_size=50000, batch_size=5000, data_types=None, **options):
+        root = Path(directory)
+        paths = {name: root / f"{name}.csv" for name in ("food", "food_nutrient", "nutrient", "branded_food")}
+        for name in ("food", "food_nutrient", "nutrient"):
+            if not paths[name].exists():
+                raise CommandError(f"Missing {paths[name]}")
+        branded_path = paths["branded_food"] if paths["branded_food"].exists() else None
+
+        # nutrient.csv is a few hundred rows; everything else is streamed
+        nutrient_defs = {r["id"]: r for r in _rows(paths["nutrient"])}
+
+        foods = _rows(paths["food"])
+        if data_types:
+            foods = (f for f in foods if f.get("data_type") in data_types)
+        if mode == "sorted":
+            sides = [_grouped(_rows(paths["food_nutrient"]), "food_nutrient.csv")]
+            sides.append(_grouped(_rows(branded_path), "branded_food.csv") if branded_path else iter(()))
+            joined = _merge(_sorted_foods(foods), *sides)
+        else:
+            joined = _chunked_join(foods, paths["food_nutrient"], branded_path, chunk_size)
+
+        payloads = (_payload(f, n, b, nutrient_defs) for f, n, b in joined)
+        totals = {"foods": 0, "created": 0, "updated": 0}
+        began = time.monotonic()
+        try:
+            while batch := list(islice(payloads, batch_size)):
+                created, updated = catalog.bulk_upsert_foods(parse_food_payloads(batch), key="fdc_id")
+                totals["foods"] += len(batch)
+                totals["created"] += created
+                totals["updated"] += updated
+                self.stdout.write(
+                    f"foods={totals['foods']} created={totals['created']} updated={totals['updated']} "
+                    f"({totals['foods'] / (time.monotonic() - began):,.0f} foods/s)"
+                )
+        except UnsortedInput as e:
+            raise CommandError(f"{e}. Re-run with --mode chunked or sort the files by fdc_id first.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['foods']} foods in {time.monotonic() - began:.1f}s; "
+            f"created={totals['created']} updated={totals['updated']}"
+        ))
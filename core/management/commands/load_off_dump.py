@@ -0,0 +1,141 @@
+import csv
+import gzip
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import catalog
+from core.services.off import normalize_barcode, normalize_off_payload
+
+# OFF CSV export columns copied into the "nutriments" dict normalize_off_payload reads
+CSV_NUTRIMENT_COLUMNS = (
+    "energy-kcal_100g", "energy-kj_100g", "energy_100g",
+    "proteins_100g", "carbohydrates_100g", "fat_100g",
+    "fiber_100g", "sugars_100g", "sodium_100g",
+)
+
+csv.field_size_limit(sys.maxsize)
+
+
+def _open(path: Path):
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def _detect_format(path: Path) -> str:
+    suffixes = [s for s in path.suffixes if s != ".gz"]
+    return "csv" if suffixes and suffixes[-1] in (".csv", ".tsv") else "jsonl"
+
+
+def _jsonl_products(fh, start: int):
+    """Yield (end_offset, product) per JSON line, starting at byte `start` of the uncompressed stream."""
+    fh.seek(start)
+    offset = start
+    for line in fh:
+        offset += len(line)
+        try:
+            product = json.loads(line)
+        except ValueError:
+            yield offset, None
+            continue
+        yield offset, product if isinstance(product, dict) else None
+
+
+def _csv_products(fh, start: int):
+    """
+    Yield (end_offset, product) per row of the tab-separated OFF CSV export. The export
+    is unquoted, so a '"' is literal text rather than the start of a quoted field.
+    """
+    header_line = fh.readline()
+    header = next(csv.reader([header_line.decode("utf-8")], delimiter="\t", quoting=csv.QUOTE_NONE))
+    offset = max(start, len(header_line))
+    fh.seek(offset)
+    for line in fh:
+        offset += len(line)
+        values = next(csv.reader([line.decode("utf-8", "replace")], delimiter="\t", quoting=csv.QUOTE_NONE), None)
+        if not values:
+            yield offset, None
+            continue
+        row = dict(zip(header, values))
+        yield offset, {
+            "code": row.get("code"),
+            "product_name": row.get("product_name"),
+            "brands": row.get("brands"),
+            "nutriments": {k: row[k] for k in CSV_NUTRIMENT_COLUMNS if row.get(k)},
+        }
+
+
+def _normalized(products):
+    """(offset, product) -> (offset, (food_fields, nutrients_fields) or None)."""
+    for offset, product in products:
+        code = normalize_barcode(product.get("code")) if product else ""
+        data = normalize_off_payload({"product": product}) if code and len(code) <= 64 else None
+        yield offset, catalog.off_food_fields(data, code) if data else None
+
+
+def _batches(rows, size: int):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an Open Food Facts JSONL or CSV export (optionally .gz) into the local "
+        "Food/Nutrients catalog, upserting on barcode in batches. Resumable from a "
+        "byte-offset checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="openfoodfacts-products.jsonl[.gz] or en.openfoodfacts.org.products.csv[.gz]")
+        parser.add_argument("--format", choices=("jsonl", "csv"), help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint).")
+        parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint offset.")
+        parser.add_argument("--limit", type=int, help="Stop after this many input lines (for trial runs).")
+
+    def handle(self, *args, path, format=None, batch_size=5000, checkpoint=None, resume=False, limit=None, **options):
+        dump = Path(path)
+        if not dump.exists():
+            raise CommandError(f"No such file: {dump}")
+        fmt = format or _detect_format(dump)
+        checkpoint = Path(checkpoint) if checkpoint else dump.with_name(dump.name + ".checkpoint")
+
+        start = 0
+        if resume and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            start = int(state.get("offset", 0))
+            self.stdout.write(f"Resuming {dump.name} at byte {start}")
+
+        totals = {"lines": 0, "skipped": 0, "created": 0, "updated": 0}
+        began = time.monotonic()
+        with _open(dump) as fh:
+            products = (_csv_products if fmt == "csv" else _jsonl_products)(fh, start)
+            if limit:
+                products = islice(products, limit)
+            for batch in _batches(_normalized(products), batch_size):
+                items = [item for _, item in batch if item]
+                created, updated = catalog.bulk_upsert_foods(items, key="barcode")
+                totals["lines"] += len(batch)
+                totals["skipped"] += len(batch) - len(items)
+                totals["created"] += created
+                totals["updated"] += updated
+
+                offset = batch[-1][0]
+                checkpoint.write_text(json.dumps({"path": str(dump), "offset": offset}))
+                elapsed = time.monotonic() - began
+                self.stdout.write(
+                    f"offset={offset} lines={totals['lines']} created={totals['created']} "
+                    f"updated={totals['updated']} skipped={totals['skipped']} "
+                    f"({totals['lines'] / elapsed:,.0f} rows/s)"
+                )
+
+        elapsed = time.monotonic() - began
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['lines']} lines in {elapsed:.1f}s "
+            f"({totals['lines'] / elapsed if elapsed else 0:,.0f} rows/s); "
+            f"created={totals['created']} updated={totals['updated']} skipped={totals['skipped']}"
+        ))
@@ -0,0 +1,93 @@
+import math
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from core.models import DailyTotals, MealEntry
+from core.services import meals
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the DailyTotals rollups from scratch out of MealEntry, then verify every "
+        "row against a live recompute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users",
+                            help="Only rebuild these user ids (repeatable).")
+        parser.add_argument("--check-only", action="store_true",
+                            help="Skip the rebuild and only compare existing rows to a live recompute.")
+        parser.add_argument("--tolerance", type=float, default=1e-6,
+                            help="Absolute tolerance when comparing float totals.")
+
+    def handle(self, *args, users=None, check_only=False, tolerance=1e-6, **options):
+        rows = DailyTotals.objects.all()
+        if users:
+            rows = rows.filter(user_id__in=users)
+
+        if not check_only:
+            created = self._rebuild(rows, users)
+            self.stdout.write(f"Rebuilt {created} daily rollup rows.")
+
+        checked, mismatches = self._check(rows, tolerance)
+        if mismatches:
+            raise CommandError(f"{mismatches} of {checked} rollup rows differ from a live recompute.")
+        self.stdout.write(self.style.SUCCESS(f"Verified {checked} rollup rows."))
+
+    def _rebuild(self, rows, users):
+        # Keep materializing the timezones each user already reads in; users
+        # without any rollup yet get the server timezone.
+        keys = set(rows.values_list("user_id", "timezone").distinct())
+        entry_users = MealEntry.objects.values_list("user_id", flat=True).distinct()
+        if users:
+            entry_users = entry_users.filter(user_id__in=users)
+        known = {user_id for user_id, _ in keys}
+        keys |= {(user_id, settings.TIME_ZONE) for user_id in entry_users if user_id not in known}
+
+        created = 0
+        with transaction.atomic():
+            rows.delete()
+            for user_id, tz_name in sorted(keys):
+                per_day = (
+                    MealEntry.objects
+                    .filter(user_id=user_id)
+                    .annotate(day=TruncDate("meal_time", tzinfo=ZoneInfo(tz_name)))
+                    .values("day")
+                    .annotate(entries=Count("id"), **meals.totals_aggregates())
+                    .order_by("day")
+                )
+                batch = [
+                    DailyTotals(
+                        user_id=user_id,
+                        date=r["day"],
+                        timezone=tz_name,
+                        entries=r["entries"],
+                        **{k: float(r[k] or 0.0) for k in meals.NUTRIENT_FIELDS},
+                    )
+                    for r in per_day
+                ]
+                DailyTotals.objects.bulk_create(batch, batch_size=1000)
+                created += len(batch)
+        return created
+
+    def _check(self, rows, tolerance):
+        checked = mismatches = 0
+        for row in rows.order_by("user_id", "timezone", "date").iterator():
+            live = meals.compute_daily_totals(row.user_id, row.date, ZoneInfo(row.timezone))
+            checked += 1
+            diffs = [
+                k for k in ("entries",) + meals.NUTRIENT_FIELDS
+                if not math.isclose(getattr(row, k), live[k], abs_tol=tolerance)
+            ]
+            if diffs:
+                mismatches += 1
+                self.stderr.write(
+                    f"user={row.user_id} date={row.date} tz={row.timezone}: "
+                    + ", ".join(f"{k} stored={getattr(row, k)} live={live[k]}" for k in diffs)
+                )
+        return checked, mismatches
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MealEntry
+from core.services import meals
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-snapshot logged meal entries from their foods' current per-100g values, e.g. after "
+        "correcting a food's nutrients. Entries otherwise keep the totals they were logged with."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--food", type=int, action="append", dest="foods",
+                            help="Only entries of these food ids (repeatable).")
+        parser.add_argument("--since", help="Only entries logged at or after this date (YYYY-MM-DD, UTC).")
+        parser.add_argument("--all", action="store_true", dest="everything",
+                            help="Re-snapshot every entry (required when no --food is given).")
+
+    def handle(self, *args, foods=None, since=None, everything=False, **options):
+        if not foods and not everything:
+            raise CommandError("Pass --food ID (repeatable) or --all.")
+        entries = MealEntry.objects.all()
+        if foods:
+            entries = entries.filter(food_id__in=foods)
+        if since:
+            try:
+                entries = entries.filter(meal_time__date__gte=datetime.strptime(since, "%Y-%m-%d").date())
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD.")
+        count = meals.resnapshot_entries(entries)
+        self.stdout.write(self.style.SUCCESS(f"Re-snapshotted {count} meal entries."))
@@ -0,0 +1,89 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone as dt_tz
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import datagen, suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a seeded synthetic dataset and time the hot endpoints (meal list/summary/trends, "
+        "food search, barcode/FDC imports against a stub upstream); report p50/p95 and query counts "
+        "and save them as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--entries", type=int, default=5, help="Meal entries per user per day.")
+        parser.add_argument("--foods", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--scenario", action="append", dest="scenarios", choices=sorted(suite.SCENARIOS),
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument("--upstream-latency", type=float, default=0.0,
+                            help="Injected stub OFF/FDC latency, seconds.")
+        parser.add_argument("--output", help="Results file (default: benchmarks-<UTC timestamp>.json).")
+        parser.add_argument("--compare", help="Earlier results file to print deltas against.")
+        parser.add_argument("--keep-data", action="store_true", help="Leave the generated dataset in place.")
+
+    def handle(self, *args, **options):
+        baseline = self._load(options["compare"]) if options["compare"] else None
+        dims = {k: options[k] for k in ("users", "days", "entries", "foods", "seed")}
+        dataset = datagen.generate(**dims)
+        self.stdout.write(
+            f"dataset: {dims['users']} users x {dims['days']} days x {dims['entries']} entries, "
+            f"{dims['foods']} foods (seed {dims['seed']})"
+        )
+        try:
+            results = suite.run(dataset, iterations=options["iterations"], scenarios=options["scenarios"],
+                                seed=dims["seed"], upstream_latency=options["upstream_latency"])
+        finally:
+            if not options["keep_data"]:
+                datagen.clear()
+
+        finished = datetime.now(dt_tz.utc)
+        report = {
+            "meta": {
+                "timestamp": finished.isoformat(timespec="seconds"),
+                "commit": self._commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "dataset": dims,
+                "iterations": options["iterations"],
+                "upstream_latency": options["upstream_latency"],
+            },
+            "results": results,
+        }
+        output = Path(options["output"] or f"benchmarks-{finished:%Y%m%dT%H%M%SZ}.json")
+        output.write_text(json.dumps(report, indent=2) + "\n")
+
+        previous = (baseline or {}).get("results", {})
+        self.stdout.write(f"{'scenario':22} {'p50':>10} {'p95':>10} {'queries':>8}" + ("  vs baseline p50" if baseline else ""))
+        for name, r in results.items():
+            line = f"{name:22} {r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['queries']:>8}"
+            if name in previous:
+                before = previous[name]
+                line += f"  {(r['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100:+6.1f}%"
+                if r["queries"] != before["queries"]:
+                    line += f" (queries {before['queries']} -> {r['queries']})"
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
+
+    def _load(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read {path}: {e}")
+
+    def _commit(self):
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
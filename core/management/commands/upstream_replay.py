@@ -0,0 +1,69 @@
+import threading
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.replay import Faults, ReplayUpstream, parse_latency
+
+# real API roots recorded from, whatever OFF_BASE_URL / FDC_BASE_URL currently point at
+UPSTREAMS = {
+    "off": "https://world.openfoodfacts.org",
+    "fdc": "https://api.nal.usda.gov/fdc/v1",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve local stand-ins for OFF and FDC (one port each, like the real hosts): record real "
+        "responses to fixture files, or replay them with a latency distribution and injected "
+        "timeouts / 429s / 5xx. Point OFF_BASE_URL and FDC_BASE_URL at the printed URLs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("mode", choices=("record", "replay"))
+        parser.add_argument("--fixtures", required=True, help="Fixture directory (off/ and fdc/ inside).")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--off-port", type=int, default=8701)
+        parser.add_argument("--fdc-port", type=int, default=8702)
+        parser.add_argument("--latency", default="recorded",
+                            help="fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | "
+                                 "recorded[:SCALE] (seconds; default: as recorded).")
+        parser.add_argument("--timeout-rate", type=float, default=0.0,
+                            help="Share of requests that stall until the client's read timeout.")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share answered with 429.")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share answered with 500/502/503/504.")
+        parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s.")
+        parser.add_argument("--stall", type=float, default=None,
+                            help="Seconds a timed-out request hangs (default: UPSTREAM_READ_TIMEOUT + 1).")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, mode, fixtures, host, off_port, fdc_port, **options):
+        try:
+            parse_latency(options["latency"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        rates = [options[k] for k in ("timeout_rate", "throttle_rate", "error_rate")]
+        if any(r < 0 for r in rates) or sum(rates) > 1:
+            raise CommandError("Fault rates must be >= 0 and add up to at most 1.")
+        faults = Faults(
+            latency=options["latency"], timeout_rate=rates[0], throttle_rate=rates[1], error_rate=rates[2],
+            stall=options["stall"] if options["stall"] is not None else settings.UPSTREAM_READ_TIMEOUT + 1,
+            retry_after=options["retry_after"], seed=options["seed"],
+        )
+        with ExitStack() as stack:
+            servers = {
+                name: stack.enter_context(ReplayUpstream(
+                    fixtures, name, mode=mode, upstream_base=UPSTREAMS[name], faults=faults, host=host, port=port,
+                ))
+                for name, port in (("off", off_port), ("fdc", fdc_port))
+            }
+            self.stdout.write(f"{mode} mode, fixtures in {fixtures}. Run the app with:")
+            self.stdout.write(f"  OFF_BASE_URL={servers['off'].url} FDC_BASE_URL={servers['fdc'].url}/")
+            try:
+                threading.Event().wait()  # until Ctrl-C
+            except KeyboardInterrupt:
+                pass
+            for name, server in servers.items():
+                self.stdout.write(f"{name}: " + ", ".join(f"{k}={v}" for k, v in server.stats.items()))
+
@@ -0,0 +1,192 @@
+# core/metrics.py
+"""
+Request-level performance metrics, exported in Prometheus format at /api/metrics.
+
+RequestMetricsMiddleware (core/middleware.py) opens a RequestStats for each request;
+while it is current, every SQL statement (a wrapper installed on each DB connection
+through the same hook as connection.execute_wrapper()) and every OFF/FDC call made
+through services/upstream.py or aupstream.py is added to it. When the response is
+ready the totals are observed into histograms labelled with the DRF view and action,
+and summarized in a Server-Timing header, so a slow request shows whether it was
+waiting on Postgres or on an upstream.
+
+Set PROMETHEUS_MULTIPROC_DIR (see prometheus_client docs) when running several
+worker processes so /api/metrics aggregates all of them.
+"""
+import contextvars
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce the response.",
+    ["view", "action", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ["view", "action"], buckets=QUERY_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.", ["view", "action"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_CALLS = Histogram(
+    "http_request_upstream_calls", "OFF/FDC requests made per request.", ["view", "action"], buckets=CALL_BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_duration_seconds", "Latency of each OFF/FDC request, retries included.",
+    ["upstream", "view", "action"], buckets=LATENCY_BUCKETS,
+)
+
+NO_VIEW = "-"  # label for work outside a request (management commands, worker threads)
+
+
+class RequestStats:
+    """What one request spent on the DB and upstream APIs; shared by every thread working for it."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.upstream = []  # (upstream name, seconds)
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def add_upstream(self, name, seconds):
+        with self._lock:
+            self.upstream.append((name, seconds))
+
+
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current() -> RequestStats | None:
+    return _current.get()
+
+
+@contextmanager
+def collecting():
+    """Make a fresh RequestStats current for the duration of the block."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - t0)
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """connection_created receiver: time SQL on every connection, in whatever thread serves the request."""
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def upstream_name(url: str) -> str:
+    host = urlsplit(url).netloc
+    for name, base in (("off", settings.OFF_BASE_URL), ("fdc", settings.FDC_BASE_URL)):
+        if host == urlsplit(base).netloc:
+            return name
+    return host
+
+
+@contextmanager
+def track_upstream(url: str):
+    """Time one upstream call (including client-side retries) for the current request."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stats = _current.get()
+        if stats is None:
+            UPSTREAM_SECONDS.labels(upstream_name(url), NO_VIEW, NO_VIEW).observe(elapsed)
+        else:
+            stats.add_upstream(upstream_name(url), elapsed)
+
+
+def view_labels(request) -> tuple[str, str]:
+    """
+    (view, action) for a resolved request: the view class name (viewsets, and @api_view
+    functions, whose wrapper class is named after them) or plain view function name,
+    and the viewset action. as_view() wrappers are all called "view", so never use that.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched", NO_VIEW
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if view_class is not None:
+        name = view_class.__name__
+    elif getattr(func, "__name__", "view") != "view":
+        name = func.__name__  # same label for the async_views versions of the upstream endpoints
+    else:
+        name = match.view_name or NO_VIEW
+    actions = getattr(func, "actions", None) or {}
+    return name, actions.get(request.method.lower(), NO_VIEW)
+
+
+def observe(request, response, stats: RequestStats) -> float:
+    """Record a finished request; returns its total seconds."""
+    total = time.perf_counter() - stats.started
+    view, action = view_labels(request)
+    REQUEST_SECONDS.labels(view, action, request.method, str(response.status_code)).observe(total)
+    DB_QUERIES.labels(view, action).observe(stats.db_queries)
+    DB_SECONDS.labels(view, action).observe(stats.db_seconds)
+    UPSTREAM_CALLS.labels(view, action).observe(len(stats.upstream))
+    for name, seconds in stats.upstream:
+        UPSTREAM_SECONDS.labels(name, view, action).observe(seconds)
+    return total
+
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    upstream_seconds = sum(seconds for _, seconds in stats.upstream)
+    return ", ".join((
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"',
+        f'upstream;dur={upstream_seconds * 1000:.1f};desc="{len(stats.upstream)} calls"',
+        f"total;dur={total * 1000:.1f}",
+    ))
+
+
+def _registry():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """
+    GET /api/metrics: Prometheus text format. With METRICS_TOKEN set, scrapers send
+    `Authorization: Bearer <token>`; staff users can always read it.
+    """
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    allowed = (token and hmac.compare_digest(bearer, token)) or getattr(request.user, "is_staff", False)
+    if not allowed:
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
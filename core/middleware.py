@@ -0,0 +1,59 @@
+# core/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics, profiling
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request latency, SQL and upstream accounting (see core/metrics.py), plus a
+    Server-Timing header when SERVER_TIMING is on. Async-capable, so the async
+    upstream views under ASGI don't get pushed onto a thread for it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with metrics.collecting() as stats:
+            response = self.get_response(request)
+        return self._finish(request, response, stats)
+
+    async def __acall__(self, request):
+        with metrics.collecting() as stats:
+            response = await self.get_response(request)
+        return self._finish(request, response, stats)
+
+    def _finish(self, request, response, stats):
+        total = metrics.observe(request, response, stats)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing(stats, total)
+        return response
+
+
+class RequestProfilerMiddleware:
+    """
+    Runs staff-requested (?profile=1 / X-Profile: 1) and randomly sampled requests
+    under cProfile; see core/profiling.py. Async requests pass straight through:
+    cProfile follows a thread, and on the event loop that would mix in every other
+    request being served.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        return profiling.run(request, self.get_response)
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_alter_nutrients_calories_alter_nutrients_carbs_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='local calendar date')),
+                ('timezone', models.CharField(help_text='IANA tz the date is local to', max_length=64)),
+                ('entries', models.IntegerField(default=0)),
+                ('calories', models.FloatField(default=0.0, help_text='kcal')),
+                ('protein', models.FloatField(default=0.0, help_text='g')),
+                ('carbs', models.FloatField(default=0.0, help_text='g')),
+                ('fat', models.FloatField(default=0.0, help_text='g')),
+                ('fiber', models.FloatField(default=0.0, help_text='g')),
+                ('sugar', models.FloatField(default=0.0, help_text='g')),
+                ('sodium', models.FloatField(default=0.0, help_text='mg')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailytotals',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'timezone'), name='uniq_daily_totals_user_date_tz'),
+        ),
+    ]
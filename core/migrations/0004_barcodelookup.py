@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_dailytotals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarcodeLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=64, unique=True)),
+                ('payload', models.JSONField()),
+                ('found', models.BooleanField(default=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('hits', models.PositiveIntegerField(default=0, help_text='lookups served from this row')),
+                ('misses', models.PositiveIntegerField(default=0, help_text='lookups that went to OFF')),
+            ],
+        ),
+    ]
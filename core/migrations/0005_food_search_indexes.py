@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_barcodelookup'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='food',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('name', 'brand', config='simple'), name='food_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='food_name_trgm_gin', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['brand'], name='food_brand_trgm_gin', opclasses=['gin_trgm_ops']),
+        ),
+    ]
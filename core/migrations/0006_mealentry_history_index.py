@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_food_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealentry',
+            index=models.Index(fields=['user', 'meal_time', 'id'], name='mealentry_user_time_id_idx'),
+        ),
+    ]
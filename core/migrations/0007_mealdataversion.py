@@ -0,0 +1,26 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0006_mealentry_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='meal_data_version', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
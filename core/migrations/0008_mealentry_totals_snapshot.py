@@ -0,0 +1,48 @@
+# Generated by Django 4.2.14 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_mealdataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealentry',
+            name='calories',
+            field=models.FloatField(default=0.0, help_text='kcal'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='carbs',
+            field=models.FloatField(default=0.0, help_text='g'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='fat',
+            field=models.FloatField(default=0.0, help_text='g'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='fiber',
+            field=models.FloatField(default=0.0, help_text='g'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='protein',
+            field=models.FloatField(default=0.0, help_text='g'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='sodium',
+            field=models.FloatField(default=0.0, help_text='mg'),
+        ),
+        migrations.AddField(
+            model_name='mealentry',
+            name='sugar',
+            field=models.FloatField(default=0.0, help_text='g'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000  # entry ids per UPDATE / transaction
+FIELDS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
+
+def backfill(apps, schema_editor, batch_size=BATCH_SIZE):
+    """
+    Snapshot the totals of existing entries from their foods' current per-100g values,
+    walking the id range in batches so each UPDATE and transaction stays small and
+    concurrent writes aren't blocked behind one big row lock.
+    """
+    MealEntry = apps.get_model("core", "MealEntry")
+    Food = apps.get_model("core", "Food")
+    Nutrients = apps.get_model("core", "Nutrients")
+    sql = (
+        f"UPDATE {MealEntry._meta.db_table} me SET "
+        + ", ".join(f"{k} = COALESCE(n.{k} * (me.quantity / 100.0), 0)" for k in FIELDS)
+        + f" FROM {Food._meta.db_table} f JOIN {Nutrients._meta.db_table} n ON n.id = f.nutrients_id"
+        " WHERE f.id = me.food_id AND me.id >= %s AND me.id < %s"
+    )
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {MealEntry._meta.db_table}")
+        low, high = cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, batch_size):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(sql, [start, start + batch_size])
+
+
+class Migration(migrations.Migration):
+    # each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_mealentry_totals_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
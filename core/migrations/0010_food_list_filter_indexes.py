@@ -0,0 +1,21 @@
+# Generated by Django 4.2.14 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_backfill_mealentry_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['brand', 'id'], name='food_brand_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['data_source', 'id'], name='food_data_source_id_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.14 on 2026-10-17 21:11
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_food_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight_kg', models.FloatField(validators=[django.core.validators.MinValueValidator(20), django.core.validators.MaxValueValidator(400)])),
+                ('height_cm', models.FloatField(validators=[django.core.validators.MinValueValidator(50), django.core.validators.MaxValueValidator(280)])),
+                ('age', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(13), django.core.validators.MaxValueValidator(120)])),
+                ('sex', models.CharField(choices=[('male', 'male'), ('female', 'female')], max_length=8)),
+                ('activity_factor', models.FloatField(default=1.2, help_text='TDEE multiplier: 1.2 sedentary .. 1.9 very active', validators=[django.core.validators.MinValueValidator(1.0), django.core.validators.MaxValueValidator(2.5)])),
+                ('target_calories', models.FloatField(default=0.0, help_text='kcal')),
+                ('target_protein', models.FloatField(default=0.0, help_text='g')),
+                ('target_protein_min', models.FloatField(default=0.0, help_text='g')),
+                ('target_protein_max', models.FloatField(default=0.0, help_text='g')),
+                ('target_fat', models.FloatField(default=0.0, help_text='g')),
+                ('target_fat_min', models.FloatField(default=0.0, help_text='g')),
+                ('target_fat_max', models.FloatField(default=0.0, help_text='g')),
+                ('target_carbs', models.FloatField(default=0.0, help_text='g')),
+                ('target_carbs_min', models.FloatField(default=0.0, help_text='g')),
+                ('target_carbs_max', models.FloatField(default=0.0, help_text='g')),
+                ('targets_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
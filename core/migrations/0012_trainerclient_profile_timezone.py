@@ -0,0 +1,39 @@
+# Generated by Django 4.2.14 on 2026-10-17 21:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='timezone',
+            field=models.CharField(blank=True, default='', help_text="IANA tz of the user's local days; blank = TIME_ZONE", max_length=64),
+        ),
+        migrations.CreateModel(
+            name='TrainerClient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainers', to=settings.AUTH_USER_MODEL)),
+                ('trainer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trainer_clients', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trainerclient',
+            constraint=models.UniqueConstraint(fields=('trainer', 'client'), name='uniq_trainer_client'),
+        ),
+        migrations.AddConstraint(
+            model_name='trainerclient',
+            constraint=models.CheckConstraint(check=models.Q(('trainer', models.F('client')), _negated=True), name='trainer_client_not_self'),
+        ),
+    ]
@@ -1,7 +1,15 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
+
+from .services import goals
 
 # Create your models here.
 
+NUTRIENT_FIELDS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
 class Nutrients(models.Model):
     calories = models.FloatField(help_text="kcal per 100g", null=True, blank=True)
     protein = models.FloatField(help_text="g per 100g", null=True, blank=True)
@@ -24,6 +32,17 @@ class Food(models.Model):
     serving_unit = models.CharField(max_length=32, blank=True, null=True)
     data_source = models.CharField(max_length=32, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # local catalog search (core/services/search.py)
+            GinIndex(SearchVector("name", "brand", config="simple"), name="food_search_vector_gin"),
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="food_name_trgm_gin"),
+            GinIndex(fields=["brand"], opclasses=["gin_trgm_ops"], name="food_brand_trgm_gin"),
+            # catalog list filters, in list order (barcode and fdc_id are unique, so already indexed)
+            models.Index(fields=["brand", "id"], name="food_brand_id_idx"),
+            models.Index(fields=["data_source", "id"], name="food_data_source_id_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -33,6 +52,162 @@ class MealEntry(models.Model):
     quantity = models.FloatField(help_text="grams consumed")
     meal_time = models.DateTimeField()
     notes = models.TextField(blank=True, null=True)
+    # Totals for this entry (the food's per-100g values x quantity), snapshotted when it is
+    # logged or its food/quantity changes, so editing a shared Nutrients row later doesn't
+    # rewrite history. meals.resnapshot_entries() re-applies corrected values on request.
+    calories = models.FloatField(default=0.0, help_text="kcal")
+    protein = models.FloatField(default=0.0, help_text="g")
+    carbs = models.FloatField(default=0.0, help_text="g")
+    fat = models.FloatField(default=0.0, help_text="g")
+    fiber = models.FloatField(default=0.0, help_text="g")
+    sugar = models.FloatField(default=0.0, help_text="g")
+    sodium = models.FloatField(default=0.0, help_text="mg")
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a user's history: WHERE user_id = ? ORDER BY meal_time, id
+            models.Index(fields=["user", "meal_time", "id"], name="mealentry_user_time_id_idx"),
+        ]
+
+    @staticmethod
+    def totals_for(food, quantity) -> dict:
+        """Snapshot field values for `quantity` grams of `food` at its current per-100g values."""
+        n = food.nutrients
+        factor = float(quantity or 0.0) / 100.0
+        totals = {}
+        for key in NUTRIENT_FIELDS:
+            val = getattr(n, key, None)
+            totals[key] = float(val) * factor if val is not None else 0.0
+        return totals
+
+    def save(self, *args, **kwargs):
+        # inserts always snapshot; updates pass fresh totals explicitly when food/quantity change
+        if self._state.adding:
+            for key, val in self.totals_for(self.food, self.quantity).items():
+                setattr(self, key, val)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.user} ate {self.food} ({self.quantity}g) at {self.meal_time}"
+
+class DailyTotals(models.Model):
+    """Materialized per-user nutrient totals for one local calendar day."""
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name="daily_totals")
+    date = models.DateField(help_text="local calendar date")
+    timezone = models.CharField(max_length=64, help_text="IANA tz the date is local to")
+    entries = models.IntegerField(default=0)
+    calories = models.FloatField(default=0.0, help_text="kcal")
+    protein = models.FloatField(default=0.0, help_text="g")
+    carbs = models.FloatField(default=0.0, help_text="g")
+    fat = models.FloatField(default=0.0, help_text="g")
+    fiber = models.FloatField(default=0.0, help_text="g")
+    sugar = models.FloatField(default=0.0, help_text="g")
+    sodium = models.FloatField(default=0.0, help_text="mg")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date", "timezone"], name="uniq_daily_totals_user_date_tz"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date} ({self.timezone}): {self.calories} kcal"
+
+class MealDataVersion(models.Model):
+    """Per-user counter advanced whenever the user's meal data changes; source of the meal read ETags."""
+    user = models.OneToOneField('auth.User', on_delete=models.CASCADE, related_name="meal_data_version")
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user} v{self.version}"
+
+class BarcodeLookup(models.Model):
+    """Cached raw Open Food Facts payload for one normalized barcode (including "not found")."""
+    barcode = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField()
+    found = models.BooleanField(default=True)
+    fetched_at = models.DateTimeField()
+    hits = models.PositiveIntegerField(default=0, help_text="lookups served from this row")
+    misses = models.PositiveIntegerField(default=0, help_text="lookups that went to OFF")
+
+    def __str__(self):
+        return f"{self.barcode} ({'found' if self.found else 'not found'})"
+
+class Profile(models.Model):
+    """
+    Body stats behind a user's daily goals, plus the targets derived from them
+    (services/goals.targets(), stored as target_<key>). Targets are recomputed in
+    save() only when one of the INPUTS changed, never on read.
+    """
+    SEX_CHOICES = [("male", "male"), ("female", "female")]
+    INPUTS = ("weight_kg", "height_cm", "age", "sex", "activity_factor")
+    TARGET_FIELDS = tuple(f"target_{key}" for key in goals.TARGET_KEYS)
+
+    user = models.OneToOneField('auth.User', on_delete=models.CASCADE, related_name="profile")
+    weight_kg = models.FloatField(validators=[MinValueValidator(20), MaxValueValidator(400)])
+    height_cm = models.FloatField(validators=[MinValueValidator(50), MaxValueValidator(280)])
+    age = models.PositiveSmallIntegerField(validators=[MinValueValidator(13), MaxValueValidator(120)])
+    sex = models.CharField(max_length=8, choices=SEX_CHOICES)
+    activity_factor = models.FloatField(
+        default=1.2, validators=[MinValueValidator(1.0), MaxValueValidator(2.5)],
+        help_text="TDEE multiplier: 1.2 sedentary .. 1.9 very active",
+    )
+    target_calories = models.FloatField(default=0.0, help_text="kcal")
+    target_protein = models.FloatField(default=0.0, help_text="g")
+    target_protein_min = models.FloatField(default=0.0, help_text="g")
+    target_protein_max = models.FloatField(default=0.0, help_text="g")
+    target_fat = models.FloatField(default=0.0, help_text="g")
+    target_fat_min = models.FloatField(default=0.0, help_text="g")
+    target_fat_max = models.FloatField(default=0.0, help_text="g")
+    target_carbs = models.FloatField(default=0.0, help_text="g")
+    target_carbs_min = models.FloatField(default=0.0, help_text="g")
+    target_carbs_max = models.FloatField(default=0.0, help_text="g")
+    targets_updated_at = models.DateTimeField(null=True, blank=True)
+    timezone = models.CharField(
+        max_length=64, blank=True, default="", help_text="IANA tz of the user's local days; blank = TIME_ZONE",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_inputs = instance._inputs()
+        return instance
+
+    def _inputs(self):
+        return tuple(getattr(self, name) for name in self.INPUTS)
+
+    @property
+    def targets(self) -> dict:
+        return {key: getattr(self, f"target_{key}") for key in goals.TARGET_KEYS}
+
+    def save(self, *args, **kwargs):
+        inputs = self._inputs()
+        if inputs != getattr(self, "_saved_inputs", None):
+            computed = goals.targets(*inputs)
+            for key in goals.TARGET_KEYS:
+                setattr(self, f"target_{key}", computed[key])
+            self.targets_updated_at = timezone.now()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], *self.TARGET_FIELDS, "targets_updated_at"}
+        super().save(*args, **kwargs)
+        self._saved_inputs = inputs
+
+    def __str__(self):
+        return f"{self.user}: {self.target_calories:.0f} kcal/day"
+
+class TrainerClient(models.Model):
+    """A trainer's access to one client's meal data (the roster behind /api/trainer/clients/summary)."""
+    trainer = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name="trainer_clients")
+    client = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name="trainers")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # also the trainer_id lookup index
+            models.UniqueConstraint(fields=["trainer", "client"], name="uniq_trainer_client"),
+            models.CheckConstraint(check=~models.Q(trainer=models.F("client")), name="trainer_client_not_self"),
+        ]
 
     def __str__(self):
-        return f"{self.user} ate {self.food} ({self.quantity}g) at {self.meal_time}"
\ No newline at end of file
+        return f"{self.trainer} -> {self.client}"
@@ -0,0 +1,105 @@
+# core/pagination.py
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MealHistoryPagination(BasePagination):
+    """
+    Keyset pagination over (meal_time, id), newest first, for infinite scroll.
+
+    ?after=<cursor> returns the page following that entry (older), ?before=<cursor>
+    the page preceding it (newer). Each page is one index range scan on
+    (user_id, meal_time, id): no COUNT(*), no OFFSET, so page 4000 costs the same as
+    page 1. Cursors are opaque; clients only follow the `next` / `previous` links.
+    """
+    page_size = api_settings.PAGE_SIZE or 25
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self._page_size(request)
+        after = self.decode_cursor(request.query_params.get("after"))
+        before = self.decode_cursor(request.query_params.get("before"))
+        if after and before:
+            raise ValidationError({"detail": "Pass either 'after' or 'before', not both."})
+
+        if before:
+            # walk the index forwards from the cursor, then flip back to newest-first
+            t, pk = before
+            qs = queryset.order_by("meal_time", "id").filter(meal_time__gte=t).filter(Q(meal_time__gt=t) | Q(id__gt=pk))
+        else:
+            qs = queryset.order_by("-meal_time", "-id")
+            if after:
+                t, pk = after
+                # (meal_time, id) < (t, pk), phrased so the range bound on meal_time stays index-usable
+                qs = qs.filter(meal_time__lte=t).filter(Q(meal_time__lt=t) | Q(id__lt=pk))
+
+        rows = list(qs[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if before:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or before:
+                self.next_cursor = self.encode_cursor(rows[-1])
+            if (has_more and before) or after:
+                self.previous_cursor = self.encode_cursor(rows[0])
+        return rows
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params.get("page_size", self.page_size))
+        except ValueError:
+            raise ValidationError({"detail": "page_size must be an integer."})
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def encode_cursor(entry) -> str:
+        """Cursor for a MealEntry or a .values() row of one."""
+        meal_time, pk = (entry["meal_time"], entry["id"]) if isinstance(entry, dict) else (entry.meal_time, entry.pk)
+        raw = f"{meal_time.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            t, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(t), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, param, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "after" if param == "before" else "before")
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self._link("after", self.next_cursor),
+            "previous": self._link("before", self.previous_cursor),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,103 @@
+# core/profiling.py
+"""
+On-demand cProfile captures of single requests, saved under settings.PROFILE_DIR as
+<View>.<action>-<timestamp>-<trigger>.prof (load with pstats, snakeviz, etc.).
+
+Staff trigger one by adding ?profile=1 or an `X-Profile: 1` header to any request;
+the response then carries the file name in X-Profile. Separately, a
+PROFILE_SAMPLE_RATE fraction of all requests is profiled at random, so hot spots
+under real traffic show up without anyone asking.
+
+Staff status is settled before the profiler starts: session users are already on
+the request, and a token is looked up here the same way DRF will for the view, so
+other users never hold the profiler. Only one request per process is captured at a
+time; any that arrive meanwhile are served unprofiled.
+"""
+import cProfile
+import os
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import metrics
+
+TRIGGER_PARAM = "profile"
+TRIGGER_HEADER = "X-Profile"
+_TRUE = ("1", "true", "yes", "on")
+_capture = threading.Lock()
+
+
+def requested(request) -> bool:
+    """Explicitly asked for, by a staff user."""
+    asked = (request.GET.get(TRIGGER_PARAM, "").lower() in _TRUE
+             or request.headers.get(TRIGGER_HEADER, "").lower() in _TRUE)
+    return asked and _is_staff(request)
+
+
+def sampled() -> bool:
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _is_staff(request) -> bool:
+    user = getattr(request, "user", None)
+    if getattr(user, "is_authenticated", False):
+        return bool(user.is_staff)
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:  # bad token: DRF will reject the request itself
+        return False
+    return authenticated is not None and bool(authenticated[0].is_staff)
+
+
+def save(profiler: cProfile.Profile, request, trigger: str) -> Path:
+    view, action = metrics.view_labels(request)
+    tag = view if action == metrics.NO_VIEW else f"{view}.{action}"
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{tag}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{trigger}.prof"
+    profiler.dump_stats(path)
+    _prune(directory, settings.PROFILE_MAX_FILES)
+    return path
+
+
+def _prune(directory: Path, keep: int):
+    """Drop the oldest captures beyond `keep`, so sampling can't fill the disk."""
+    try:
+        files = sorted(directory.glob("*.prof"), key=os.path.getmtime)
+    except FileNotFoundError:  # another worker pruning at the same time
+        return
+    for stale in files[:max(len(files) - keep, 0)]:
+        stale.unlink(missing_ok=True)
+
+
+def run(request, get_response):
+    """Serve `request` through get_response, under cProfile if it was asked for or sampled."""
+    trigger = "staff" if requested(request) else "sample" if sampled() else None
+    if trigger is None:
+        return get_response(request)
+    # One capture per process at a time: on 3.12+ cProfile takes the interpreter-wide
+    # profiler slot (enable() raises if it is taken) and records every thread's calls.
+    if not _capture.acquire(blocking=False):
+        return get_response(request)
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # some other tool holds the profiler slot
+            return get_response(request)
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    finally:
+        _capture.release()
+    path = save(profiler, request, trigger)
+    if trigger == "staff":
+        response[TRIGGER_HEADER] = path.name
+    return response
@@ -1,17 +1,61 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import serializers
-from .models import Food, Nutrients, MealEntry
+from .models import NUTRIENT_FIELDS, Food, Nutrients, MealEntry, Profile
+from .services import goals
+
+def _keep_fields(serializer, names):
+    for name in set(serializer.fields) - set(names):
+        serializer.fields.pop(name)
+
 
 class NutrientsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Nutrients
         fields = '__all__'
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            _keep_fields(self, fields)
+
 class FoodSerializer(serializers.ModelSerializer):
+    """
+    `fields` (GET /api/foods/?fields=...) is a sparse fieldset: Food field names, plus
+    nutrient names (e.g. "calories") which keep just those keys of the nested nutrients.
+    """
     nutrients = NutrientsSerializer(read_only=True)
     class Meta:
         model = Food
         fields = '__all__'
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        food, nutrients = self.split_fields(fields)
+        if nutrients:
+            self.fields["nutrients"] = NutrientsSerializer(read_only=True, fields=nutrients)
+            food.append("nutrients")
+        _keep_fields(self, food)
+
+    @staticmethod
+    def split_fields(names):
+        """
+        Sparse fieldset -> (Food field names, Nutrients field names or None). Asking
+        for "nutrients" itself keeps the whole nested object. Raises ValueError on an unknown name.
+        """
+        food_names = [f.name for f in Food._meta.concrete_fields]
+        unknown = [n for n in names if n not in food_names and n not in NUTRIENT_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(food_names + list(NUTRIENT_FIELDS))}."
+            )
+        nutrients = [n for n in NUTRIENT_FIELDS if n in names]
+        if "nutrients" in names:
+            nutrients = ["id", *NUTRIENT_FIELDS]
+        return [n for n in food_names if n in names and n != "nutrients"], nutrients or None
+
 class MealEntrySerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     food_name = serializers.SerializerMethodField(read_only=True)
@@ -47,6 +91,76 @@ class MealEntrySerializer(serializers.ModelSerializer):
         } if n else {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0, "fiber": 0.0, "sugar": 0.0, "sodium": 0.0}
 
     def get_totals(self, obj):
-        per100 = self.get_per100(obj)
-        factor = float(obj.quantity or 0.0) / 100.0
-        return {k: round(v * factor, 2) for k, v in per100.items()}
+        # snapshotted on the entry when it was logged (see MealEntry.totals_for)
+        return {k: round(getattr(obj, k), 2) for k in NUTRIENT_FIELDS}
+
+
+_MEAL_TIME = serializers.DateTimeField()  # same rendering (timezone, ISO 8601, "Z") as the model serializer
+
+
+class MealEntryReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for MealEntryViewSet list/retrieve. Produces exactly what
+    MealEntrySerializer does (same keys, order and values, so byte-identical JSON),
+    but builds each dict in one pass over a `.values(*VALUES)` row instead of going
+    through per-field serializer machinery.
+    """
+    VALUES = (
+        "id", "food_id", "food__name", "food__brand", "quantity", "meal_time", "notes",
+        *NUTRIENT_FIELDS, *(f"food__nutrients__{k}" for k in NUTRIENT_FIELDS),
+    )
+
+    def to_representation(self, row):
+        per100 = {}
+        for k in NUTRIENT_FIELDS:
+            v = row[f"food__nutrients__{k}"]
+            per100[k] = float(v) if v is not None else 0.0
+        quantity, meal_time, notes = row["quantity"], row["meal_time"], row["notes"]
+        return {
+            "id": row["id"],
+            "food": row["food_id"],
+            "food_name": row["food__name"],
+            "brand": row["food__brand"],
+            "quantity": float(quantity) if quantity is not None else None,
+            "meal_time": _MEAL_TIME.to_representation(meal_time) if meal_time is not None else None,
+            "notes": str(notes) if notes is not None else None,
+            "per100": per100,
+            "totals": {k: round(row[k], 2) for k in NUTRIENT_FIELDS},
+        }
+
+
+class MealEntryBatchItemSerializer(serializers.ModelSerializer):
+    """One entry of POST /api/meals/batch/; `food` is a bare id, resolved for the whole batch at once."""
+    food = serializers.IntegerField()
+
+    class Meta:
+        model = MealEntry
+        fields = ("food", "quantity", "meal_time", "notes")
+
+
+class ProfileSerializer(serializers.ModelSerializer):
+    """GET/PUT/PATCH /api/goals/profile: the body stats, plus the daily targets derived from them (read-only)."""
+    targets = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = (*Profile.INPUTS, "timezone", "targets", "targets_updated_at")
+        read_only_fields = ("targets", "targets_updated_at")
+
+    def validate_timezone(self, value):
+        if value:
+            try:
+                ZoneInfo(value)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise serializers.ValidationError("Unknown IANA time zone.")
+        return value
+
+    def get_targets(self, obj):
+        targets = obj.targets
+        return {
+            "calories": round(targets["calories"]),
+            **{
+                m: {k: round(targets[f"{m}{s}"], 1) for k, s in (("target", ""), ("min", "_min"), ("max", "_max"))}
+                for m in goals.MACROS
+            },
+        }
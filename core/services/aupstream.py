@@ -0,0 +1,84 @@
+# core/services/aupstream.py
+"""
+asyncio counterpart of upstream.py for the async views (core/async_views.py).
+
+One keep-alive `httpx.AsyncClient` per host and event loop, the same connect/read
+timeouts and the same retry policy (jittered exponential backoff on 429/5xx for
+idempotent GETs, honouring Retry-After). A request waiting for a free connection
+parks a coroutine rather than a worker thread, so one ASGI worker can keep up to
+UPSTREAM_ASYNC_MAX_IN_FLIGHT lookups per host in flight; waiting longer than
+UPSTREAM_QUEUE_TIMEOUT raises httpx.PoolTimeout.
+"""
+import asyncio
+import random
+import weakref
+
+import httpx
+from django.conf import settings
+
+from .. import metrics
+from .upstream import RETRY_STATUSES, _host_key
+
+# clients are bound to the loop they were created on
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _build_client() -> httpx.AsyncClient:
+    limit = settings.UPSTREAM_ASYNC_MAX_IN_FLIGHT
+    return httpx.AsyncClient(
+        headers={"User-Agent": settings.UPSTREAM_USER_AGENT},
+        timeout=httpx.Timeout(
+            settings.UPSTREAM_READ_TIMEOUT,
+            connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            pool=settings.UPSTREAM_QUEUE_TIMEOUT,
+        ),
+        # limits belong on the transport: the client ignores its own once one is passed.
+        # retries= covers connection failures; status-based retries are handled in get()
+        transport=httpx.AsyncHTTPTransport(
+            retries=settings.UPSTREAM_RETRIES,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+        ),
+    )
+
+
+def _for_host(host: str) -> httpx.AsyncClient:
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(host)
+    if client is None:
+        client = clients[host] = _build_client()
+    return client
+
+
+def _backoff(retry: int, response: httpx.Response) -> float:
+    """Seconds to wait before retry number `retry` (1-based), matching urllib3's Retry schedule."""
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return float(retry_after)
+    if retry <= 1:
+        return 0.0
+    return settings.UPSTREAM_BACKOFF_FACTOR * (2 ** (retry - 1)) + random.random() * settings.UPSTREAM_BACKOFF_JITTER
+
+
+async def get(url: str, params=None, timeout=None, **kwargs) -> httpx.Response:
+    """GET through the pooled client for url's host. `timeout` defaults to the client's (settings) timeouts."""
+    client = _for_host(_host_key(url))
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    retry = 0
+    with metrics.track_upstream(url):
+        while True:
+            response = await client.get(url, params=params, **kwargs)
+            if response.status_code not in RETRY_STATUSES or retry >= settings.UPSTREAM_RETRIES:
+                return response
+            retry += 1
+            await response.aclose()
+            await asyncio.sleep(_backoff(retry, response))
+
+
+async def aclose_all():
+    """Close every client created on the running loop (tests, or on ASGI lifespan shutdown)."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
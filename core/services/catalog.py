@@ -0,0 +1,105 @@
+# core/services/catalog.py
+"""Helpers for writing normalized upstream products into the local Food/Nutrients catalog."""
+from django.db import transaction
+
+from ..models import Food, MealEntry, Nutrients
+from . import meals
+
+NUTRIENT_FIELDS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+_NAME_MAX = Food._meta.get_field("name").max_length
+_BRAND_MAX = Food._meta.get_field("brand").max_length
+
+
+def _to_float(v):
+    try:
+        return float(v) if v not in ("", None) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def off_food_fields(data: dict, barcode: str):
+    """
+    Split a normalize_off_payload() result into (food_fields, nutrients_fields)
+    ready for Food(**...) / Nutrients(**...).
+    """
+    nd = data.get("nutrients") or {}
+    brand = data.get("brand")
+    food_fields = {
+        # clipped to the column sizes: one over-long value would fail a whole bulk insert
+        "name": (data.get("name") or "Unknown")[:_NAME_MAX],
+        "brand": brand[:_BRAND_MAX] if brand else brand,
+        "barcode": barcode,
+        "data_source": "OFF",
+    }
+    nutrients_fields = {key: _to_float(nd.get(key)) for key in NUTRIENT_FIELDS}
+    return food_fields, nutrients_fields
+
+
+def bulk_create_foods(items) -> list[Food]:
+    """
+    Insert many (food_fields, nutrients_fields) pairs with one bulk_create per table,
+    in a single transaction. Returns the created Food rows with `nutrients` attached.
+    """
+    items = list(items)
+    if not items:
+        return []
+    with transaction.atomic():
+        nutrients = Nutrients.objects.bulk_create([Nutrients(**nf) for _, nf in items])
+        foods = Food.objects.bulk_create([
+            Food(nutrients=n, **ff) for (ff, _), n in zip(items, nutrients)
+        ])
+    return foods
+
+
+def bulk_upsert_foods(items, key: str) -> tuple[int, int]:
+    """
+    Upsert (food_fields, nutrients_fields) pairs on Food's unique `key` ("barcode" or
+    "fdc_id"): one query to find existing rows, bulk_update for the ones whose values
+    changed, bulk_create for the rest, all in one transaction. Later duplicates of a key
+    win. Users who logged a changed food get their data version bumped (their meal lists
+    show the new per-100g values); logged totals and rollups are snapshots and stay as
+    they were until meals.resnapshot_entries() applies the change.
+    Returns (created, updated).
+    """
+    by_key = {}
+    for ff, nf in items:
+        if ff.get(key):
+            by_key[ff[key]] = (ff, nf)
+    if not by_key:
+        return 0, 0
+
+    with transaction.atomic():
+        existing = {
+            getattr(f, key): f
+            for f in Food.objects.select_related("nutrients").filter(**{f"{key}__in": list(by_key)})
+        }
+        changed_foods, changed_nutrients, food_cols, nutrient_cols = [], [], set(), set()
+        updated = set()
+        for k, food in existing.items():
+            ff, nf = by_key.pop(k)
+            food_diff = {f: v for f, v in ff.items() if getattr(food, f) != v}
+            nut_diff = {f: v for f, v in nf.items() if getattr(food.nutrients, f) != v}
+            for f, v in food_diff.items():
+                setattr(food, f, v)
+            for f, v in nut_diff.items():
+                setattr(food.nutrients, f, v)
+            if food_diff or nut_diff:
+                updated.add(food.pk)
+            if food_diff:
+                changed_foods.append(food)
+                food_cols.update(food_diff)
+            if nut_diff:
+                changed_nutrients.append(food.nutrients)
+                nutrient_cols.update(nut_diff)
+        if changed_foods:
+            Food.objects.bulk_update(changed_foods, sorted(food_cols), batch_size=1000)
+            # renamed/rebranded foods show up in their loggers' meal lists
+            meals.bump_data_version(MealEntry.objects.filter(food__in=changed_foods).values("user"))
+        if changed_nutrients:
+            Nutrients.objects.bulk_update(changed_nutrients, sorted(nutrient_cols), batch_size=1000)
+            # logged entries keep their snapshotted totals; per100 in meal lists changes
+            meals.bump_data_version(
+                MealEntry.objects.filter(food__nutrients__in=[n.pk for n in changed_nutrients]).values("user")
+            )
+        created = bulk_create_foods(by_key.values())
+    return len(created), len(updated)
@@ -1,17 +1,120 @@
+import hashlib
 import os
-import requests
+from django.conf import settings
+from django.core.cache import caches
+
+from . import aupstream
+from . import nutrients as nutrient_map
+from . import upstream
 
 FDC_API_KEY = os.environ.get('FDC_API_KEY', '')
-FDC_BASE = 'https://api.nal.usda.gov/fdc/v1/'
+FDC_BASE = settings.FDC_BASE_URL.rstrip('/') + '/'
+
+# Responses are cached in the shared "upstream" cache (LRU-bounded, see settings.CACHES).
+CACHE_ALIAS = 'upstream'
+
+
+def _search_key(query, page_number, page_size):
+    """Case/whitespace-insensitive key so 'Chicken  Breast' and 'chicken breast' share an entry."""
+    q = ' '.join(str(query).lower().split())
+    digest = hashlib.sha1(f'{q}|{int(page_number)}|{int(page_size)}'.encode()).hexdigest()
+    return f'fdc:search:{digest}'
+
+
+def _detail_key(fdc_id):
+    return f'fdc:food:{str(fdc_id).strip()}'
+
+
+def _search_params(query, page_number, page_size):
+    return {
+        'query': ' '.join(str(query).split()),
+        'pageNumber': int(page_number),
+        'pageSize': int(page_size),
+        'api_key': FDC_API_KEY,
+    }
+
+
+def search_foods(query, page_number=1, page_size=50):
+    if not FDC_API_KEY:
+        return {'error': 'FDC_API_KEY not set'}, 501
+    cache = caches[CACHE_ALIAS]
+    key = _search_key(query, page_number, page_size)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    resp = upstream.get(FDC_BASE + 'foods/search', params=_search_params(query, page_number, page_size))
+    data = resp.json()
+    if resp.ok:
+        cache.set(key, data, settings.FDC_SEARCH_CACHE_TTL)
+    return data
 
-def search_foods(query):
+
+async def asearch_foods(query, page_number=1, page_size=50):
+    """search_foods() on the async client."""
     if not FDC_API_KEY:
         return {'error': 'FDC_API_KEY not set'}, 501
-    resp = requests.get(FDC_BASE + 'foods/search', params={'query': query, 'api_key': FDC_API_KEY})
-    return resp.json()
+    cache = caches[CACHE_ALIAS]
+    key = _search_key(query, page_number, page_size)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+    resp = await aupstream.get(FDC_BASE + 'foods/search', params=_search_params(query, page_number, page_size))
+    data = resp.json()
+    if resp.is_success:
+        await cache.aset(key, data, settings.FDC_SEARCH_CACHE_TTL)
+    return data
+
 
 def get_food_details(fdc_id):
     if not FDC_API_KEY:
         return {'error': 'FDC_API_KEY not set'}, 501
-    resp = requests.get(FDC_BASE + f'food/{fdc_id}', params={'api_key': FDC_API_KEY})
-    return resp.json()
+    cache = caches[CACHE_ALIAS]
+    key = _detail_key(fdc_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    resp = upstream.get(FDC_BASE + f'food/{fdc_id}', params={'api_key': FDC_API_KEY})
+    data = resp.json()
+    if resp.ok and data:
+        cache.set(key, data, settings.FDC_DETAIL_CACHE_TTL)
+    return data
+
+
+async def aget_food_details(fdc_id):
+    """get_food_details() on the async client."""
+    if not FDC_API_KEY:
+        return {'error': 'FDC_API_KEY not set'}, 501
+    cache = caches[CACHE_ALIAS]
+    key = _detail_key(fdc_id)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+    resp = await aupstream.get(FDC_BASE + f'food/{fdc_id}', params={'api_key': FDC_API_KEY})
+    data = resp.json()
+    if resp.is_success and data:
+        await cache.aset(key, data, settings.FDC_DETAIL_CACHE_TTL)
+    return data
+
+
+def _food_fields(data):
+    return {
+        'name': data.get('description', ''),
+        'brand': data.get('brandOwner', ''),
+        'fdc_id': str(data.get('fdcId', '')),
+        'data_source': 'FDC',
+    }
+
+
+def parse_food_payload(data):
+    """
+    Map an FDC food payload (description, brandOwner, foodNutrients) to
+    (food_fields, nutrients_fields) for our Food / Nutrients models.
+    Nutrients are matched by FDC nutrient id via the compiled mapping engine.
+    """
+    return _food_fields(data), nutrient_map.FDC.map(data.get('foodNutrients'))
+
+
+def parse_food_payloads(payloads):
+    """Batch parse_food_payload() for bulk imports."""
+    payloads = list(payloads)
+    return list(zip(map(_food_fields, payloads), nutrient_map.FDC.map_many(payloads)))
@@ -11,3 +11,56 @@ def amdr(calories):
         'fat': (0.20 * calories / 9, 0.35 * calories / 9),
         'carbs': (0.45 * calories / 4, 0.65 * calories / 4),
     }
+
+
+MACROS = ("protein", "fat", "carbs")
+# keys of targets(): daily kcal, then per macro the AMDR band midpoint and its bounds (g)
+TARGET_KEYS = ("calories",) + tuple(f"{m}{suffix}" for m in MACROS for suffix in ("", "_min", "_max"))
+
+
+def targets(weight_kg, height_cm, age, sex, activity_factor=1.2):
+    """Daily targets for one person: maintenance kcal, and grams per macro (band midpoint, min, max)."""
+    calories = mifflin_st_jeor(weight_kg, height_cm, age, sex, activity_factor)
+    out = {"calories": calories}
+    for macro, (low, high) in amdr(calories).items():
+        out[macro] = (low + high) / 2
+        out[f"{macro}_min"] = low
+        out[f"{macro}_max"] = high
+    return out
+
+
+def band_status(value, low, high):
+    if value < low:
+        return "below"
+    if value > high:
+        return "above"
+    return "within"
+
+
+def progress(targets: dict, days: list) -> list:
+    """
+    Target vs. actual for each day. `targets` as returned by targets(); `days` is a
+    list of {"date", "entries", "totals"} (e.g. meals.trends() day buckets). The
+    targets are the same for every day, so this is one pass with no per-day lookups.
+    """
+    bands = {m: (targets[f"{m}_min"], targets[f"{m}_max"]) for m in MACROS}
+    out = []
+    for day in days:
+        totals = day["totals"]
+        out.append({
+            "date": day["date"],
+            "entries": day["entries"],
+            "calories": {
+                "actual": totals["calories"],
+                "target": targets["calories"],
+                "remaining": targets["calories"] - totals["calories"],
+            },
+            "macros": {
+                m: {
+                    "actual": totals[m], "target": targets[m], "min": low, "max": high,
+                    "status": band_status(totals[m], low, high),
+                }
+                for m, (low, high) in bands.items()
+            },
+        })
+    return out
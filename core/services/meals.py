@@ -0,0 +1,277 @@
+# core/services/meals.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_tz
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from ..models import NUTRIENT_FIELDS, DailyTotals, Food, MealDataVersion, MealEntry, Nutrients, Profile, TrainerClient
+
+SNAPSHOT_BATCH_SIZE = 5000  # entries re-snapshotted per transaction
+
+
+def utc_window(day, tz: ZoneInfo):
+    """Return the half-open [start_utc, end_utc) covering local calendar `day` in `tz`."""
+    start_local = datetime.combine(day, time.min, tzinfo=tz)
+    next_day_local = start_local + timedelta(days=1)
+    return start_local.astimezone(dt_tz.utc), next_day_local.astimezone(dt_tz.utc)
+
+
+def totals_aggregates() -> dict:
+    """Sum() expressions over MealEntry for every nutrient, from the entries' snapshotted totals (no joins)."""
+    return {key: Sum(key) for key in NUTRIENT_FIELDS}
+
+
+def compute_daily_totals(user, day, tz: ZoneInfo) -> dict:
+    """Live recompute of one local day straight from MealEntry (single aggregate query)."""
+    start_utc, end_utc = utc_window(day, tz)
+    agg = (
+        MealEntry.objects
+        .filter(user=user, meal_time__gte=start_utc, meal_time__lt=end_utc)
+        .aggregate(entries=Count("id"), **totals_aggregates())
+    )
+    entries = agg.pop("entries")
+    return {"entries": entries, **{k: float(v or 0.0) for k, v in agg.items()}}
+
+
+TREND_GRANULARITIES = ("day", "week", "month")
+
+_TRENDS_SQL = """
+WITH per_day AS (
+    SELECT (me.meal_time AT TIME ZONE %(tz)s)::date AS day, COUNT(*) AS entries, {day_sums}
+    FROM {entry} me
+    WHERE me.user_id = %(user)s AND me.meal_time >= %(start_utc)s AND me.meal_time < %(end_utc)s
+    GROUP BY 1
+),
+days AS (
+    SELECT s.day::date AS day, d.day IS NOT NULL AS logged, COALESCE(d.entries, 0) AS entries, {day_values},
+           {rolling}
+    FROM generate_series(%(warmup)s::date, %(end)s::date, interval '1 day') AS s(day)
+    LEFT JOIN per_day d ON d.day = s.day::date
+    WINDOW last7 AS (ORDER BY s.day ROWS BETWEEN 6 PRECEDING AND CURRENT ROW)
+)
+SELECT date_trunc(%(granularity)s, day)::date AS bucket, COUNT(*) AS days,
+       COUNT(*) FILTER (WHERE logged) AS days_logged, SUM(entries) AS entries, {bucket_sums},
+       {bucket_rolling}
+FROM days
+WHERE day >= %(start)s
+GROUP BY 1
+ORDER BY 1
+"""
+
+
+def _trends_sql() -> str:
+    fields = NUTRIENT_FIELDS
+    return _TRENDS_SQL.format(
+        entry=MealEntry._meta.db_table,
+        day_sums=", ".join(f"SUM(me.{k}) AS {k}" for k in fields),
+        day_values=", ".join(f"COALESCE(d.{k}, 0) AS {k}" for k in fields),
+        # trailing 7-day mean over the days that have entries (unlogged days aren't zero-intake days)
+        rolling=", ".join(
+            f"SUM(COALESCE(d.{k}, 0)) OVER last7 / NULLIF(COUNT(d.day) OVER last7, 0) AS {k}_avg7" for k in fields
+        ),
+        bucket_sums=", ".join(f"SUM({k}) AS {k}" for k in fields),
+        # the rolling average as of the bucket's last day in range
+        bucket_rolling=", ".join(f"(array_agg({k}_avg7 ORDER BY day DESC))[1] AS {k}_avg7" for k in fields),
+    )
+
+
+def trends(user, start, end, tz: ZoneInfo, granularity: str = "day") -> list[dict]:
+    """
+    Per-bucket totals, days logged and rolling 7-day averages for local days start..end
+    (inclusive) in `tz`, bucketed by day, week (ISO, Monday start) or month. One query:
+    entries are grouped into local days with AT TIME ZONE, gap-filled with
+    generate_series, averaged with a window and rolled up into buckets. The window sees
+    the 6 days before `start`, so the first buckets' averages are complete too.
+    """
+    if granularity not in TREND_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {TREND_GRANULARITIES}")
+    warmup = start - timedelta(days=6)
+    params = {
+        "tz": tz.key, "user": user.pk, "granularity": granularity,
+        "start": start, "end": end, "warmup": warmup,
+        "start_utc": utc_window(warmup, tz)[0], "end_utc": utc_window(end, tz)[1],
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(_trends_sql(), params)
+        columns = [c.name for c in cursor.description]
+        rows = [dict(zip(columns, r)) for r in cursor.fetchall()]
+    return [
+        {
+            "bucket": r["bucket"],
+            "days": r["days"],
+            "days_logged": r["days_logged"],
+            "entries": int(r["entries"]),
+            "totals": {k: float(r[k]) for k in NUTRIENT_FIELDS},
+            "avg7": {k: float(r[f"{k}_avg7"]) if r[f"{k}_avg7"] is not None else None for k in NUTRIENT_FIELDS},
+        }
+        for r in rows
+    ]
+
+
+_CLIENTS_SUMMARY_SQL = """
+WITH clients AS (
+    SELECT tc.client_id, u.username, COALESCE(NULLIF(p.timezone, ''), %(default_tz)s) AS tz
+    FROM {link} tc
+    JOIN {user} u ON u.id = tc.client_id
+    LEFT JOIN {profile} p ON p.user_id = tc.client_id
+    WHERE tc.trainer_id = %(trainer)s
+)
+SELECT c.client_id, c.username, c.tz, COUNT(me.id) AS entries, {sums},
+       (SELECT MAX(last.meal_time) FROM {entry} last WHERE last.user_id = c.client_id) AS last_logged_at
+FROM clients c
+LEFT JOIN {entry} me ON me.user_id = c.client_id
+    AND me.meal_time >= (%(day)s::date::timestamp AT TIME ZONE c.tz)
+    AND me.meal_time < ((%(day)s::date + 1)::timestamp AT TIME ZONE c.tz)
+GROUP BY c.client_id, c.username, c.tz
+ORDER BY c.username, c.client_id
+"""
+
+
+def clients_summary(trainer, day, default_tz: ZoneInfo) -> list[dict]:
+    """
+    Totals and entry count for local calendar `day` for every client of `trainer`,
+    each client's day taken in their own Profile.timezone (default_tz if unset), plus
+    when they last logged anything. One grouped query for the whole roster; every
+    client's day is an index range on (user, meal_time).
+    """
+    sql = _CLIENTS_SUMMARY_SQL.format(
+        link=TrainerClient._meta.db_table, user=get_user_model()._meta.db_table,
+        profile=Profile._meta.db_table, entry=MealEntry._meta.db_table,
+        sums=", ".join(f"COALESCE(SUM(me.{k}), 0) AS {k}" for k in NUTRIENT_FIELDS),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"trainer": trainer.pk, "day": day, "default_tz": default_tz.key})
+        columns = [c.name for c in cursor.description]
+        rows = [dict(zip(columns, r)) for r in cursor.fetchall()]
+    return [
+        {
+            "client": r["client_id"],
+            "username": r["username"],
+            "timezone": r["tz"],
+            "entries": r["entries"],
+            "last_logged_at": r["last_logged_at"],
+            "totals": {k: float(r[k]) for k in NUTRIENT_FIELDS},
+        }
+        for r in rows
+    ]
+
+
+def _lock_user(user):
+    """
+    Serialize rollup maintenance per user. Writers fold deltas into existing rows and
+    readers materialize missing rows under the same row lock, so a first read can never
+    race a concurrent write into a stale row.
+    """
+    get_user_model().objects.select_for_update().filter(pk=user.pk).values_list("pk").first()
+
+
+def get_daily_totals(user, day, tz: ZoneInfo) -> DailyTotals:
+    """Return the rollup row for (user, day, tz), materializing it from MealEntry on first read."""
+    row = DailyTotals.objects.filter(user=user, date=day, timezone=tz.key).first()
+    if row is not None:
+        return row
+    with transaction.atomic():
+        _lock_user(user)
+        row = DailyTotals.objects.filter(user=user, date=day, timezone=tz.key).first()
+        if row is None:
+            row = DailyTotals.objects.create(
+                user=user, date=day, timezone=tz.key, **compute_daily_totals(user, day, tz)
+            )
+    return row
+
+
+def entry_snapshot(entry: MealEntry):
+    """(meal_time, per-nutrient totals) for one entry, as it contributes to a day's rollup."""
+    return entry.meal_time, {key: getattr(entry, key) for key in NUTRIENT_FIELDS}
+
+
+_RESNAPSHOT_SQL = """
+UPDATE {entry} me SET {assignments}
+FROM {food} f JOIN {nutrients} n ON n.id = f.nutrients_id
+WHERE f.id = me.food_id AND me.id = ANY(%s)
+"""
+
+
+def resnapshot_entries(entries) -> int:
+    """
+    Recompute the snapshotted totals of `entries` (a MealEntry queryset) from their foods'
+    current per-100g values, e.g. after a food's nutrients were corrected. Runs one UPDATE
+    per SNAPSHOT_BATCH_SIZE entries, each in its own transaction together with dropping the
+    owners' rollups (rebuilt on next read). Returns the number of entries.
+    """
+    ids = list(entries.order_by("id").values_list("id", flat=True))
+    sql = _RESNAPSHOT_SQL.format(
+        entry=MealEntry._meta.db_table, food=Food._meta.db_table, nutrients=Nutrients._meta.db_table,
+        # same arithmetic as MealEntry.totals_for, so a re-snapshot of unchanged values is a no-op
+        assignments=", ".join(f"{k} = COALESCE(n.{k} * (me.quantity / 100.0), 0)" for k in NUTRIENT_FIELDS),
+    )
+    for i in range(0, len(ids), SNAPSHOT_BATCH_SIZE):
+        batch = ids[i:i + SNAPSHOT_BATCH_SIZE]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [batch])
+            invalidate_daily_totals(MealEntry.objects.filter(id__in=batch))
+    return len(ids)
+
+
+def apply_entry_changes(user, added=(), removed=()):
+    """
+    Fold entry snapshots (see `entry_snapshot`) into the user's existing DailyTotals rows.
+    Updates pass the pre-save snapshot as `removed` and the saved one as `added`, which also
+    covers entries moved to another day. Days without a row are left alone; they are
+    computed on first read. Call inside the transaction that wrote the entries.
+    """
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        _lock_user(user)
+        bump_data_version([user.pk])
+        zones = list(
+            DailyTotals.objects.filter(user=user).values_list("timezone", flat=True).distinct()
+        )
+        if not zones:
+            return
+
+        deltas = defaultdict(lambda: dict.fromkeys(NUTRIENT_FIELDS, 0.0) | {"entries": 0})
+        for sign, snapshots in ((1, added), (-1, removed)):
+            for meal_time, totals in snapshots:
+                for tz_name in zones:
+                    delta = deltas[(tz_name, meal_time.astimezone(ZoneInfo(tz_name)).date())]
+                    delta["entries"] += sign
+                    for key in NUTRIENT_FIELDS:
+                        delta[key] += sign * totals[key]
+
+        for (tz_name, day), delta in deltas.items():
+            if not any(delta.values()):
+                continue
+            DailyTotals.objects.filter(user=user, timezone=tz_name, date=day).update(
+                **{key: F(key) + val for key, val in delta.items()}
+            )
+
+
+def invalidate_daily_totals(entries):
+    """
+    Drop every rollup of the users owning `entries` (a MealEntry queryset). Used when
+    entry snapshots are rewritten or entries disappear outside the viewset (e.g. cascades);
+    the rows are rebuilt lazily on the next read. Also advances those users' data version.
+    """
+    bump_data_version(entries.values("user"))
+    return DailyTotals.objects.filter(user__in=entries.values("user")).delete()
+
+
+def get_data_version(user) -> MealDataVersion:
+    """
+    The user's meal data version, created on first read. Since no ETag is handed out
+    before the row exists, writes that found no row to bump can't leave a stale one behind.
+    """
+    row, _ = MealDataVersion.objects.get_or_create(user=user)
+    return row
+
+
+def bump_data_version(users):
+    """Advance the meal data version of `users` (ids or a values("user") subquery) after a change."""
+    MealDataVersion.objects.filter(user__in=users).update(version=F("version") + 1, updated_at=timezone.now())
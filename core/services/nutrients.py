@@ -0,0 +1,166 @@
+# core/services/nutrients.py
+"""
+Nutrient mapping shared by the FDC and OFF normalizers.
+
+Rules are compiled once at import into flat lookup tables, so mapping a food is a
+single pass over its nutrient rows with O(1) lookups instead of substring-scanning
+every nutrient name for every target field. FDC rows are matched by nutrient id
+(falling back to the legacy SR nutrient number, then to the exact nutrient name),
+which keeps "fatty acids, total saturated" out of `fat` and the kJ energy row out
+of `calories`. Values are converted to the units our Nutrients model stores.
+"""
+
+# Units stored on Nutrients (per 100 g)
+TARGET_UNITS = {
+    "calories": "KCAL", "protein": "G", "carbs": "G", "fat": "G",
+    "fiber": "G", "sugar": "G", "sodium": "MG",
+}
+NUTRIENT_FIELDS = tuple(TARGET_UNITS)
+
+_UNIT_FACTORS = {
+    ("KCAL", "KCAL"): 1.0,
+    ("KJ", "KCAL"): 1 / 4.184,
+    ("G", "G"): 1.0,
+    ("MG", "G"): 1e-3,
+    ("UG", "G"): 1e-6,
+    ("G", "MG"): 1e3,
+    ("MG", "MG"): 1.0,
+    ("UG", "MG"): 1e-3,
+}
+
+# FDC nutrients per field, most preferred first: (nutrient id, legacy SR number, name, unit)
+FDC_RULES = {
+    "calories": (
+        (1008, "208", "energy", "KCAL"),
+        (2047, "957", "energy (atwater general factors)", "KCAL"),
+        (2048, "958", "energy (atwater specific factors)", "KCAL"),
+        (1062, "268", "energy", "KJ"),
+    ),
+    "protein": ((1003, "203", "protein", "G"),),
+    "fat": ((1004, "204", "total lipid (fat)", "G"),),
+    "carbs": (
+        (1005, "205", "carbohydrate, by difference", "G"),
+        (1050, "205.2", "carbohydrate, by summation", "G"),
+    ),
+    "fiber": ((1079, "291", "fiber, total dietary", "G"),),
+    "sugar": (
+        (2000, "269", "sugars, total", "G"),
+        (1063, "269.3", "sugars, total nlea", "G"),
+        (2000, "269", "total sugars", "G"),
+        (2000, "269", "sugars, total including nlea", "G"),
+    ),
+    "sodium": ((1093, "307", "sodium, na", "MG"),),
+}
+
+# OFF nutriments keys per field, most preferred first: (key, unit)
+OFF_RULES = {
+    "calories": (
+        ("energy-kcal_100g", "KCAL"), ("energy-kcal_serving", "KCAL"),
+        ("calories_100g", "KCAL"), ("calories", "KCAL"),
+        ("energy-kj_100g", "KJ"), ("energy-kj_serving", "KJ"),
+        ("energy_100g", "KJ"), ("energy_serving", "KJ"),
+    ),
+    "protein": (("proteins_100g", "G"), ("protein_100g", "G"), ("proteins_serving", "G"),
+                ("protein_serving", "G"), ("protein", "G")),
+    "carbs": (("carbohydrates_100g", "G"), ("carbs_100g", "G"), ("carbohydrates_serving", "G"),
+              ("carbs_serving", "G"), ("carbs", "G")),
+    "fat": (("fat_100g", "G"), ("fat_serving", "G"), ("fat", "G")),
+    "fiber": (("fiber_100g", "G"), ("fiber_serving", "G"), ("fiber", "G")),
+    "sugar": (("sugars_100g", "G"), ("sugar_100g", "G"), ("sugars_serving", "G"),
+              ("sugar_serving", "G"), ("sugars", "G"), ("sugar", "G")),
+    "sodium": (("sodium_100g", "G"), ("sodium_serving", "G"), ("sodium", "G")),
+}
+
+
+def to_number(v):
+    """Coerce numbers or numeric strings ('3,5') to float; else None."""
+    if v in (None, "", "null"):
+        return None
+    try:
+        return float(str(v).replace(",", "."))
+    except Exception:
+        return None
+
+
+def convert(value, unit, field):
+    """Convert `value` in `unit` to the unit stored for `field`; None if the pair is unknown."""
+    factor = _UNIT_FACTORS.get(((unit or "").upper(), TARGET_UNITS[field]))
+    return None if factor is None else value * factor
+
+
+class FdcNutrientMapper:
+    """Compiled FDC nutrient-row -> Nutrients-field mapping."""
+
+    def __init__(self, rules=FDC_RULES):
+        # every lookup resolves to (field, rank, default unit); lower rank wins
+        self.by_id, self.by_number, self.by_name = {}, {}, {}
+        for field, candidates in rules.items():
+            for rank, (nutrient_id, number, name, unit) in enumerate(candidates):
+                target = (field, rank, unit)
+                self.by_id.setdefault(nutrient_id, target)
+                self.by_number.setdefault(number, target)
+                self.by_name.setdefault((name, unit), target)
+                self.by_name.setdefault((name, None), target)
+
+    def _resolve(self, row):
+        """(target, value, unit) for one foodNutrients row in any FDC format (search, abridged, full)."""
+        nested = row.get("nutrient")
+        if isinstance(nested, dict):
+            nutrient_id, number, name, unit = nested.get("id"), nested.get("number"), nested.get("name"), nested.get("unitName")
+        else:
+            nutrient_id = row.get("nutrientId")
+            number = row.get("nutrientNumber") or row.get("number")
+            name = row.get("nutrientName") or row.get("name")
+            unit = row.get("unitName")
+        unit = unit.upper() if unit else None
+        target = self.by_id.get(nutrient_id) if nutrient_id is not None else None
+        if target is None and number is not None:
+            target = self.by_number.get(str(number))
+        if target is None and name:
+            key = name.strip().lower()
+            target = self.by_name.get((key, unit)) or self.by_name.get((key, None))
+        value = row.get("value", row.get("amount"))
+        return target, value, unit
+
+    def map(self, food_nutrients, default=0.0) -> dict:
+        best = {}
+        for row in food_nutrients or ():
+            target, value, unit = self._resolve(row)
+            if target is None or value is None:
+                continue
+            field, rank, rule_unit = target
+            if field in best and best[field][0] <= rank:
+                continue
+            converted = convert(float(value), unit or rule_unit, field)
+            if converted is not None:
+                best[field] = (rank, converted)
+        return {field: best[field][1] if field in best else default for field in NUTRIENT_FIELDS}
+
+    def map_many(self, payloads, default=0.0) -> list[dict]:
+        """Map many FDC food payloads' foodNutrients in one call (bulk loaders)."""
+        return [self.map(p.get("foodNutrients"), default) for p in payloads]
+
+
+class OffNutrientMapper:
+    """Compiled OFF nutriments -> Nutrients-field mapping (first parseable key wins)."""
+
+    def __init__(self, rules=OFF_RULES):
+        self.rules = tuple((field, tuple(candidates)) for field, candidates in rules.items())
+
+    def map(self, nutriments) -> dict:
+        out = {}
+        for field, candidates in self.rules:
+            out[field] = None
+            for key, unit in candidates:
+                value = to_number(nutriments.get(key))
+                if value is not None:
+                    out[field] = convert(value, unit, field)
+                    break
+        return out
+
+    def map_many(self, nutriments_list) -> list[dict]:
+        return [self.map(n) for n in nutriments_list]
+
+
+FDC = FdcNutrientMapper()
+OFF = OffNutrientMapper()
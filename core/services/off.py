@@ -1,22 +1,160 @@
 # core/services/off.py
-import requests
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models import BarcodeLookup
+from . import aupstream
+from . import nutrients as nutrient_map
+from . import upstream
+
+
+def normalize_barcode(code: str) -> str:
+    """Digits only; UPC-A (12) is widened to EAN-13 by prefixing a '0'."""
+    c = re.sub(r'\D', '', str(code or ''))
+    if len(c) == 12:
+        return '0' + c
+    return c
+
+
+def _product_url(code: str) -> str:
+    return f"{settings.OFF_BASE_URL.rstrip('/')}/api/v0/product/{code}.json"
+
 
 def lookup_barcode(code: str) -> dict:
     """Fetch raw OFF JSON for a barcode."""
-    url = f"https://world.openfoodfacts.org/api/v0/product/{code}.json"
-    resp = requests.get(url, timeout=10)
+    resp = upstream.get(_product_url(code))
     resp.raise_for_status()
     return resp.json()
 
 
-def _num(v):
-    """Coerce OFF numeric strings ('3,5') or numbers to float; else None."""
-    if v in (None, "", "null"):
-        return None
+async def alookup_barcode(code: str) -> dict:
+    """lookup_barcode() on the async client."""
+    resp = await aupstream.get(_product_url(code))
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _is_fresh(row: BarcodeLookup) -> bool:
+    ttl = settings.OFF_CACHE_TTL if row.found else settings.OFF_CACHE_NEGATIVE_TTL
+    return timezone.now() - row.fetched_at < timedelta(seconds=ttl)
+
+
+def _cache_read(key: str):
+    """(row, fresh) for a normalized barcode; a fresh row counts as a hit."""
+    row = BarcodeLookup.objects.filter(barcode=key).first()
+    if row is not None and _is_fresh(row):
+        BarcodeLookup.objects.filter(pk=row.pk).update(hits=F("hits") + 1)
+        return row, True
+    return row, False
+
+
+def _cache_write(key: str, row, raw) -> None:
+    """Store a fetched payload as a miss, creating the row or refreshing `row` / a racing worker's row."""
+    fields = {
+        "payload": raw,
+        "found": not (isinstance(raw, dict) and raw.get("status") == 0),
+        "fetched_at": timezone.now(),
+    }
+    if row is None:
+        try:
+            with transaction.atomic():
+                BarcodeLookup.objects.create(barcode=key, misses=1, **fields)
+            return
+        except IntegrityError:
+            pass  # another worker cached it first; refresh theirs below
+    BarcodeLookup.objects.filter(barcode=key).update(misses=F("misses") + 1, **fields)
+
+
+def lookup_barcode_cached(code: str) -> dict:
+    """
+    lookup_barcode() behind the BarcodeLookup table, keyed by normalized barcode.
+    Found products live for OFF_CACHE_TTL, "status: 0" results for OFF_CACHE_NEGATIVE_TTL.
+    Upstream errors are raised and never cached.
+    """
+    key = normalize_barcode(code)
+    if not key:
+        return lookup_barcode(code)
+
+    row, fresh = _cache_read(key)
+    if fresh:
+        return row.payload
+    raw = lookup_barcode(key)
+    _cache_write(key, row, raw)
+    return raw
+
+
+async def alookup_barcode_cached(code: str) -> dict:
+    """lookup_barcode_cached() for async views: the OFF round trip is awaited, cache rows are read/written in a thread."""
+    key = normalize_barcode(code)
+    if not key:
+        return await alookup_barcode(code)
+
+    row, fresh = await sync_to_async(_cache_read)(key)
+    if fresh:
+        return row.payload
+    raw = await alookup_barcode(key)
+    await sync_to_async(_cache_write)(key, row, raw)
+    return raw
+
+
+def _fetch_or_error(code: str):
     try:
-        return float(str(v).replace(",", "."))
-    except Exception:
-        return None
+        return lookup_barcode(code)
+    except Exception as e:
+        return e
+
+
+def lookup_barcodes_cached(codes, max_workers: int = 8) -> dict:
+    """
+    Bulk lookup_barcode_cached(): one query for the cached rows, concurrent OFF fetches
+    (bounded thread pool, HTTP only) for the missing/expired ones, then batched cache
+    writes. Returns {normalized_code: raw payload or the Exception that fetch raised}.
+    """
+    keys = list(dict.fromkeys(k for k in map(normalize_barcode, codes) if k))
+    rows = {r.barcode: r for r in BarcodeLookup.objects.filter(barcode__in=keys)}
+
+    results = {k: rows[k].payload for k in keys if k in rows and _is_fresh(rows[k])}
+    if results:
+        BarcodeLookup.objects.filter(barcode__in=list(results)).update(hits=F("hits") + 1)
+
+    stale = [k for k in keys if k not in results]
+    if not stale:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(stale)))) as pool:
+        # each fetch runs in a copy of our context, so it is counted against the calling request
+        futures = [pool.submit(contextvars.copy_context().run, _fetch_or_error, key) for key in stale]
+        fetched = dict(zip(stale, (f.result() for f in futures)))
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for key, raw in fetched.items():
+        results[key] = raw
+        if isinstance(raw, Exception):
+            continue
+        found = not (isinstance(raw, dict) and raw.get("status") == 0)
+        row = rows.get(key)
+        if row is None:
+            to_create.append(BarcodeLookup(barcode=key, payload=raw, found=found, fetched_at=now, misses=1))
+        else:
+            row.payload, row.found, row.fetched_at, row.misses = raw, found, now, row.misses + 1
+            to_update.append(row)
+    BarcodeLookup.objects.bulk_update(to_update, ["payload", "found", "fetched_at", "misses"])
+    BarcodeLookup.objects.bulk_create(to_create, ignore_conflicts=True)
+    return results
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters summed over every cached barcode."""
+    agg = BarcodeLookup.objects.aggregate(hits=Sum("hits"), misses=Sum("misses"))
+    return {"hits": agg["hits"] or 0, "misses": agg["misses"] or 0}
 
 
 def _first(d: dict, *keys):
@@ -57,39 +195,18 @@ def normalize_off_payload(off_raw: dict) -> dict | None:
     if isinstance(brand, str) and "," in brand:
         brand = brand.split(",")[0].strip()
 
-    # Energy kcal (fallback from kJ)
-    kcal = _first(nutr, "energy-kcal_100g", "energy-kcal_serving", "calories_100g", "calories")
-    if kcal is None:
-        kj = _first(nutr, "energy-kj_100g", "energy-kj_serving", "energy_100g", "energy_serving")
-        vkj = _num(kj)
-        if vkj is not None:
-            kcal = vkj / 4.184
-
-    # Macros: allow per-100g OR per-serving fallbacks
-    protein = _num(_first(nutr, "proteins_100g", "protein_100g", "proteins_serving", "protein_serving", "protein"))
-    carbs   = _num(_first(nutr, "carbohydrates_100g", "carbs_100g", "carbohydrates_serving", "carbs_serving", "carbs"))
-    fat     = _num(_first(nutr, "fat_100g", "fat_serving", "fat"))
-    fiber   = _num(_first(nutr, "fiber_100g", "fiber_serving", "fiber"))
-    sugar   = _num(_first(nutr, "sugars_100g", "sugar_100g", "sugars_serving", "sugar_serving", "sugars", "sugar"))
-
-    # Sodium: OFF is typically grams → convert to mg for consistency with UI
-    sodium_g  = _num(_first(nutr, "sodium_100g", "sodium_serving", "sodium"))
-    sodium_mg = int(round(sodium_g * 1000)) if sodium_g is not None else None
+    # Energy (kcal, else converted from kJ), macros (per-100g, else per-serving) and
+    # sodium (g -> mg for consistency with UI) via the shared nutrient mapping engine
+    mapped = nutrient_map.OFF.map(nutr if isinstance(nutr, dict) else {})
+    if mapped["sodium"] is not None:
+        mapped["sodium"] = int(round(mapped["sodium"]))
 
     # If literally nothing useful, treat as "not found"
-    if not name and all(v is None for v in (kcal, protein, carbs, fat, fiber, sugar, sodium_mg)):
+    if not name and all(v is None for v in mapped.values()):
         return None
 
     return {
         "name": name or "Unknown",
         "brand": brand,
-        "nutrients": {
-            "calories": _num(kcal),
-            "protein":  protein,
-            "carbs":    carbs,
-            "fat":      fat,
-            "fiber":    fiber,
-            "sugar":    sugar,      # <— singular only
-            "sodium":   sodium_mg,  # mg
-        },
+        "nutrients": mapped,  # calories, protein, carbs, fat, fiber, sugar (singular), sodium (mg)
     }
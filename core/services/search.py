@@ -0,0 +1,87 @@
+# core/services/search.py
+"""Local-first food search: Postgres full-text + trigram ranking over the catalog, FDC as fallback."""
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from ..models import Food
+from . import catalog, fdc
+
+# Must stay identical to the expression indexed in migration 0005 for the GIN index to be used.
+SEARCH_VECTOR = SearchVector("name", "brand", config="simple")
+
+
+def _prefix_query(q: str):
+    """'chick bre' -> chick:* & bre:* so partially typed words still match."""
+    tokens = re.findall(r"\w+", q.lower())
+    if not tokens:
+        return None
+    return SearchQuery(" & ".join(f"{t}:*" for t in tokens), config="simple", search_type="raw")
+
+
+def search_local(q: str, limit: int = 25) -> list[Food]:
+    """Catalog foods matching `q` by full-text prefix or trigram similarity, best first."""
+    query = _prefix_query(q)
+    if query is None:
+        return []
+    return list(
+        Food.objects.select_related("nutrients")
+        .annotate(
+            search=SEARCH_VECTOR,
+            similarity=Greatest(
+                TrigramSimilarity("name", q),
+                TrigramSimilarity(Coalesce("brand", Value("")), q),
+            ),
+        )
+        .filter(Q(search=query) | Q(name__trigram_similar=q) | Q(brand__trigram_similar=q))
+        .annotate(score=SearchRank(SEARCH_VECTOR, query) + F("similarity"))
+        .order_by("-score", "id")[:limit]
+    )
+
+
+def write_through(fdc_foods) -> list[Food]:
+    """Store FDC search hits in the catalog (our compact Food/Nutrients columns only), in FDC order."""
+    items = fdc.parse_food_payloads(f for f in fdc_foods if f.get("fdcId"))
+    if not items:
+        return []
+    catalog.bulk_upsert_foods(items, key="fdc_id")
+    ids = [ff["fdc_id"] for ff, _ in items]
+    by_id = {f.fdc_id: f for f in Food.objects.select_related("nutrients").filter(fdc_id__in=ids)}
+    return [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
+
+
+def _enough(local, limit) -> bool:
+    return len(local) >= min(limit, settings.FOOD_SEARCH_MIN_LOCAL_RESULTS)
+
+
+def _with_remote(local, resp, limit):
+    if isinstance(resp, tuple) or not isinstance(resp, dict):
+        return local, "local"  # FDC not configured
+    remote = write_through(resp.get("foods") or [])
+    seen = {f.pk for f in local}
+    merged = local + [f for f in remote if f.pk not in seen]
+    return merged[:limit], "local+fdc"
+
+
+def search_catalog(q: str, limit: int = 25) -> tuple[list[Food], str]:
+    """
+    Local results first; only when fewer than FOOD_SEARCH_MIN_LOCAL_RESULTS match do we
+    ask FDC, write its hits through and append them. Returns (foods, source).
+    """
+    local = search_local(q, limit)
+    if _enough(local, limit):
+        return local, "local"
+    return _with_remote(local, fdc.search_foods(q, page_size=limit), limit)
+
+
+async def asearch_catalog(q: str, limit: int = 25) -> tuple[list[Food], str]:
+    """search_catalog() for async views: the FDC fallback is awaited, catalog queries run in a thread."""
+    local = await sync_to_async(search_local)(q, limit)
+    if _enough(local, limit):
+        return local, "local"
+    resp = await fdc.asearch_foods(q, page_size=limit)
+    return await sync_to_async(_with_remote)(local, resp, limit)
@@ -0,0 +1,76 @@
+# core/services/singleflight.py
+"""
+Single-flight for imports, across threads, processes and hosts: concurrent callers
+for the same key serialize on a Postgres session-level advisory lock, so the first
+one does the upstream fetch and the insert while the others wait and then pick up
+its row instead of repeating both.
+
+Waiters poll pg_try_advisory_lock rather than blocking in pg_advisory_lock, so the
+async variant parks a coroutine (not a thread) and every wait is bounded by
+IMPORT_LOCK_TIMEOUT. The lock belongs to the DB connection, i.e. the thread.
+"""
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+POLL_INTERVAL = 0.05  # seconds
+
+
+class ImportBusy(Exception):
+    """Another import of the same key held the lock for longer than IMPORT_LOCK_TIMEOUT."""
+
+
+def lock_id(namespace: str, key: str) -> int:
+    """Stable signed 64-bit advisory lock key for (namespace, key)."""
+    digest = hashlib.blake2b(f"{namespace}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _try_lock(lock: int) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock])
+        return cursor.fetchone()[0]
+
+
+def _unlock(lock: int) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [lock])
+
+
+@contextmanager
+def single_flight(namespace: str, key: str):
+    """Hold the import lock for `key`; yields True if another import held it first (re-check before fetching)."""
+    lock = lock_id(namespace, key)
+    deadline = time.monotonic() + settings.IMPORT_LOCK_TIMEOUT
+    waited = False
+    while not _try_lock(lock):
+        if time.monotonic() >= deadline:
+            raise ImportBusy(f"{namespace} {key} is already being imported")
+        waited = True
+        time.sleep(POLL_INTERVAL)
+    try:
+        yield waited
+    finally:
+        _unlock(lock)
+
+
+@asynccontextmanager
+async def asingle_flight(namespace: str, key: str):
+    """single_flight() for async views; lock and unlock run on the request's (thread-sensitive) DB connection."""
+    lock = lock_id(namespace, key)
+    deadline = time.monotonic() + settings.IMPORT_LOCK_TIMEOUT
+    waited = False
+    while not await sync_to_async(_try_lock)(lock):
+        if time.monotonic() >= deadline:
+            raise ImportBusy(f"{namespace} {key} is already being imported")
+        waited = True
+        await asyncio.sleep(POLL_INTERVAL)
+    try:
+        yield waited
+    finally:
+        await sync_to_async(_unlock)(lock)
@@ -0,0 +1,89 @@
+# core/services/upstream.py
+"""
+Shared HTTP client for third-party APIs (Open Food Facts, FoodData Central).
+
+One keep-alive `requests.Session` per host, so repeat lookups reuse the TCP/TLS
+connection instead of handshaking every call. Every request gets explicit
+connect/read timeouts, idempotent GETs are retried with jittered exponential
+backoff on 429/5xx, and in-flight requests are capped per host so a slow
+upstream cannot tie up every worker thread.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .. import metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_sessions: dict[str, requests.Session] = {}
+_slots: dict[str, threading.BoundedSemaphore] = {}
+
+
+class UpstreamBusy(requests.RequestException):
+    """Raised when a host already has UPSTREAM_MAX_IN_FLIGHT requests outstanding for too long."""
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=settings.UPSTREAM_RETRIES,
+        backoff_factor=settings.UPSTREAM_BACKOFF_FACTOR,
+        backoff_jitter=settings.UPSTREAM_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the final 429/5xx back so callers can raise_for_status()
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.UPSTREAM_MAX_IN_FLIGHT,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = settings.UPSTREAM_USER_AGENT
+    return session
+
+
+def _for_host(host: str):
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _build_session()
+            _slots[host] = threading.BoundedSemaphore(settings.UPSTREAM_MAX_IN_FLIGHT)
+        return session, _slots[host]
+
+
+def get(url: str, params=None, timeout=None, **kwargs) -> requests.Response:
+    """GET through the pooled session for url's host. `timeout` defaults to (connect, read) from settings."""
+    host = _host_key(url)
+    session, slots = _for_host(host)
+    if timeout is None:
+        timeout = (settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT)
+    if not slots.acquire(timeout=settings.UPSTREAM_QUEUE_TIMEOUT):
+        raise UpstreamBusy(f"Too many in-flight requests to {host}")
+    try:
+        with metrics.track_upstream(url):
+            return session.get(url, params=params, timeout=timeout, **kwargs)
+    finally:
+        slots.release()
+
+
+def close_all():
+    """Drop every pooled session (tests, or after forking worker processes)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _slots.clear()
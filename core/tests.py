@@ -1,10 +1,44 @@
 import pytest
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
-from .models import Food, Nutrients, MealEntry
+from .models import Food, Nutrients, MealEntry, DailyTotals, BarcodeLookup, Profile, TrainerClient
 from django.urls import reverse
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+from datetime import date, timedelta
+import requests
+from django.utils import timezone as dj_tz
+from io import StringIO
+from pathlib import Path
+import csv
+import gzip
+import json
+import pstats
+import random
+import shutil
+import tempfile
+import threading
+import time
+from zoneinfo import ZoneInfo
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from . import profiling
+from .services import catalog, fdc, goals, meals, off, upstream
+from .services import aupstream as upstream_async
+from .services import singleflight
+from .services import nutrients as nutrient_map
+from .benchmarks import datagen, suite
+from .benchmarks.replay import Faults, ReplayUpstream, parse_latency
+from .benchmarks.stub_server import StubUpstream
+from .serializers import MealEntrySerializer
+from django.apps import apps
+from importlib import import_module
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 
 # Create your tests here.
 
@@ -38,9 +72,1488 @@ class APITest(TestCase):
         self.assertIn(response.status_code, [200, 501])
 
 
+class MealSummaryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='test', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.nutrients = Nutrients.objects.create(calories=250, protein=10, fat=5, carbs=40, sodium=300)
+        self.food = Food.objects.create(name='Oats', nutrients=self.nutrients)
+
+    def _log(self, quantity, meal_time):
+        return MealEntry.objects.create(user=self.user, food=self.food, quantity=quantity, meal_time=meal_time)
+
+    def test_summary_totals(self):
+        self._log(50, '2023-01-01T08:00:00Z')
+        self._log(150, '2023-01-01T19:30:00Z')
+        self._log(100, '2023-01-02T08:00:00Z')  # next day, excluded
+        response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['entries'], 2)
+        self.assertEqual(data['totals'], {
+            'calories': 500.0, 'protein': 20.0, 'carbs': 80.0,
+            'fat': 10.0, 'fiber': 0.0, 'sugar': 0.0, 'sodium': 600.0,
+        })
+
+    def test_summary_respects_local_timezone(self):
+        # 2023-01-02T03:00Z is still Jan 1st in New York
+        self._log(100, '2023-01-02T03:00:00Z')
+        response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'America/New_York'})
+        self.assertEqual(response.json()['entries'], 1)
+        self.assertEqual(response.json()['totals']['calories'], 250.0)
+
+    def test_summary_empty_day(self):
+        response = self.client.get('/api/meals/summary', {'date': '2023-01-01'})
+        self.assertEqual(response.json()['entries'], 0)
+        self.assertEqual(response.json()['totals']['calories'], 0.0)
+
+    def test_live_recompute_is_single_query(self):
+        for i in range(40):
+            self._log(10 + i, '2023-01-01T12:00:00Z')
+        with self.assertNumQueries(1):
+            totals = meals.compute_daily_totals(self.user, date(2023, 1, 1), ZoneInfo('UTC'))
+        self.assertEqual(totals['entries'], 40)
+
+    def test_summary_is_single_query_once_materialized(self):
+        for i in range(40):
+            self._log(10 + i, '2023-01-01T12:00:00Z')
+        self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        with self.assertNumQueries(2):  # data version (ETag) + rollup row
+            response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        self.assertEqual(response.json()['entries'], 40)
+
+    def _summary(self, day, tz='UTC'):
+        return self.client.get('/api/meals/summary', {'date': day, 'tz': tz}).json()
+
+    def test_rollup_follows_create_update_delete(self):
+        self.assertEqual(self._summary('2023-01-01')['entries'], 0)  # materialize both days
+        self.assertEqual(self._summary('2023-01-02')['entries'], 0)
+
+        created = self.client.post('/api/meals/', {
+            'food': self.food.id, 'quantity': 100, 'meal_time': '2023-01-01T12:00:00Z',
+        }).json()
+        self.assertEqual(self._summary('2023-01-01')['totals']['calories'], 250.0)
+
+        self.client.patch(f"/api/meals/{created['id']}/", {'quantity': 200}, format='json')
+        self.assertEqual(self._summary('2023-01-01')['totals']['calories'], 500.0)
+
+        # moving the entry to the next day shifts it between rollup rows
+        self.client.patch(f"/api/meals/{created['id']}/", {'meal_time': '2023-01-02T09:00:00Z'}, format='json')
+        self.assertEqual(self._summary('2023-01-01')['entries'], 0)
+        self.assertEqual(self._summary('2023-01-02')['totals']['calories'], 500.0)
+
+        self.client.delete(f"/api/meals/{created['id']}/")
+        day = self._summary('2023-01-02')
+        self.assertEqual(day['entries'], 0)
+        self.assertEqual(day['totals']['calories'], 0.0)
+        self.assertEqual(DailyTotals.objects.filter(user=self.user).count(), 2)
+
+    def test_rollup_per_timezone(self):
+        self._summary('2023-01-01', 'America/New_York')
+        self._summary('2023-01-02', 'UTC')
+        self.client.post('/api/meals/', {
+            'food': self.food.id, 'quantity': 100, 'meal_time': '2023-01-02T03:00:00Z',
+        })
+        self.assertEqual(self._summary('2023-01-01', 'America/New_York')['entries'], 1)
+        self.assertEqual(self._summary('2023-01-02', 'UTC')['entries'], 1)
+
+    def test_nutrient_correction_applies_on_resnapshot(self):
+        self._log(100, '2023-01-01T12:00:00Z')
+        self._summary('2023-01-01')
+        Nutrients.objects.filter(pk=self.nutrients.pk).update(calories=300)
+        meals.invalidate_daily_totals(MealEntry.objects.filter(food=self.food))
+        self.assertEqual(self._summary('2023-01-01')['totals']['calories'], 250.0)  # logged snapshot
+        self.assertEqual(meals.resnapshot_entries(MealEntry.objects.filter(food=self.food)), 1)
+        self.assertFalse(DailyTotals.objects.filter(user=self.user).exists())
+        self.assertEqual(self._summary('2023-01-01')['totals']['calories'], 300.0)
+
+    def test_rebuild_command_matches_live_recompute(self):
+        self._log(100, '2023-01-01T12:00:00Z')
+        self._log(50, '2023-01-03T12:00:00Z')
+        self._summary('2023-01-01', 'Europe/Berlin')
+        DailyTotals.objects.filter(user=self.user).update(calories=1)  # corrupt it
+        with self.assertRaises(CommandError):
+            call_command('rebuild_daily_totals', '--check-only', stderr=StringIO())
+        out = StringIO()
+        call_command('rebuild_daily_totals', stdout=out)
+        self.assertIn('Rebuilt 2 daily rollup rows.', out.getvalue())
+        self.assertEqual(self._summary('2023-01-01', 'Europe/Berlin')['totals']['calories'], 250.0)
+
+OFF_PRODUCT = {
+    'status': 1,
+    'product': {
+        'product_name': 'Test Bar',
+        'brands': 'TestBrand',
+        'code': '0123456789012',
+        'nutriments': {'energy-kcal_100g': 111, 'proteins_100g': 2.2},
+    },
+}
+
+
+class MealEntrySnapshotTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='snap', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.nutrients = Nutrients.objects.create(calories=200, protein=10, sodium=None)
+        self.food = Food.objects.create(name='Bread', nutrients=self.nutrients)
+        self.entry = self.client.post('/api/meals/', {
+            'food': self.food.id, 'quantity': 150, 'meal_time': '2023-01-01T12:00:00Z',
+        }, format='json').json()
+
+    def _entry(self):
+        return self.client.get(f"/api/meals/{self.entry['id']}/").json()
+
+    def _patch_nutrients(self, data, query=''):
+        staff = APIClient()
+        staff.force_authenticate(user=get_user_model().objects.create_user(username='editor', is_staff=True))
+        return staff.patch(f'/api/nutrients/{self.nutrients.pk}/{query}', data, format='json')
+
+    def test_totals_are_snapshotted_at_write_time(self):
+        stored = MealEntry.objects.get(pk=self.entry['id'])
+        self.assertEqual((stored.calories, stored.protein, stored.sodium), (300.0, 15.0, 0.0))
+        self._patch_nutrients({'calories': 400})
+        entry = self._entry()
+        self.assertEqual(entry['per100']['calories'], 400.0)
+        self.assertEqual(entry['totals']['calories'], 300.0)
+        summary = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'}).json()
+        self.assertEqual(summary['totals']['calories'], 300.0)
+
+    def test_quantity_change_resnapshots_but_notes_edit_does_not(self):
+        Nutrients.objects.filter(pk=self.nutrients.pk).update(calories=400)
+        self.client.patch(f"/api/meals/{self.entry['id']}/", {'notes': 'toast'}, format='json')
+        self.assertEqual(self._entry()['totals']['calories'], 300.0)
+        self.client.patch(f"/api/meals/{self.entry['id']}/", {'quantity': 50}, format='json')
+        self.assertEqual(self._entry()['totals']['calories'], 200.0)
+
+    def test_only_staff_edit_nutrients(self):
+        self.assertEqual(self.client.get(f'/api/nutrients/{self.nutrients.pk}/').json()['calories'], 200)
+        response = self.client.patch(f'/api/nutrients/{self.nutrients.pk}/?resnapshot=true', {'calories': 1},
+                                     format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Nutrients.objects.get(pk=self.nutrients.pk).calories, 200)
+
+    def test_nutrients_update_can_resnapshot(self):
+        self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        response = self._patch_nutrients({'calories': 100}, '?resnapshot=true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._entry()['totals']['calories'], 150.0)
+        summary = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'}).json()
+        self.assertEqual(summary['totals']['calories'], 150.0)
+
+    def test_summary_reads_no_food_tables(self):
+        with CaptureQueriesContext(connection) as ctx:
+            meals.compute_daily_totals(self.user, date(2023, 1, 1), ZoneInfo('UTC'))
+            meals.trends(self.user, date(2023, 1, 1), date(2023, 1, 7), ZoneInfo('UTC'))
+        self.assertFalse(any('core_food' in q['sql'] or 'core_nutrients' in q['sql'] for q in ctx.captured_queries))
+
+    def test_backfill_migration_in_batches(self):
+        backfill = import_module('core.migrations.0009_backfill_mealentry_totals').backfill
+        for i in range(4):
+            MealEntry.objects.create(user=self.user, food=self.food, quantity=10 * (i + 1),
+                                     meal_time='2023-01-02T12:00:00Z')
+        MealEntry.objects.update(calories=0, protein=0)
+        backfill(apps, MagicMock(connection=connection), batch_size=2)
+        self.assertEqual(sorted(MealEntry.objects.values_list('calories', flat=True)),
+                         [20.0, 40.0, 60.0, 80.0, 300.0])
+        self.assertEqual(MealEntry.objects.get(pk=self.entry['id']).protein, 15.0)
+
+
+class MealBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='batch', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.oats = Food.objects.create(name='Oats', nutrients=Nutrients.objects.create(calories=400, protein=10))
+        self.milk = Food.objects.create(name='Milk', nutrients=Nutrients.objects.create(calories=60, protein=3))
+
+    def _post(self, entries, **params):
+        url = '/api/meals/batch/' + ('?' + '&'.join(f'{k}={v}' for k, v in params.items()) if params else '')
+        return self.client.post(url, entries, format='json')
+
+    def test_creates_entries_and_returns_day_totals(self):
+        self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})  # materialize the rollup
+        response = self._post([
+            {'food': self.oats.id, 'quantity': 50, 'meal_time': '2023-01-01T08:00:00Z'},
+            {'food': self.milk.id, 'quantity': 200, 'meal_time': '2023-01-01T08:00:00Z', 'notes': 'skim'},
+            {'food': self.oats.id, 'quantity': 100, 'meal_time': '2023-01-02T08:00:00Z'},
+        ], tz='UTC')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual([r['food_name'] for r in data['created']], ['Oats', 'Milk', 'Oats'])
+        self.assertEqual(data['created'][1]['totals']['calories'], 120.0)
+        self.assertEqual([(d['date'], d['entries'], d['totals']['calories']) for d in data['days']],
+                         [('2023-01-01', 2, 320.0), ('2023-01-02', 1, 400.0)])
+        self.assertEqual(MealEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(meals.compute_daily_totals(self.user, date(2023, 1, 1), ZoneInfo('UTC'))['calories'], 320.0)
+
+    def test_invalid_entry_rejects_whole_batch(self):
+        response = self._post([
+            {'food': self.oats.id, 'quantity': 50, 'meal_time': '2023-01-01T08:00:00Z'},
+            {'food': 999999, 'quantity': 50, 'meal_time': '2023-01-01T08:00:00Z'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('food', response.json()[1])
+        self.assertFalse(MealEntry.objects.exists())
+        self.assertEqual(self._post([]).status_code, 400)
+        with self.settings(MEAL_BATCH_MAX=1):
+            self.assertEqual(self._post({'entries': [{}, {}]}).status_code, 400)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        def entries(n):
+            return [{'food': (self.oats, self.milk)[i % 2].id, 'quantity': 10, 'meal_time': '2023-01-01T08:00:00Z'}
+                    for i in range(n)]
+        self._post(entries(1), tz='UTC')  # materialize the day's rollup
+        with CaptureQueriesContext(connection) as small:
+            self._post(entries(2), tz='UTC')
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self._post(entries(50), tz='UTC').status_code, 201)
+        self.assertEqual(len(small), len(large))
+
+
+class MealHistoryPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='history', password='test')
+        self.client.force_authenticate(user=self.user)
+        food = Food.objects.create(name='Oats', nutrients=Nutrients.objects.create(calories=100))
+        base = dj_tz.now().replace(microsecond=0)
+        # pairs share a timestamp so the id tiebreak matters
+        MealEntry.objects.bulk_create([
+            MealEntry(user=self.user, food=food, quantity=10, meal_time=base - timedelta(hours=i // 2)) for i in range(7)
+        ])
+        self.expected = list(MealEntry.objects.order_by('-meal_time', '-id').values_list('id', flat=True))
+
+    def _walk(self, url, link):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(r['id'] for r in data['results'])
+            url = data[link]
+        return ids
+
+    def test_after_cursors_walk_history_newest_first(self):
+        with CaptureQueriesContext(connection) as ctx:
+            first = self.client.get('/api/meals/', {'mode': 'cursor', 'page_size': 3}).json()
+        self.assertIsNone(first['previous'])
+        self.assertFalse(any('COUNT(' in q['sql'] or 'OFFSET' in q['sql'] for q in ctx.captured_queries))
+        ids = [r['id'] for r in first['results']] + self._walk(first['next'], 'next')
+        self.assertEqual(ids, self.expected)
+
+    def test_before_cursors_walk_back(self):
+        first = self.client.get('/api/meals/', {'mode': 'cursor', 'page_size': 3}).json()
+        last = self.client.get(self.client.get(first['next']).json()['next']).json()
+        self.assertIsNone(last['next'])
+        back = self._walk(last['previous'], 'previous')
+        self.assertEqual(sorted(back, key=self.expected.index), self.expected[:6])
+
+    def test_invalid_cursor_and_default_mode(self):
+        self.assertEqual(self.client.get('/api/meals/', {'mode': 'cursor', 'after': 'nope'}).status_code, 404)
+        data = self.client.get('/api/meals/').json()
+        self.assertEqual(data['count'], 7)
+
+
+class MealEntryReadSerializerTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='lean', password='test')
+        self.client.force_authenticate(user=self.user)
+        full = Food.objects.create(name='Skyr', brand='Siggi', nutrients=Nutrients.objects.create(
+            calories=63, protein=11, carbs=3.9, fat=0.2, fiber=0, sugar=3.3, sodium=0.045))
+        sparse = Food.objects.create(name='Mystery', nutrients=Nutrients.objects.create(calories=250.5))
+        t = dj_tz.now().replace(microsecond=123456)
+        MealEntry.objects.create(user=self.user, food=full, quantity=170, meal_time=t, notes='breakfast')
+        MealEntry.objects.create(user=self.user, food=sparse, quantity=33.3, meal_time=t - timedelta(days=1, hours=5))
+        MealEntry.objects.create(user=self.user, food=full, quantity=0, meal_time=t.replace(microsecond=0), notes='')
+
+    def _full(self, entries):
+        return JSONRenderer().render(MealEntrySerializer(entries, many=True).data)
+
+    def test_list_and_retrieve_are_byte_identical_to_model_serializer(self):
+        entries = list(MealEntry.objects.select_related('food__nutrients').order_by('-meal_time', '-id'))
+        for tz in ('UTC', 'America/Los_Angeles', 'Asia/Kolkata'):
+            with self.subTest(tz=tz), override_settings(TIME_ZONE=tz):
+                data = self.client.get('/api/meals/', {'mode': 'cursor'}).json()
+                self.assertEqual(JSONRenderer().render(data['results']), self._full(entries))
+                one = self.client.get(f'/api/meals/{entries[1].pk}/')
+                self.assertEqual(one.content, self._full([entries[1]])[1:-1])
+
+    def test_list_is_one_query_without_model_instances(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/api/meals/', {'mode': 'cursor'}).status_code, 200)
+        selects = [q['sql'] for q in ctx.captured_queries if 'core_mealentry' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('core_nutrients', selects[0])
+
+    def test_writes_keep_model_serializer(self):
+        entry = MealEntry.objects.first()
+        response = self.client.patch(f'/api/meals/{entry.pk}/', {'notes': 'edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notes'], 'edited')
+
+
+class ConditionalMealReadsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='etag', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.food = Food.objects.create(name='Oats', nutrients=Nutrients.objects.create(calories=100))
+        MealEntry.objects.create(user=self.user, food=self.food, quantity=50, meal_time='2023-01-01T08:00:00Z')
+        self.summary = ('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+
+    def test_unchanged_data_is_304_without_meal_queries(self):
+        for url, params in (('/api/meals/', {}), self.summary):
+            first = self.client.get(url, params)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('Last-Modified', first)
+            with self.assertNumQueries(1):  # the data version lookup only
+                again = self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again['ETag'], first['ETag'])
+            self.assertEqual(again.content, b'')
+
+    def test_etag_varies_by_query(self):
+        a = self.client.get(*self.summary)['ETag']
+        b = self.client.get('/api/meals/summary', {'date': '2023-01-02', 'tz': 'UTC'})['ETag']
+        self.assertNotEqual(a, b)
+
+    def test_meal_writes_change_the_etag(self):
+        etag = self.client.get(*self.summary)['ETag']
+        self.client.post('/api/meals/', {'food': self.food.id, 'quantity': 10, 'meal_time': '2023-01-01T12:00:00Z'},
+                         format='json')
+        response = self.client.get(*self.summary, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['entries'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_food_changes_change_the_etag(self):
+        etag = self.client.get('/api/meals/')['ETag']
+        self.client.patch(f'/api/foods/{self.food.id}/', {'name': 'Rolled oats'}, format='json')
+        response = self.client.get('/api/meals/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['food_name'], 'Rolled oats')
+
+    def test_if_modified_since(self):
+        first = self.client.get('/api/meals/')
+        self.assertEqual(self.client.get('/api/meals/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+
+class MealTrendsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='trends', password='test')
+        self.client.force_authenticate(user=self.user)
+        food = Food.objects.create(name='Oats', nutrients=Nutrients.objects.create(calories=100, protein=10))
+        for grams, when in [
+            (300, '2022-12-30T12:00:00Z'),  # before the range: only feeds the rolling average
+            (100, '2023-01-02T12:00:00Z'),
+            (200, '2023-01-03T12:00:00Z'),
+            (100, '2023-01-03T18:00:00Z'),
+            (400, '2023-01-10T03:00:00Z'),  # Jan 9, 22:00 in New York
+        ]:
+            MealEntry.objects.create(user=self.user, food=food, quantity=grams, meal_time=when)
+
+    def _trends(self, **params):
+        response = self.client.get('/api/meals/trends', {'start': '2023-01-02', 'end': '2023-01-15', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_daily_buckets_and_rolling_average(self):
+        meals.get_data_version(self.user)
+        with self.assertNumQueries(2):  # data version + the trends query
+            data = self._trends(tz='UTC')
+        buckets = {b['start']: b for b in data['buckets']}
+        self.assertEqual(len(buckets), 14)
+        self.assertEqual((buckets['2023-01-03']['entries'], buckets['2023-01-03']['totals']['calories']), (2, 300.0))
+        self.assertEqual(buckets['2023-01-05']['days_logged'], 0)
+        # logged days in the trailing week of Jan 3: Dec 30 (300), Jan 2 (100), Jan 3 (300)
+        self.assertAlmostEqual(buckets['2023-01-03']['avg7']['calories'], 233.0)
+        self.assertEqual(buckets['2023-01-10']['totals']['calories'], 400.0)
+        self.assertEqual(buckets['2023-01-09']['avg7']['calories'], 300.0)  # only Jan 3 in the window
+        empty = self._trends(start='2024-01-01', end='2024-01-01')['buckets'][0]
+        self.assertEqual((empty['days_logged'], empty['totals']['calories'], empty['avg7']['calories']), (0, 0.0, None))
+
+    def test_buckets_in_local_timezone(self):
+        buckets = {b['start']: b for b in self._trends(tz='America/New_York')['buckets']}
+        self.assertEqual(buckets['2023-01-09']['totals']['calories'], 400.0)
+        self.assertEqual(buckets['2023-01-10']['entries'], 0)
+
+    def test_week_and_month_granularity(self):
+        weeks = self._trends(tz='UTC', granularity='week')['buckets']
+        self.assertEqual([w['start'] for w in weeks], ['2023-01-02', '2023-01-09'])
+        self.assertEqual([(w['days'], w['days_logged'], w['totals']['calories']) for w in weeks],
+                         [(7, 2, 400.0), (7, 1, 400.0)])
+        month, = self._trends(tz='UTC', granularity='month')['buckets']
+        self.assertEqual((month['start'], month['days'], month['entries'], month['totals']['protein']),
+                         ('2023-01-01', 14, 4, 80.0))
+        self.assertEqual(month['avg7']['calories'], 400.0)  # as of Jan 15: only Jan 10 logged
+
+    def test_validation(self):
+        for params in ({'start': 'x'}, {'granularity': 'year'}, {'start': '2023-02-01'}):
+            response = self.client.get('/api/meals/trends', {'start': '2023-01-02', 'end': '2023-01-15', **params})
+            self.assertEqual(response.status_code, 400)
+        with self.settings(MEAL_TRENDS_MAX_DAYS=7):
+            self.assertEqual(self.client.get('/api/meals/trends', {'start': '2023-01-02', 'end': '2023-01-15'}).status_code, 400)
+
+
+class GoalsProgressTest(TestCase):
+    PROFILE = {'weight_kg': 80, 'height_cm': 180, 'age': 30, 'sex': 'male', 'activity_factor': 1.2}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='test', password='test')
+        self.client.force_authenticate(user=self.user)
+        # per 100 g: 400 kcal, 10 g protein, 10 g fat, 75 g carbs
+        self.food = Food.objects.create(name='Granola', nutrients=Nutrients.objects.create(
+            calories=400, protein=10, fat=10, carbs=75))
+
+    def _log(self, quantity, meal_time):
+        return MealEntry.objects.create(user=self.user, food=self.food, quantity=quantity, meal_time=meal_time)
+
+    def test_profile_targets(self):
+        response = self.client.put('/api/goals/profile', self.PROFILE, format='json')
+        self.assertEqual(response.status_code, 201)
+        targets = response.json()['targets']
+        # BMR 10*80 + 6.25*180 - 5*30 + 5 = 1780, x1.2
+        self.assertEqual(targets['calories'], 2136)
+        self.assertEqual(targets['protein'], {'target': 120.1, 'min': 53.4, 'max': 186.9})
+        self.assertEqual(self.client.get('/api/goals/profile').json()['targets'], targets)
+        self.assertEqual(self.client.patch('/api/goals/profile', {'age': 5}, format='json').status_code, 400)
+
+    def test_targets_recompute_only_when_inputs_change(self):
+        profile = Profile.objects.create(user=self.user, **self.PROFILE)
+        with patch.object(goals, 'targets', wraps=goals.targets) as computed:
+            profile = Profile.objects.get(pk=profile.pk)
+            profile.save()
+            self.client.get('/api/goals/progress', {'start': '2024-01-01', 'end': '2024-01-07'})
+            self.assertEqual(computed.call_count, 0)
+            response = self.client.patch('/api/goals/profile', {'weight_kg': 90}, format='json')
+            self.assertEqual(computed.call_count, 1)
+        self.assertEqual(response.json()['targets']['calories'], 2256)  # +100 kcal BMR x1.2
+        self.assertEqual(Profile.objects.get().target_calories, 2256)
+
+    def test_progress_per_day(self):
+        Profile.objects.create(user=self.user, **self.PROFILE)
+        self._log(500, '2024-01-01T12:00:00Z')  # 2000 kcal, 50 g protein, 50 g fat, 375 g carbs
+        self._log(100, '2024-01-03T04:00:00Z')  # still Jan 2nd in New York
+        response = self.client.get('/api/goals/progress', {
+            'start': '2024-01-01', 'end': '2024-01-03', 'tz': 'America/New_York',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([d['date'] for d in data['days']], ['2024-01-01', '2024-01-02', '2024-01-03'])
+        first, second, third = data['days']
+        self.assertEqual(first['calories'], {'actual': 2000, 'target': 2136, 'remaining': 136})
+        self.assertEqual(first['macros']['protein']['status'], 'below')
+        self.assertEqual(first['macros']['fat']['status'], 'within')
+        self.assertEqual(first['macros']['carbs']['status'], 'above')
+        self.assertEqual(first['macros']['carbs']['max'], 347.1)
+        self.assertEqual(second['entries'], 1)
+        self.assertEqual(third['calories']['actual'], 0)
+        self.assertEqual(data['targets']['calories'], 2136)
+
+    def test_progress_query_count_is_independent_of_range(self):
+        Profile.objects.create(user=self.user, **self.PROFILE)
+        for start in ('2024-01-25', '2023-11-01'):
+            with self.assertNumQueries(2):  # profile + one per-day totals query
+                response = self.client.get('/api/goals/progress', {'start': start, 'end': '2024-01-31'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['days']), 92)
+
+    def test_progress_needs_a_profile(self):
+        response = self.client.get('/api/goals/progress', {'start': '2024-01-01', 'end': '2024-01-07'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/api/goals/profile').status_code, 404)
+
+
+class TrainerClientsSummaryTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.trainer = User.objects.create_user(username='coach', password='p')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.trainer)
+        self.food = Food.objects.create(name='Rice', nutrients=Nutrients.objects.create(calories=100, protein=2))
+        self.ny = self._client('ny', 'America/New_York')
+        self.tokyo = self._client('tokyo', 'Asia/Tokyo')
+        self.utc = self._client('utc', None)  # no profile: falls back to ?tz / TIME_ZONE
+
+    def _client(self, username, tz):
+        user = get_user_model().objects.create_user(username=username, password='p')
+        if tz:
+            Profile.objects.create(user=user, weight_kg=70, height_cm=170, age=30, sex='female', timezone=tz)
+        TrainerClient.objects.create(trainer=self.trainer, client=user)
+        return user
+
+    def _log(self, user, quantity, meal_time):
+        MealEntry.objects.create(user=user, food=self.food, quantity=quantity, meal_time=meal_time)
+
+    def test_each_client_in_their_own_timezone(self):
+        self._log(self.ny, 100, '2024-03-02T03:00:00Z')  # Mar 1st 22:00 in New York
+        self._log(self.ny, 100, '2024-03-01T03:00:00Z')  # Feb 29th in New York
+        self._log(self.tokyo, 200, '2024-02-29T16:00:00Z')  # Mar 1st 01:00 in Tokyo
+        self._log(self.tokyo, 100, '2024-03-01T16:00:00Z')  # Mar 2nd in Tokyo
+        self._log(self.utc, 300, '2024-03-01T23:59:00Z')
+        outsider = get_user_model().objects.create_user(username='other', password='p')
+        self._log(outsider, 100, '2024-03-01T12:00:00Z')
+
+        response = self.client.get('/api/trainer/clients/summary', {'date': '2024-03-01'})
+        self.assertEqual(response.status_code, 200)
+        rows = {c['username']: c for c in response.json()['clients']}
+        self.assertEqual(set(rows), {'ny', 'tokyo', 'utc'})
+        self.assertEqual((rows['ny']['entries'], rows['ny']['totals']['calories']), (1, 100))
+        self.assertEqual((rows['tokyo']['entries'], rows['tokyo']['totals']['calories']), (1, 200))
+        self.assertEqual((rows['utc']['entries'], rows['utc']['totals']['protein']), (1, 6.0))
+        self.assertEqual(rows['ny']['timezone'], 'America/New_York')
+        self.assertEqual(rows['utc']['timezone'], 'UTC')
+        self.assertEqual(rows['tokyo']['last_logged_at'], '2024-03-01T16:00:00Z')  # latest ever, not just that day
+
+    def test_one_query_for_the_whole_roster(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/trainer/clients/summary', {'date': '2024-03-01'})
+        for i in range(20):
+            self._client(f'extra{i}', 'Europe/Berlin' if i % 2 else None)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/trainer/clients/summary', {'date': '2024-03-01'})
+        clients = response.json()['clients']
+        self.assertEqual(len(clients), 23)
+        self.assertEqual(clients[0]['entries'], 0)
+        self.assertIsNone(clients[0]['last_logged_at'])
+
+    def test_only_own_clients(self):
+        other = APIClient()
+        other.force_authenticate(user=self.ny)
+        self.assertEqual(other.get('/api/trainer/clients/summary', {'date': '2024-03-01'}).json()['clients'], [])
+        self.assertEqual(self.client.get('/api/trainer/clients/summary').status_code, 400)
+
+    def test_profile_timezone_is_validated(self):
+        me = APIClient()
+        me.force_authenticate(user=self.ny)
+        self.assertEqual(me.patch('/api/goals/profile', {'timezone': 'Mars/Olympus'}, format='json').status_code, 400)
+        self.assertEqual(me.patch('/api/goals/profile', {'timezone': 'Europe/Paris'}, format='json').json()['timezone'],
+                         'Europe/Paris')
+
+
+class BenchmarkSuiteTest(TestCase):
+    def test_generator_is_seeded_and_clearable(self):
+        first = datagen.generate(users=2, days=3, entries=2, foods=10, seed=7)
+        rows = list(MealEntry.objects.filter(user__in=first['users']).order_by('meal_time')
+                    .values_list('food__name', 'quantity', 'calories'))
+        self.assertEqual(len(rows), 12)
+        second = datagen.generate(users=2, days=3, entries=2, foods=10, seed=7)
+        self.assertEqual(rows, list(MealEntry.objects.filter(user__in=second['users']).order_by('meal_time')
+                                    .values_list('food__name', 'quantity', 'calories')))
+        datagen.clear()
+        self.assertFalse(Food.objects.filter(data_source=datagen.DATA_SOURCE).exists())
+        self.assertFalse(MealEntry.objects.exists())
+        self.assertFalse(Nutrients.objects.exists())
+
+    def test_cleanup_leaves_real_foods_alone(self):
+        # real rows whose codes look like the ones the import scenarios generate
+        real_barcode = Food.objects.create(name='Store bread', barcode='2999000000001',
+                                           nutrients=Nutrients.objects.create(calories=250))
+        real_fdc = Food.objects.create(name='Real FDC food', fdc_id='990000001', data_source='FDC',
+                                       nutrients=Nutrients.objects.create(calories=90))
+        entry = MealEntry.objects.create(user=get_user_model().objects.create_user(username='real', password='p'),
+                                         food=real_fdc, quantity=100, meal_time=dj_tz.now())
+        dataset = datagen.generate(users=1, days=2, entries=1, foods=5, seed=1)
+        before = set(Food.objects.values_list('pk', flat=True))
+        nutrients_before = Nutrients.objects.count()
+        suite.run(dataset, iterations=2, scenarios=['import_barcode', 'import_fdc'])
+        self.assertEqual(set(Food.objects.values_list('pk', flat=True)), before)
+        self.assertEqual(Nutrients.objects.count(), nutrients_before)
+        self.assertEqual(Food.objects.get(pk=real_fdc.pk).name, 'Real FDC food')
+        datagen.clear()
+        self.assertEqual(Food.objects.filter(pk__in=[real_barcode.pk, real_fdc.pk]).count(), 2)
+        self.assertTrue(MealEntry.objects.filter(pk=entry.pk).exists())
+
+    def test_run_benchmarks_writes_comparable_json(self):
+        out_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, out_dir)
+        args = ['--users', '2', '--days', '3', '--entries', '2', '--foods', '20', '--iterations', '2']
+        call_command('run_benchmarks', *args, '--output', str(out_dir / 'a.json'), stdout=StringIO())
+        report = json.loads((out_dir / 'a.json').read_text())
+        self.assertEqual(report['meta']['dataset']['users'], 2)
+        self.assertEqual(set(report['results']), {
+            'meals_list', 'meals_list_cursor', 'meals_list_day', 'meals_summary', 'meals_summary_cold',
+            'meals_trends_30d', 'food_search_local', 'food_search_fdc', 'import_barcode', 'import_fdc',
+        })
+        for result in report['results'].values():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreaterEqual(result['queries'], 0)
+        self.assertEqual(report['results']['food_search_fdc']['queries'], 0)  # stubbed upstream only
+
+        out = StringIO()
+        call_command('run_benchmarks', *args, '--scenario', 'meals_summary', '--output', str(out_dir / 'b.json'),
+                     '--compare', str(out_dir / 'a.json'), stdout=out)
+        self.assertRegex(out.getvalue(), r'meals_summary .*[+-]\d+\.\d%')
+        self.assertFalse(Food.objects.exists())
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='test', password='test')
+        self.client.force_authenticate(user=self.user)
+        upstream.close_all()
+        self.addCleanup(upstream.close_all)
+
+    @staticmethod
+    def _timing(response):
+        return dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        timing = self._timing(response)
+        self.assertIn(f'desc="{len(captured.captured_queries)} queries"', timing['db'])
+        self.assertIn('desc="0 calls"', timing['upstream'])
+        self.assertIn('total;dur=', timing['total'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_upstream_calls_are_tagged(self):
+        with StubUpstream(body=OFF_PRODUCT) as stub, self.settings(OFF_BASE_URL=stub.url):
+            response = self.client.get('/api/foods/barcode/0123456789012')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('desc="1 calls"', self._timing(response)['upstream'])
+            caches[fdc.CACHE_ALIAS].clear()
+            BarcodeLookup.objects.all().delete()
+            self.assertEqual(self.client.post('/api/foods/import/barcode/0123456789012/').status_code, 201)
+            self.client.post('/api/foods/import/barcodes/', {'barcodes': ['0123456789029']}, format='json')
+        self.assertEqual(stub.requests, 3)
+        with self.settings(METRICS_TOKEN='s3cret'):
+            text = APIClient().get('/api/metrics', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        for view, action in (('FoodViewSet', 'barcode_lookup'), ('import_food_by_barcode', '-'),
+                             ('import_foods_by_barcodes', '-')):
+            self.assertIn(
+                f'upstream_request_duration_seconds_count{{action="{action}",upstream="off",view="{view}"}}', text,
+            )
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC'})
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/metrics').status_code, 403)
+        self.assertEqual(anonymous.get('/api/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = anonymous.get('/api/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{', text)
+        self.assertIn('action="summary"', text)
+        self.assertIn('http_request_db_queries_count{action="summary",view="MealEntryViewSet"}', text)
+
+    def test_staff_can_read_metrics(self):
+        staff = APIClient()
+        staff.force_login(get_user_model().objects.create_user(username='ops', password='p', is_staff=True))
+        self.assertEqual(staff.get('/api/metrics').status_code, 200)
+
+
+class RequestProfilerTest(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        override = self.settings(PROFILE_DIR=self.dir, PROFILE_SAMPLE_RATE=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+
+    def _profiles(self):
+        return sorted(p.name for p in Path(self.dir).glob('*.prof'))
+
+    def test_staff_request_is_profiled_and_tagged(self):
+        staff = get_user_model().objects.create_user(username='ops', password='p', is_staff=True)
+        self.client.force_login(staff)  # session auth: the middleware sees the user up front
+        response = self.client.get('/api/meals/summary', {'date': '2023-01-01', 'tz': 'UTC', 'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        [name] = self._profiles()
+        self.assertEqual(response['X-Profile'], name)
+        self.assertTrue(name.startswith('MealEntryViewSet.summary-'))
+        self.assertTrue(name.endswith('-staff.prof'))
+        self.assertGreater(pstats.Stats(str(Path(self.dir) / name)).total_calls, 0)
+
+    def test_token_authenticated_staff_via_header(self):
+        staff = get_user_model().objects.create_user(username='ops', password='p', is_staff=True)
+        token = Token.objects.create(user=staff)
+        response = self.client.get('/api/meals/', HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile'], self._profiles()[0])
+
+    def test_non_staff_requests_are_not_profiled(self):
+        token = Token.objects.create(user=get_user_model().objects.create_user(username='u', password='p'))
+        response = self.client.get('/api/meals/', {'profile': '1'}, HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertFalse(APIClient().get('/api/meals/', {'profile': '1'}).has_header('X-Profile'))
+        self.assertEqual(self._profiles(), [])
+
+    def test_non_staff_token_never_starts_the_profiler(self):
+        token = Token.objects.create(user=get_user_model().objects.create_user(username='u', password='p'))
+        with patch.object(profiling.cProfile, 'Profile') as profile:
+            self.client.get('/api/meals/', HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_X_PROFILE='1')
+            self.client.get('/api/meals/', HTTP_AUTHORIZATION='Token not-a-real-key', HTTP_X_PROFILE='1')
+        profile.assert_not_called()
+
+    def _staff_request(self):
+        request = RequestFactory().get('/api/meals/', {'profile': '1'})
+        request.user = MagicMock(is_staff=True)
+        return request
+
+    def test_overlapping_requests_take_turns(self):
+        inside, release = threading.Event(), threading.Event()
+
+        def slow(request):
+            inside.set()
+            release.wait(5)
+            return HttpResponse('slow')
+
+        first = {}
+        worker = threading.Thread(target=lambda: first.update(r=profiling.run(self._staff_request(), slow)))
+        worker.start()
+        self.assertTrue(inside.wait(5))
+        try:
+            second = profiling.run(self._staff_request(), lambda request: HttpResponse('fast'))
+        finally:
+            release.set()
+            worker.join(5)
+        self.assertEqual(second.content, b'fast')
+        self.assertFalse(second.has_header('X-Profile'))  # served unprofiled while the slot was busy
+        self.assertTrue(first['r'].has_header('X-Profile'))
+        self.assertEqual(len(self._profiles()), 1)
+
+    def test_profiler_slot_taken_by_another_tool(self):
+        with patch.object(profiling.cProfile, 'Profile') as profile:
+            profile.return_value.enable.side_effect = ValueError('Another profiling tool is already active')
+            response = profiling.run(self._staff_request(), lambda request: HttpResponse('ok'))
+        self.assertEqual(response.content, b'ok')
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual(self._profiles(), [])
+
+    def test_sampled_requests_keep_at_most_max_files(self):
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='u', password='p'))
+        with self.settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX_FILES=2):
+            for _ in range(3):
+                response = self.client.get('/api/meals/')
+                self.assertFalse(response.has_header('X-Profile'))
+        profiles = self._profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(all(p.startswith('MealEntryViewSet.list-') and p.endswith('-sample.prof') for p in profiles))
+
+
+class FoodCatalogListTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='test', password='test'))
+        for i in range(12):
+            Food.objects.create(
+                name=f'Food {i}', brand='Acme' if i % 3 == 0 else 'Other', data_source='OFF' if i % 2 else 'FDC',
+                barcode=f'00000000000{i:02d}', fdc_id=str(1000 + i),
+                nutrients=Nutrients.objects.create(calories=100 + i, protein=i),
+            )
+
+    def test_list_is_one_query_per_page(self):
+        with self.assertNumQueries(2):  # count + page, nutrients joined in
+            response = self.client.get('/api/foods/')
+        self.assertEqual(len(response.json()['results']), 12)
+        self.assertEqual(response.json()['results'][0]['nutrients']['calories'], 100)
+        for i in range(12, 20):
+            Food.objects.create(name=f'Food {i}', nutrients=Nutrients.objects.create(calories=1))
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/foods/')
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_filters(self):
+        def names(**params):
+            return [f['name'] for f in self.client.get('/api/foods/', params).json()['results']]
+        self.assertEqual(names(brand='Acme'), ['Food 0', 'Food 3', 'Food 6', 'Food 9'])
+        self.assertEqual(names(brand='Acme', data_source='OFF'), ['Food 3', 'Food 9'])
+        self.assertEqual(names(fdc_id='1005'), ['Food 5'])
+        self.assertEqual(names(barcode='000000000007'), ['Food 7'])  # UPC-A, widened to EAN-13
+        self.assertEqual(names(brand='acme'), [])
+
+    def test_sparse_fieldset(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/foods/', {'fields': 'id,name,brand,calories', 'brand': 'Acme'})
+        first = response.json()['results'][0]
+        self.assertEqual(first, {
+            'id': Food.objects.get(name='Food 0').pk, 'name': 'Food 0', 'brand': 'Acme', 'nutrients': {'calories': 100.0},
+        })
+
+    def test_sparse_fieldset_without_nutrients_skips_the_join(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/foods/', {'fields': 'name,barcode'})
+        self.assertEqual(response.json()['results'][0], {'name': 'Food 0', 'barcode': '0000000000000'})
+        self.assertNotIn(Nutrients._meta.db_table, captured.captured_queries[-1]['sql'])
+        food = Food.objects.get(name='Food 1')
+        detail = self.client.get(f'/api/foods/{food.pk}/', {'fields': 'name,nutrients'}).json()
+        self.assertEqual(detail['name'], 'Food 1')
+        self.assertEqual(detail['nutrients']['id'], food.nutrients_id)
+        self.assertEqual(set(detail), {'name', 'nutrients'})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/foods/', {'fields': 'name,colour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('colour', response.json()['fields'])
+
+    def test_full_representation_is_unchanged(self):
+        food = self.client.get('/api/foods/').json()['results'][0]
+        self.assertEqual(set(food), {f.name for f in Food._meta.concrete_fields})
+        self.assertEqual(set(food['nutrients']), {'id', 'calories', 'protein', 'fat', 'carbs', 'fiber', 'sugar', 'sodium'})
+
+
+class BarcodeCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    @patch('core.services.upstream.get')
+    def test_repeat_scans_hit_cache(self, mock_get):
+        mock_get.return_value.json.return_value = OFF_PRODUCT
+        first = self.client.get('/api/foods/barcode/123456789012')  # UPC-A, normalized to EAN-13
+        second = self.client.get('/api/foods/barcode/0123456789012')
+        self.assertEqual(first.json(), OFF_PRODUCT)
+        self.assertEqual(second.json(), OFF_PRODUCT)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(off.cache_stats(), {'hits': 1, 'misses': 1})
+
+    @patch('core.services.upstream.get')
+    def test_import_shares_cache_with_lookup(self, mock_get):
+        mock_get.return_value.json.return_value = OFF_PRODUCT
+        self.client.get('/api/foods/barcode/0123456789012')
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='u', password='p'))
+        resp = self.client.post('/api/foods/import/barcode/0123456789012/')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('core.services.upstream.get')
+    def test_not_found_uses_negative_ttl(self, mock_get):
+        mock_get.return_value.json.return_value = {'status': 0}
+        with self.settings(OFF_CACHE_TTL=3600, OFF_CACHE_NEGATIVE_TTL=60):
+            off.lookup_barcode_cached('0000000000000')
+            off.lookup_barcode_cached('0000000000000')
+            self.assertEqual(mock_get.call_count, 1)
+            BarcodeLookup.objects.update(fetched_at=dj_tz.now() - timedelta(seconds=120))
+            off.lookup_barcode_cached('0000000000000')
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertFalse(BarcodeLookup.objects.get().found)
+
+    @patch('core.services.upstream.get')
+    def test_upstream_errors_are_not_cached(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError('boom')
+        resp = self.client.get('/api/foods/barcode/0123456789012')
+        self.assertEqual(resp.status_code, 502)
+        self.assertFalse(BarcodeLookup.objects.exists())
+
+@patch.object(fdc, 'FDC_API_KEY', 'test-key')
+class FdcCacheTest(TestCase):
+    def setUp(self):
+        caches['upstream'].clear()
+
+    @patch('core.services.upstream.get')
+    def test_search_keys_are_normalized(self, mock_get):
+        mock_get.return_value.json.return_value = {'foods': [{'fdcId': 1}]}
+        fdc.search_foods('Chicken  Breast')
+        fdc.search_foods(' chicken breast ')
+        self.assertEqual(mock_get.call_count, 1)
+        fdc.search_foods('chicken breast', page_number=2)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('core.services.upstream.get')
+    def test_detail_is_cached_per_fdc_id(self, mock_get):
+        mock_get.return_value.json.return_value = {'fdcId': 1104067, 'description': 'X'}
+        self.assertEqual(fdc.get_food_details('1104067'), {'fdcId': 1104067, 'description': 'X'})
+        fdc.get_food_details('1104067')
+        self.assertEqual(mock_get.call_count, 1)
+        fdc.get_food_details('42')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('core.services.upstream.get')
+    def test_error_responses_are_not_cached(self, mock_get):
+        mock_get.return_value.ok = False
+        mock_get.return_value.json.return_value = {'error': 'OVER_RATE_LIMIT'}
+        fdc.search_foods('apple')
+        fdc.search_foods('apple')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('core.services.upstream.get')
+    def test_search_view_passes_page_params(self, mock_get):
+        mock_get.return_value.json.return_value = {'foods': []}
+        resp = APIClient().get('/api/foods/search', {'q': 'Apple', 'page': 3, 'page_size': 10})
+        self.assertEqual(resp.status_code, 200)
+        params = mock_get.call_args.kwargs['params']
+        self.assertEqual((params['pageNumber'], params['pageSize']), (3, 10))
+
+@override_settings(UPSTREAM_BACKOFF_FACTOR=0, UPSTREAM_BACKOFF_JITTER=0)
+class UpstreamClientTest(TestCase):
+    def setUp(self):
+        upstream.close_all()
+        self.addCleanup(upstream.close_all)
+
+    def test_connections_are_reused(self):
+        with StubUpstream() as stub:
+            for _ in range(5):
+                self.assertEqual(upstream.get(stub.url + '/x').status_code, 200)
+        self.assertEqual(stub.requests, 5)
+        self.assertEqual(stub.connections, 1)
+
+    def test_retries_5xx_then_succeeds(self):
+        with StubUpstream(fail_first=2, fail_status=503) as stub:
+            resp = upstream.get(stub.url + '/x')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(stub.requests, 3)
+
+    @override_settings(UPSTREAM_RETRIES=1)
+    def test_gives_up_and_returns_last_response(self):
+        with StubUpstream(fail_first=10, fail_status=429) as stub:
+            resp = upstream.get(stub.url + '/x')
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(stub.requests, 2)
+
+class RecordReplayUpstreamTest(TestCase):
+    def setUp(self):
+        upstream.close_all()
+        self.addCleanup(upstream.close_all)
+        self.fixtures = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.fixtures)
+
+    def _record_off(self, code='0123456789012'):
+        with StubUpstream(body=OFF_PRODUCT) as real, \
+                ReplayUpstream(self.fixtures, 'off', mode='record', upstream_base=real.url) as recorder, \
+                override_settings(OFF_BASE_URL=recorder.url):
+            self.assertEqual(off.lookup_barcode(code), OFF_PRODUCT)
+        self.assertEqual((real.requests, recorder.stats['recorded']), (1, 1))
+
+    def test_record_then_replay_offline(self):
+        self._record_off()
+        with ReplayUpstream(self.fixtures, 'off') as replay, override_settings(OFF_BASE_URL=replay.url):
+            self.assertEqual(off.lookup_barcode('0123456789012'), OFF_PRODUCT)
+            with self.assertRaises(requests.HTTPError):
+                off.lookup_barcode('0000000000000')  # never recorded
+        self.assertEqual((replay.stats['served'], replay.stats['misses']), (1, 1))
+
+    def test_fdc_api_key_is_not_recorded(self):
+        body = {'fdcId': 123, 'description': 'Oats', 'foodNutrients': []}
+        with StubUpstream(body=body) as real, \
+                ReplayUpstream(self.fixtures, 'fdc', mode='record', upstream_base=real.url) as recorder, \
+                patch.object(fdc, 'FDC_BASE', recorder.url + '/'), patch.object(fdc, 'FDC_API_KEY', 'secret-key'):
+            caches[fdc.CACHE_ALIAS].clear()
+            self.assertEqual(fdc.get_food_details(123), body)
+        recorded = list((self.fixtures / 'fdc').glob('*.json'))
+        self.assertEqual(len(recorded), 1)
+        self.assertNotIn('secret-key', recorded[0].read_text())
+        # replays under any key
+        with ReplayUpstream(self.fixtures, 'fdc') as replay, \
+                patch.object(fdc, 'FDC_BASE', replay.url + '/'), patch.object(fdc, 'FDC_API_KEY', 'other-key'):
+            caches[fdc.CACHE_ALIAS].clear()
+            self.assertEqual(fdc.get_food_details(123), body)
+
+    @override_settings(UPSTREAM_RETRIES=2, UPSTREAM_BACKOFF_FACTOR=0, UPSTREAM_BACKOFF_JITTER=0)
+    def test_injected_errors_and_throttling_go_through_retries(self):
+        self._record_off()
+        for faults, status in ((Faults(error_rate=1.0, seed=1), 500), (Faults(throttle_rate=1.0, retry_after=0), 429)):
+            upstream.close_all()
+            with ReplayUpstream(self.fixtures, 'off', faults=faults) as replay, \
+                    override_settings(OFF_BASE_URL=replay.url):
+                with self.assertRaises(requests.HTTPError) as ctx:
+                    off.lookup_barcode('0123456789012')
+            self.assertGreaterEqual(ctx.exception.response.status_code, status)
+            self.assertEqual(replay.stats['requests'], 3)  # first try + UPSTREAM_RETRIES
+
+    @override_settings(UPSTREAM_RETRIES=0, UPSTREAM_READ_TIMEOUT=0.2)
+    def test_injected_stall_trips_read_timeout(self):
+        self._record_off()
+        upstream.close_all()
+        faults = Faults(latency='fixed:0.05', timeout_rate=1.0, stall=1.0)
+        with ReplayUpstream(self.fixtures, 'off', faults=faults) as replay, override_settings(OFF_BASE_URL=replay.url):
+            t0 = time.monotonic()
+            with self.assertRaisesRegex(requests.RequestException, 'Read timed out'):
+                off.lookup_barcode('0123456789012')
+            self.assertLess(time.monotonic() - t0, 0.9)
+        self.assertEqual(replay.stats['timeout'], 1)
+
+    def test_latency_specs(self):
+        rng = random.Random(3)
+        lognormal = parse_latency('lognormal:0.2,0.5')
+        draws = sorted(lognormal(rng, 0) for _ in range(2001))
+        self.assertAlmostEqual(draws[1000], 0.2, delta=0.02)
+        self.assertEqual(parse_latency('recorded:2')(rng, 0.3), 0.6)
+        self.assertTrue(all(parse_latency('normal:0,1')(rng, 0) >= 0 for _ in range(50)))
+        for bad in ('gamma:1', 'uniform:1', 'fixed:x'):
+            with self.assertRaises(ValueError):
+                parse_latency(bad)
+
+
+@override_settings(ROOT_URLCONF='core.benchmarks.async_urls')
+@patch.object(fdc, 'FDC_API_KEY', 'test-key')
+class AsyncUpstreamViewsTest(TestCase):
+    def setUp(self):
+        caches['upstream'].clear()
+        self.stub = StubUpstream()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+        stub_url = self.stub.url
+        for p in (patch.object(off, '_product_url', lambda code: f'{stub_url}/api/v0/product/{code}.json'),
+                  patch.object(fdc, 'FDC_BASE', stub_url + '/')):
+            p.start()
+            self.addCleanup(p.stop)
+        self.user = get_user_model().objects.create_user(username='async', password='test')
+
+    async def test_barcode_lookup_is_cached(self):
+        for _ in range(2):
+            response = await self.async_client.get('/api/foods/barcode/012345678905/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['product']['product_name'], 'Stub Bar')
+        await upstream_async.aclose_all()
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual((await BarcodeLookup.objects.aget(barcode='0012345678905')).hits, 1)
+
+    async def test_search_and_fdc_detail(self):
+        response = await self.async_client.get('/api/foods/search', {'q': 'bar', 'page_size': '5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 1)
+        self.assertEqual((await self.async_client.get('/api/foods/search')).status_code, 400)
+        # detail needs a logged-in user, like the DRF view
+        response = await self.async_client.get('/api/foods/fdc/123/')
+        self.assertEqual((response.status_code, response['WWW-Authenticate']), (401, 'Token'))
+        await upstream_async.aclose_all()
+
+    def test_import_by_barcode_creates_once(self):
+        self.client.force_login(self.user)
+        first = self.client.post('/api/foods/import/barcode/0000000000123/')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()['name'], 'Stub Bar')
+        self.assertEqual(self.client.post('/api/foods/import/barcode/0000000000123/').status_code, 200)
+        self.assertEqual(self.client.get('/api/foods/import/barcode/0000000000123/').status_code, 405)
+        self.assertEqual(Food.objects.filter(barcode='0000000000123').count(), 1)
+
+    @override_settings(UPSTREAM_ASYNC_MAX_IN_FLIGHT=7)
+    async def test_pool_size_follows_setting(self):
+        client = upstream_async._build_client()
+        pool = client._transport._pool
+        self.assertEqual((pool._max_connections, pool._max_keepalive_connections), (7, 7))
+        await client.aclose()
+
+    async def test_client_retries_5xx(self):
+        with StubUpstream(fail_first=1, fail_status=503) as stub:
+            response = await upstream_async.get(stub.url + '/x')
+        await upstream_async.aclose_all()
+        self.assertEqual((response.status_code, stub.requests), (200, 2))
+
+
+class ConcurrentImportTest(TransactionTestCase):
+    def setUp(self):
+        caches['upstream'].clear()
+        self.user = get_user_model().objects.create_user(username='scanner', password='test')
+
+    def _post_concurrently(self, url, n=6):
+        barrier = threading.Barrier(n)
+        results = [None] * n
+
+        def run(i):
+            try:
+                client = APIClient()
+                client.force_authenticate(user=self.user)
+                barrier.wait()
+                response = client.post(url)
+                results[i] = (response.status_code, response.json())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_bulk_import_loses_race_for_a_barcode(self):
+        real_bulk_create = catalog.bulk_create_foods
+
+        def other_import():
+            try:
+                Food.objects.create(name='Raced', barcode='5000000000002', nutrients=Nutrients.objects.create(calories=2))
+            finally:
+                connection.close()
+
+        def racing_bulk_create(items):
+            # a single-barcode import on another connection commits between our check and insert
+            if not Food.objects.filter(barcode='5000000000002').exists():
+                worker = threading.Thread(target=other_import)
+                worker.start()
+                worker.join()
+            return real_bulk_create(items)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with patch.object(catalog, 'bulk_create_foods', side_effect=racing_bulk_create), \
+                patch('core.services.upstream.get', side_effect=_off_response):
+            resp = client.post('/api/foods/import/barcodes/', {'barcodes': ['5000000000002', '5000000000003']},
+                               format='json')
+        self.assertEqual(resp.status_code, 200)
+        by_code = {r['barcode']: r for r in resp.json()['results']}
+        self.assertEqual((by_code['5000000000002']['status'], by_code['5000000000002']['food']['name']),
+                         ('existing', 'Raced'))
+        self.assertEqual(by_code['5000000000003']['status'], 'created')
+        self.assertEqual(Food.objects.filter(barcode__startswith='500000000000').count(), 2)
+
+    @patch('core.services.off.lookup_barcode')
+    def test_same_barcode_is_fetched_and_inserted_once(self, mock_lookup):
+        def slow_lookup(code):
+            time.sleep(0.3)
+            return {'status': 1, 'product': {'product_name': 'Protein Bar', 'nutriments': {'energy-kcal_100g': 380}}}
+        mock_lookup.side_effect = slow_lookup
+
+        results = self._post_concurrently('/api/foods/import/barcode/0000000000042/')
+        self.assertEqual(mock_lookup.call_count, 1)
+        self.assertEqual(sorted(code for code, _ in results), [200] * 5 + [201])
+        self.assertEqual(len({body['id'] for _, body in results}), 1)
+        self.assertEqual(Food.objects.filter(barcode='0000000000042').count(), 1)
+
+    @patch.object(fdc, 'FDC_API_KEY', 'test-key')
+    @patch('core.services.upstream.get')
+    def test_same_fdc_id_is_fetched_and_inserted_once(self, mock_get):
+        def slow_get(url, **kwargs):
+            time.sleep(0.3)
+            resp = MagicMock(ok=True)
+            resp.json.return_value = {'fdcId': 777, 'description': 'Protein bar', 'foodNutrients': [
+                {'nutrientId': 1003, 'nutrientName': 'Protein', 'unitName': 'G', 'value': 30}]}
+            return resp
+        mock_get.side_effect = slow_get
+
+        results = self._post_concurrently('/api/foods/import/fdc/777/')
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual({code for code, _ in results}, {200})
+        self.assertEqual(len({body['id'] for _, body in results}), 1)
+        self.assertEqual(Food.objects.get(fdc_id='777').nutrients.protein, 30)
+
+    @patch('core.services.off.lookup_barcode')
+    def test_insert_race_returns_the_winners_row(self, mock_lookup):
+        def lookup_while_bulk_import_inserts(code):
+            # a writer that doesn't take the import lock gets there first
+            Food.objects.create(name='Bulk row', barcode=code, nutrients=Nutrients.objects.create(calories=1))
+            return {'status': 1, 'product': {'product_name': 'Protein Bar'}}
+        mock_lookup.side_effect = lookup_while_bulk_import_inserts
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/foods/import/barcode/0000000000043/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Bulk row')
+        self.assertEqual(Food.objects.filter(barcode='0000000000043').count(), 1)
+
+    @override_settings(IMPORT_LOCK_TIMEOUT=0.1)
+    def test_lock_wait_is_bounded(self):
+        with singleflight.single_flight('off-import', '0000000000044'):
+            status_code, _ = self._post_concurrently('/api/foods/import/barcode/0000000000044/', n=1)[0]
+        self.assertEqual(status_code, 503)
+
+
+def _off_response(url, **kwargs):
+    code = url.rsplit('/', 1)[-1].split('.')[0]
+    resp = MagicMock()
+    if code == '0000000000017':
+        resp.raise_for_status.side_effect = requests.HTTPError('503 Server Error')
+    elif code.startswith('999'):
+        resp.json.return_value = {'status': 0}
+    else:
+        resp.json.return_value = {
+            'status': 1,
+            'product': {'product_name': f'Product {code}', 'nutriments': {'energy-kcal_100g': 100, 'sodium_100g': 0.5}},
+        }
+    return resp
+
+
+class BulkBarcodeImportTest(TestCase):
+    url = '/api/foods/import/barcodes/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='u', password='p'))
+        Food.objects.create(name='Local', barcode='4000000000001', nutrients=Nutrients.objects.create(calories=1))
+
+    @patch('core.services.upstream.get', side_effect=_off_response)
+    def test_mixed_batch(self, mock_get):
+        resp = self.client.post(self.url, {'barcodes': [
+            '4000000000001', '123456789012', '5000000000002', '9990000000001', '0000000000017', 'abc',
+        ]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        by_code = {r['barcode']: r for r in resp.json()['results']}
+        self.assertEqual(by_code['4000000000001']['status'], 'existing')
+        self.assertEqual(by_code['123456789012']['status'], 'created')
+        self.assertEqual(by_code['123456789012']['food']['barcode'], '0123456789012')
+        self.assertEqual(by_code['5000000000002']['food']['nutrients']['sodium'], 500)
+        self.assertEqual(by_code['9990000000001']['status'], 'not_found')
+        self.assertEqual(by_code['0000000000017']['status'], 'error')
+        self.assertEqual(by_code['abc']['status'], 'invalid')
+        self.assertEqual(resp.json()['counts'], {'existing': 1, 'created': 2, 'not_found': 1, 'error': 1, 'invalid': 1})
+        self.assertEqual(mock_get.call_count, 4)
+        self.assertEqual(Food.objects.count(), 3)
+
+    @patch('core.services.upstream.get', side_effect=_off_response)
+    def test_second_run_resolves_locally(self, mock_get):
+        codes = ['5000000000002', '5000000000003']
+        self.client.post(self.url, {'barcodes': codes}, format='json')
+        resp = self.client.post(self.url, {'barcodes': codes}, format='json')
+        self.assertEqual(resp.json()['counts'], {'existing': 2})
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('core.services.upstream.get', side_effect=_off_response)
+    def test_single_and_bulk_store_the_same_barcode(self, mock_get):
+        single = self.client.post('/api/foods/import/barcode/123456789012/')
+        self.assertEqual((single.status_code, single.json()['barcode']), (201, '0123456789012'))
+        resp = self.client.post(self.url, {'barcodes': ['123456789012']}, format='json')
+        self.assertEqual(resp.json()['counts'], {'existing': 1})
+        self.assertEqual(self.client.post('/api/foods/import/barcode/abc/').status_code, 400)
+
+    @patch('core.services.upstream.get', side_effect=_off_response)
+    def test_insert_that_keeps_failing_is_reported(self, mock_get):
+        with patch.object(catalog, 'bulk_create_foods', side_effect=IntegrityError('duplicate key')) as create:
+            resp = self.client.post(self.url, {'barcodes': ['4000000000001', '5000000000002']}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(create.call_count, 2)  # one try per pending barcode, plus one
+        by_code = {r['barcode']: r for r in resp.json()['results']}
+        self.assertEqual(by_code['4000000000001']['status'], 'existing')
+        self.assertEqual((by_code['5000000000002']['status'], by_code['5000000000002']['food']), ('error', None))
+
+    def test_rejects_oversized_and_malformed_batches(self):
+        self.assertEqual(self.client.post(self.url, {'barcodes': []}, format='json').status_code, 400)
+        with self.settings(OFF_BULK_IMPORT_MAX=2):
+            resp = self.client.post(self.url, {'barcodes': ['1', '2', '3']}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+class BenchMealHistoryCommandTest(TestCase):
+    def test_seeded_history_is_removed_unless_kept(self):
+        args = ['--entries', '60', '--pages', '1', '2', '--iterations', '1']
+        call_command('bench_meal_history', *args, stdout=StringIO())
+        self.assertFalse(get_user_model().objects.filter(username='bench-history').exists())
+        self.assertEqual((Food.objects.count(), Nutrients.objects.count(), MealEntry.objects.count()), (0, 0, 0))
+        call_command('bench_meal_history', *args, '--keep', stdout=StringIO())
+        self.assertEqual(MealEntry.objects.filter(user__username='bench-history').count(), 60)
+        self.assertEqual(Food.objects.get().data_source, 'BENCH_HISTORY')
+
+
+class BenchFoodSearchCommandTest(TestCase):
+    def test_seeded_foods_are_removed_unless_kept(self):
+        Food.objects.create(name='Real oats', nutrients=Nutrients.objects.create(calories=380))
+        with patch.object(fdc, 'FDC_API_KEY', ''):
+            call_command('bench_food_search', '--seed', '30', '--iterations', '2', '--stub-latency', '0',
+                         stdout=StringIO())
+            self.assertEqual(list(Food.objects.values_list('name', flat=True)), ['Real oats'])
+            self.assertEqual(Nutrients.objects.count(), 1)
+            call_command('bench_food_search', '--seed', '30', '--iterations', '2', '--stub-latency', '0', '--keep',
+                         stdout=StringIO())
+        self.assertEqual(Food.objects.filter(data_source='BENCH').count(), 30)
+
+
+class LoadOffDumpTest(TestCase):
+    products = [
+        {'code': '3000000000001', 'product_name': 'Oat Bar', 'brands': 'Acme, Other', 'nutriments': {'energy-kcal_100g': 400, 'sodium_100g': 0.2}},
+        {'code': '123456789012', 'product_name': 'Soda', 'nutriments': {'energy-kj_100g': 418.4}},
+        {'code': '', 'product_name': 'No barcode'},
+        {'code': '3000000000003', 'product_name': 'Rice', 'nutriments': {'carbohydrates_100g': '78,5'}},
+    ]
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def _jsonl_gz(self):
+        path = self.tmp / 'products.jsonl.gz'
+        with gzip.open(path, 'wt') as fh:
+            for p in self.products:
+                fh.write(json.dumps(p) + '\n')
+            fh.write('not json\n')
+        return path
+
+    def test_loads_gzip_jsonl_in_batches(self):
+        out = StringIO()
+        call_command('load_off_dump', str(self._jsonl_gz()), '--batch-size', '2', stdout=out)
+        self.assertEqual(Food.objects.count(), 3)
+        bar = Food.objects.get(barcode='3000000000001')
+        self.assertEqual((bar.brand, bar.data_source, bar.nutrients.sodium), ('Acme', 'OFF', 200))
+        self.assertAlmostEqual(Food.objects.get(barcode='0123456789012').nutrients.calories, 100.0)
+        self.assertEqual(Food.objects.get(barcode='3000000000003').nutrients.carbs, 78.5)
+        self.assertIn('created=3', out.getvalue())
+        self.assertIn('skipped=2', out.getvalue())
+
+    def test_resume_from_checkpoint_and_upsert(self):
+        path = self._jsonl_gz()
+        call_command('load_off_dump', str(path), '--batch-size', '1', '--limit', '2', stdout=StringIO())
+        self.assertEqual(Food.objects.count(), 2)
+        Nutrients.objects.filter(food__barcode='3000000000001').update(calories=1)
+        out = StringIO()
+        call_command('load_off_dump', str(path), '--resume', stdout=out)
+        self.assertEqual(Food.objects.count(), 3)
+        self.assertEqual(Food.objects.get(barcode='3000000000001').nutrients.calories, 1)  # not re-read
+        call_command('load_off_dump', str(path), stdout=StringIO())
+        self.assertEqual(Food.objects.get(barcode='3000000000001').nutrients.calories, 400)
+
+    def test_loads_csv_export(self):
+        path = self.tmp / 'products.csv'
+        path.write_text(
+            'code\tproduct_name\tbrands\tenergy-kcal_100g\tproteins_100g\n'
+            '3000000000001\tOat Bar\tAcme\t400\t12.5\n'
+            '3000000000002\tMilk\t\t64\t3.3\n'
+        )
+        call_command('load_off_dump', str(path), stdout=StringIO())
+        self.assertEqual(Food.objects.get(barcode='3000000000002').nutrients.protein, 3.3)
+        self.assertEqual(Food.objects.get(barcode='3000000000001').nutrients.calories, 400)
+
+    def test_csv_quotes_are_literal_and_long_names_clipped(self):
+        path = self.tmp / 'products.csv'
+        long_name = 'Granola ' * 50
+        path.write_text(
+            'code\tproduct_name\tbrands\tenergy-kcal_100g\tproteins_100g\n'
+            '3000000000001\t"Best" oats\tAcme\t400\t12.5\n'
+            f'3000000000002\t{long_name}\t{"B" * 300}\t64\t3.3\n'
+        )
+        call_command('load_off_dump', str(path), '--batch-size', '10', stdout=StringIO())
+        oats = Food.objects.get(barcode='3000000000001')
+        self.assertEqual((oats.name, oats.brand, oats.nutrients.protein), ('"Best" oats', 'Acme', 12.5))
+        granola = Food.objects.get(barcode='3000000000002')
+        self.assertEqual((len(granola.name), len(granola.brand)), (255, 255))
+        self.assertEqual(granola.nutrients.calories, 64)
+
+class LoadFdcCsvTest(TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        self._write('nutrient.csv', ['id', 'name', 'unit_name', 'nutrient_nbr', 'rank'], [
+            ['1003', 'Protein', 'G', '203', '600'],
+            ['1004', 'Total lipid (fat)', 'G', '204', '800'],
+            ['1008', 'Energy', 'KCAL', '208', '300'],
+        ])
+        self._write('food.csv', ['fdc_id', 'data_type', 'description', 'food_category_id', 'publication_date'], [
+            ['100', 'branded_food', 'Peanut Butter', '', '2021-01-01'],
+            ['200', 'sr_legacy_food', 'Apple, raw', '9', '2019-04-01'],
+            ['300', 'branded_food', 'Water', '', '2021-01-01'],
+        ])
+        self._write('food_nutrient.csv', ['id', 'fdc_id', 'nutrient_id', 'amount'], [
+            ['1', '100', '1008', '588'], ['2', '100', '1003', '25'], ['3', '100', '1004', '50'],
+            ['4', '200', '1008', '52'], ['5', '200', '1003', '0.3'],
+        ])
+        self._write('branded_food.csv', ['fdc_id', 'brand_owner', 'gtin_upc'], [
+            ['100', 'Nutty Co', '000000000100'], ['300', 'Springs', '000000000300'],
+        ])
+
+    def _write(self, name, header, rows):
+        with open(self.dir / name, 'w', newline='') as fh:
+            w = csv.writer(fh)
+            w.writerow(header)
+            w.writerows(rows)
+
+    def _assert_loaded(self):
+        pb = Food.objects.get(fdc_id='100')
+        self.assertEqual((pb.name, pb.brand, pb.data_source), ('Peanut Butter', 'Nutty Co', 'FDC'))
+        self.assertEqual((pb.nutrients.calories, pb.nutrients.protein, pb.nutrients.fat), (588, 25, 50))
+        self.assertEqual(Food.objects.get(fdc_id='200').nutrients.calories, 52)
+        self.assertEqual(Food.objects.get(fdc_id='300').nutrients.calories, 0.0)
+
+    def test_sorted_merge_join(self):
+        call_command('load_fdc_csv', str(self.dir), '--batch-size', '2', stdout=StringIO())
+        self._assert_loaded()
+
+    def test_chunked_mode_handles_unsorted_input(self):
+        self._write('food_nutrient.csv', ['id', 'fdc_id', 'nutrient_id', 'amount'], [
+            ['4', '200', '1008', '52'], ['1', '100', '1008', '588'], ['5', '200', '1003', '0.3'],
+            ['2', '100', '1003', '25'], ['3', '100', '1004', '50'],
+        ])
+        with self.assertRaises(CommandError):
+            call_command('load_fdc_csv', str(self.dir), stdout=StringIO())
+        call_command('load_fdc_csv', str(self.dir), '--mode', 'chunked', '--chunk-size', '2', stdout=StringIO())
+        self._assert_loaded()
+
+    def test_upserts_on_fdc_id_and_filters_data_type(self):
+        call_command('load_fdc_csv', str(self.dir), '--data-type', 'branded_food', stdout=StringIO())
+        self.assertFalse(Food.objects.filter(fdc_id='200').exists())
+        Nutrients.objects.filter(food__fdc_id='100').update(calories=1)
+        out = StringIO()
+        call_command('load_fdc_csv', str(self.dir), stdout=out)
+        self.assertIn('created=1 updated=1', out.getvalue())
+        self._assert_loaded()
+
+class NutrientMappingTest(TestCase):
+    def test_fdc_maps_by_id_not_name_substring(self):
+        _, n = fdc.parse_food_payload({'fdcId': 1, 'description': 'Butter', 'foodNutrients': [
+            {'nutrientId': 1258, 'nutrientName': 'Fatty acids, total saturated', 'unitName': 'G', 'value': 51},
+            {'nutrientId': 1062, 'nutrientName': 'Energy', 'unitName': 'kJ', 'value': 3000},
+            {'nutrientId': 1008, 'nutrientName': 'Energy', 'unitName': 'KCAL', 'value': 717},
+            {'nutrientId': 1004, 'nutrientName': 'Total lipid (fat)', 'unitName': 'G', 'value': 81},
+            {'nutrientId': 1093, 'nutrientName': 'Sodium, Na', 'unitName': 'MG', 'value': 11},
+        ]})
+        self.assertEqual((n['calories'], n['fat'], n['sodium'], n['protein']), (717, 81, 11, 0.0))
+
+    def test_fdc_converts_units_and_reads_full_and_legacy_formats(self):
+        n = nutrient_map.FDC.map([
+            {'nutrient': {'id': 1062, 'number': '268', 'name': 'Energy', 'unitName': 'kJ'}, 'amount': 418.4},
+            {'nutrient': {'id': 1093, 'number': '307', 'name': 'Sodium, Na', 'unitName': 'g'}, 'amount': 0.5},
+            {'number': '203', 'name': 'Protein', 'amount': 3.2, 'unitName': 'G'},
+            {'nutrientId': 1050, 'nutrientName': 'Carbohydrate, by summation', 'unitName': 'G', 'value': 9},
+        ])
+        self.assertAlmostEqual(n['calories'], 100)
+        self.assertAlmostEqual(n['sodium'], 500)
+        self.assertEqual((n['protein'], n['carbs']), (3.2, 9))
+
+    def test_fdc_batch_matches_single(self):
+        payloads = [{'fdcId': i, 'description': f'Food {i}', 'foodNutrients': [
+            {'nutrientId': 1003, 'nutrientName': 'Protein', 'unitName': 'G', 'value': i}]} for i in range(3)]
+        self.assertEqual(fdc.parse_food_payloads(payloads), [fdc.parse_food_payload(p) for p in payloads])
+
+    def test_off_normalization_unchanged(self):
+        data = off.normalize_off_payload({'product': {'product_name': 'Oats', 'nutriments': {
+            'energy_100g': '418,4', 'proteins_serving': 5, 'sodium_100g': 0.5}}})
+        n = data['nutrients']
+        self.assertAlmostEqual(n['calories'], 100)
+        self.assertEqual((n['protein'], n['sodium'], n['fat']), (5.0, 500, None))
+
+@patch.object(fdc, 'FDC_API_KEY', 'test-key')
+class LocalSearchTest(TestCase):
+    def setUp(self):
+        caches['upstream'].clear()
+        for name, brand in [('Chicken Breast, grilled', 'Tyson'), ('Chicken thigh', None),
+                            ('Peanut butter', 'Jif'), ('Apple, raw', None)]:
+            Food.objects.create(name=name, brand=brand, nutrients=Nutrients.objects.create(calories=100))
+
+    def _search(self, q, **params):
+        return APIClient().get('/api/foods/search', {'q': q, 'mode': 'local', **params}).json()
+
+    @patch('core.services.upstream.get')
+    def test_local_hits_skip_fdc(self, mock_get):
+        with self.settings(FOOD_SEARCH_MIN_LOCAL_RESULTS=2):
+            data = self._search('chick')
+        self.assertEqual(data['source'], 'local')
+        self.assertEqual({r['name'] for r in data['results']}, {'Chicken Breast, grilled', 'Chicken thigh'})
+        mock_get.assert_not_called()
+
+    @patch('core.services.upstream.get')
+    def test_ranks_best_match_first_and_matches_brand(self, mock_get):
+        with self.settings(FOOD_SEARCH_MIN_LOCAL_RESULTS=1):
+            self.assertEqual(self._search('chicken breast')['results'][0]['name'], 'Chicken Breast, grilled')
+            self.assertEqual(self._search('jif')['results'][0]['name'], 'Peanut butter')
+        mock_get.assert_not_called()
+
+    @patch('core.services.upstream.get')
+    def test_falls_back_to_fdc_and_writes_through(self, mock_get):
+        mock_get.return_value.json.return_value = {'foods': [{
+            'fdcId': 2345, 'description': 'Banana, raw', 'dataType': 'Foundation',
+            'foodNutrients': [{'nutrientId': 1008, 'nutrientName': 'Energy', 'unitName': 'KCAL', 'value': 89}],
+        }]}
+        data = self._search('banana')
+        self.assertEqual(data['source'], 'local+fdc')
+        self.assertEqual(data['results'][0]['fdc_id'], '2345')
+        self.assertEqual(Food.objects.get(fdc_id='2345').nutrients.calories, 89)
+        mock_get.reset_mock()
+        self.assertEqual(self._search('banana', page_size=1)['source'], 'local')
+        mock_get.assert_not_called()
+
 @pytest.mark.django_db
 class TestFoodImports:
-    @patch('core.services.off.requests.get')
+    @patch('core.services.upstream.get')
     def test_barcode_import_happy_path(self, mock_get):
         # Mock OFF response
         mock_get.return_value.json.return_value = {
@@ -67,7 +1580,7 @@ class TestFoodImports:
         assert data['nutrients']['calories'] == 111
         assert data['nutrients']['protein'] == 2.2
 
-    @patch('core.services.fdc.requests.get')
+    @patch('core.services.upstream.get')
     def test_fdc_import_happy_path(self, mock_get):
         # Mock FDC response
         mock_get.return_value.json.return_value = {
@@ -91,7 +1604,7 @@ class TestFoodImports:
         assert data['nutrients']['calories'] == 222
         assert data['nutrients']['protein'] == 3.3
 
-    @patch('core.services.off.requests.get')
+    @patch('core.services.upstream.get')
     def test_barcode_import_not_found(self, mock_get):
         mock_get.return_value.json.return_value = {'status': 0}
         client = APIClient()
@@ -100,7 +1613,7 @@ class TestFoodImports:
         assert resp.status_code == 404
         assert resp.json() == {'detail': 'Product not found'}
 
-    @patch('core.services.fdc.requests.get')
+    @patch('core.services.upstream.get')
     def test_fdc_import_not_found(self, mock_get):
         mock_get.return_value.json.return_value = {}
         client = APIClient()
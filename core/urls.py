@@ -1,14 +1,26 @@
 from rest_framework.routers import DefaultRouter
-from .views import FoodViewSet, MealEntryViewSet, import_food_by_barcode
+from .views import FoodViewSet, GoalsViewSet, MealEntryViewSet, NutrientsViewSet, TrainerViewSet, import_food_by_barcode, import_foods_by_barcodes
+from django.conf import settings
 from django.urls import path, include
+from . import async_views, metrics
 
 router = DefaultRouter()
 router.trailing_slash = '/?'
 router.register(r'foods', FoodViewSet, basename='foods')
 router.register(r'meals', MealEntryViewSet, basename='meals')
+router.register(r'nutrients', NutrientsViewSet, basename='nutrients')
+router.register(r'goals', GoalsViewSet, basename='goals')
+router.register(r'trainer', TrainerViewSet, basename='trainer')
 
 urlpatterns = [
     path('', include(router.urls)),
     path("foods/import/barcode/<str:code>/", import_food_by_barcode),
+    path("foods/import/barcodes/", import_foods_by_barcodes),
+    path("metrics", metrics.metrics_view),
 
 ]
+
+# Under ASGI (see backend/asgi.py) the upstream-bound endpoints are served by their async versions.
+async_urlpatterns = async_views.urlpatterns + urlpatterns
+if settings.ASYNC_UPSTREAM_VIEWS:
+    urlpatterns = async_urlpatterns
@@ -1,98 +1,301 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
 from django.shortcuts import get_object_or_404
 from django.db import transaction, IntegrityError
 from django.utils import timezone as dj_tz
 from django.conf import settings
-from datetime import datetime, time, timedelta, timezone as dt_tz
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from urllib.parse import urlencode
+from datetime import datetime
 from zoneinfo import ZoneInfo
 try:
     from zoneinfo import ZoneInfo  # py3.9+
 except Exception:
     ZoneInfo = None
-from .models import Food, Nutrients, MealEntry
-from .serializers import FoodSerializer, NutrientsSerializer, MealEntrySerializer
-from .services import off, fdc
+from .models import Food, Nutrients, MealEntry, Profile
+from .pagination import MealHistoryPagination
+from .serializers import (
+    FoodSerializer, NutrientsSerializer, MealEntrySerializer, MealEntryReadSerializer, MealEntryBatchItemSerializer,
+    ProfileSerializer,
+)
+from .services import off, fdc, meals, catalog, singleflight, goals
+from .services import search as catalog_search
 from .services.off import normalize_off_payload 
-import re
+import hashlib
 
-def _utc_window_for_local_day(date_str: str, tz_name: str | None):
+NUTRIENT_UNITS = {
+    "calories": "kcal", "protein": "g", "carbs": "g",
+    "fat": "g", "fiber": "g", "sugar": "g", "sodium": "mg",
+}
+
+def _rounded(totals: dict) -> dict:
+    """Display rounding: whole kcal and mg, grams to 2 places; None passes through."""
+    return {
+        k: v if v is None else (round(v, 0) if k in ("calories", "sodium") else round(v, 2))
+        for k, v in totals.items()
+    }
+
+def _parse_local_day(date_str: str, tz_name: str | None):
     """
-    Given a YYYY-MM-DD and an IANA tz name, return [start_utc, end_utc)
-    that exactly covers that local calendar day.
+    Parse a YYYY-MM-DD and an IANA tz name into (date, ZoneInfo).
+    Unknown tz names fall back to settings.TIME_ZONE.
     """
     try:
         d = datetime.strptime(date_str, "%Y-%m-%d").date()
     except (TypeError, ValueError):
         raise ValidationError({"detail": "Invalid date format. Use YYYY-MM-DD."})
 
+    return d, _parse_tz(tz_name)
+
+def _parse_tz(tz_name: str | None):
+    """IANA tz name -> ZoneInfo; unknown or empty names fall back to settings.TIME_ZONE."""
     try:
-        tz = ZoneInfo(tz_name) if tz_name else ZoneInfo(settings.TIME_ZONE)
+        return ZoneInfo(tz_name) if tz_name else ZoneInfo(settings.TIME_ZONE)
     except Exception:
-        tz = ZoneInfo(settings.TIME_ZONE)
-
-    start_local = datetime.combine(d, time.min, tzinfo=tz)
-    next_day_local = start_local + timedelta(days=1)
+        return ZoneInfo(settings.TIME_ZONE)
 
-    start_utc = start_local.astimezone(dt_tz.utc)
-    end_utc   = next_day_local.astimezone(dt_tz.utc)
-    return start_utc, end_utc
-
-def _to_float(v):
-    try:
-        return float(v) if v not in ("", None) else None
-    except (TypeError, ValueError):
-        return None
+def _utc_window_for_local_day(date_str: str, tz_name: str | None):
+    """
+    Given a YYYY-MM-DD and an IANA tz name, return [start_utc, end_utc)
+    that exactly covers that local calendar day.
+    """
+    return meals.utc_window(*_parse_local_day(date_str, tz_name))
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def import_food_by_barcode(request, code: str):
-    existing = Food.objects.select_related("nutrients").filter(barcode=code).first()
+    # stored normalized, like the bulk import and the OFF cache; rows saved before that
+    # may still carry the code as submitted
+    submitted, code = code, off.normalize_barcode(code)
+    if not code:
+        return Response({"detail": "Not a barcode"}, status=status.HTTP_400_BAD_REQUEST)
+    existing = Food.objects.select_related("nutrients").filter(barcode__in={submitted, code}).first()
     if existing:
         return Response(FoodSerializer(existing).data, status=status.HTTP_200_OK)
 
     try:
-        raw = off.lookup_barcode(code)          # << use your lookup
-    except Exception as e:
-        return Response({"detail": f"Lookup failed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+        # concurrent scans of one new code share a single OFF fetch and insert
+        with singleflight.single_flight("off-import", code):
+            existing = Food.objects.select_related("nutrients").filter(barcode__in={submitted, code}).first()
+            if existing:
+                return Response(FoodSerializer(existing).data, status=status.HTTP_200_OK)
+            try:
+                raw = off.lookup_barcode_cached(code)
+            except Exception as e:
+                return Response({"detail": f"Lookup failed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+            food, created = _create_off_food(code, raw)
+    except singleflight.ImportBusy as e:
+        return Response({"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    if food is None:
+        return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(FoodSerializer(food).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
+def _create_off_food(code: str, raw: dict):
+    """
+    Insert the Food/Nutrients for an OFF lookup result. Returns (food, created); food is
+    None if OFF has no usable product. If another writer inserted the barcode first
+    (e.g. the bulk importer, which doesn't take the import lock), its row is returned.
+    """
     data = normalize_off_payload(raw)
     if not data:
-        return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return None, False
+    food_fields, nutrients_fields = catalog.off_food_fields(data, code)
+    try:
+        with transaction.atomic():
+            nutrients = Nutrients.objects.create(**nutrients_fields)
+            return Food.objects.create(nutrients=nutrients, **food_fields), True
+    except IntegrityError:
+        return Food.objects.select_related("nutrients").get(barcode=code), False
 
-    nd = data.get("nutrients") or {}
-    with transaction.atomic():
-        nutrients = Nutrients.objects.create(
-            calories=_to_float(nd.get("calories")),
-            protein=_to_float(nd.get("protein")),
-            carbs=_to_float(nd.get("carbs")),
-            fat=_to_float(nd.get("fat")),
-            fiber=_to_float(nd.get("fiber")),
-            sugar=_to_float(nd.get("sugar")),   
-            sodium=_to_float(nd.get("sodium")),
-        )
-        food = Food.objects.create(
-            name=data.get("name") or "Unknown",
-            brand=data.get("brand"),
-            barcode=code,
-            data_source="OFF",
-            nutrients=nutrients,
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_foods_by_barcodes(request):
+    """
+    POST /api/foods/import/barcodes/  {"barcodes": ["737628064502", ...]}
+    Bulk version of import_food_by_barcode: local hits are resolved with one query,
+    missing codes are fetched from OFF concurrently and inserted in one transaction.
+    Reports a status per submitted code: existing | created | not_found | invalid | error.
+    """
+    codes = request.data.get("barcodes") if isinstance(request.data, dict) else None
+    if not isinstance(codes, list) or not codes:
+        raise ValidationError({"barcodes": "Expected a non-empty list of barcodes."})
+    if len(codes) > settings.OFF_BULK_IMPORT_MAX:
+        raise ValidationError({"barcodes": f"At most {settings.OFF_BULK_IMPORT_MAX} barcodes per request."})
+    codes = list(dict.fromkeys(str(c).strip() for c in codes))
+    normalized = {c: off.normalize_barcode(c) for c in codes}
+
+    # local catalog first, matching either the submitted or the normalized form
+    lookup_keys = {c for c in codes} | {n for n in normalized.values() if n}
+    local = {f.barcode: f for f in Food.objects.select_related("nutrients").filter(barcode__in=lookup_keys)}
+
+    results = {}
+    missing = []
+    for c in codes:
+        food = local.get(c) or local.get(normalized[c])
+        if food is not None:
+            results[c] = {"status": "existing", "food": food}
+        elif not normalized[c]:
+            results[c] = {"status": "invalid", "detail": "Not a barcode"}
+        else:
+            missing.append(c)
+
+    raw_by_key = off.lookup_barcodes_cached(
+        [normalized[c] for c in missing], max_workers=settings.OFF_BULK_IMPORT_WORKERS,
+    )
+    to_create = {}
+    for c in missing:
+        key = normalized[c]
+        raw = raw_by_key.get(key)
+        if isinstance(raw, Exception):
+            results[c] = {"status": "error", "detail": f"Lookup failed: {raw}"}
+            continue
+        data = normalize_off_payload(raw)
+        if not data:
+            results[c] = {"status": "not_found", "detail": "Product not found"}
+        elif key not in to_create:
+            to_create[key] = catalog.off_food_fields(data, key)
+
+    # A concurrent import may insert some of these barcodes at any point, even between
+    # the check and the insert; then the insert fails on the unique barcode, and we
+    # re-check and retry. Each failure means one more barcode exists, so this ends.
+    created = []
+    for _ in range(len(to_create) + 1):
+        try:
+            with transaction.atomic():
+                taken = set(Food.objects.filter(barcode__in=list(to_create)).values_list("barcode", flat=True))
+                created = catalog.bulk_create_foods(v for k, v in to_create.items() if k not in taken)
+            break
+        except IntegrityError:
+            continue
+    created_by_key = {f.barcode: f for f in created}
+    raced = set(to_create) - set(created_by_key)
+    if raced:
+        created_by_key.update(
+            (f.barcode, f) for f in Food.objects.select_related("nutrients").filter(barcode__in=raced)
         )
-    return Response(FoodSerializer(food).data, status=status.HTTP_201_CREATED)
+    for c in missing:
+        food = created_by_key.get(normalized[c])
+        if c in results:
+            continue
+        if food is not None:
+            results[c] = {"status": "existing" if food.barcode in raced else "created", "food": food}
+        else:  # every insert attempt failed and the row still isn't there
+            results[c] = {"status": "error", "detail": "Could not save the product, try again"}
+
+    payload = []
+    for c in codes:
+        r = results[c]
+        food = r.pop("food", None)
+        payload.append({"barcode": c, **r, "food": FoodSerializer(food).data if food else None})
+    counts = {}
+    for r in payload:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return Response({"results": payload, "counts": counts}, status=status.HTTP_200_OK)
+
+def _checked_fdc_details(resp):
+    """get_food_details() result -> food payload; ValueError if FDC has no such food."""
+    if isinstance(resp, tuple):
+        # Error from service
+        data, code = resp
+        if code == 501:
+            raise Exception(data.get('error', 'FDC API error'))
+    else:
+        data = resp
+    if not data or 'description' not in data:
+        raise ValueError('Product not found')
+    return data
+
+def _upsert_fdc_food(fdc_data, food_fields, nutrients_fields):
+    """
+    Create or refresh the Food/Nutrients for an FDC payload, keyed on fdc_id. A create
+    that loses a race on the unique fdc_id refreshes the winner's row instead.
+    """
+    fdc_id = str(fdc_data.get('fdcId', ''))
+    food_fields = {**food_fields, 'fdc_id': fdc_id}
+    food = Food.objects.select_related('nutrients').filter(fdc_id=fdc_id).first()
+    if food is None:
+        try:
+            with transaction.atomic():
+                n = Nutrients.objects.create(**nutrients_fields)
+                return Food.objects.create(nutrients=n, **food_fields)
+        except IntegrityError:
+            food = Food.objects.select_related('nutrients').get(fdc_id=fdc_id)
+
+    with transaction.atomic():
+        for k, v in food_fields.items():
+            setattr(food, k, v)
+        food.save(update_fields=list(food_fields))
+        n = food.nutrients
+        for k, v in nutrients_fields.items():
+            setattr(n, k, v)
+        n.save(update_fields=list(nutrients_fields.keys()))
+        # logged entries keep their snapshotted totals; only per100 in meal lists changes
+        meals.bump_data_version(MealEntry.objects.filter(food=food).values("user"))
+    return food
 
 class FoodViewSet(viewsets.ModelViewSet):
-    queryset = Food.objects.all()
+    """
+    Catalog CRUD. The list takes exact-match filters (?brand=, ?data_source=,
+    ?barcode=, ?fdc_id=), each backed by an index, and list/retrieve take a sparse
+    fieldset (?fields=id,name,brand,calories; see FoodSerializer).
+    """
+    queryset = Food.objects.select_related("nutrients").order_by("id")
     serializer_class = FoodSerializer
+    FILTERS = ("brand", "data_source", "barcode", "fdc_id")
+
+    def _sparse_fields(self):
+        """Names from ?fields= on list/retrieve, or None for the full representation."""
+        if self.action not in ("list", "retrieve") or self.request.method not in ("GET", "HEAD"):
+            return None
+        names = [n.strip() for n in self.request.query_params.get("fields", "").split(",") if n.strip()]
+        if not names:
+            return None
+        try:
+            FoodSerializer.split_fields(names)
+        except ValueError as e:
+            raise ValidationError({"fields": str(e)})
+        return names
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            for name in self.FILTERS:
+                value = self.request.query_params.get(name)
+                if value is not None:
+                    qs = qs.filter(**{name: self._normalize_barcode(value) if name == "barcode" else value})
+        names = self._sparse_fields()
+        if names is not None:
+            # load only the requested columns; skip the nutrients join when none are wanted
+            food, nutrients = FoodSerializer.split_fields(names)
+            if nutrients:
+                qs = qs.only("id", *food, *(f"nutrients__{n}" for n in nutrients))
+            else:
+                qs = qs.select_related(None).only("id", *food)
+        return qs
+
+    def get_serializer(self, *args, **kwargs):
+        names = self._sparse_fields()
+        if names is not None:
+            kwargs["fields"] = names
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_update(self, serializer):
+        food = serializer.save()
+        # name/brand show up in the meal lists of everyone who logged this food
+        meals.bump_data_version(MealEntry.objects.filter(food=food).values("user"))
+
+    def perform_destroy(self, instance):
+        # entries cascade away with the food, so their rollups go stale
+        meals.invalidate_daily_totals(MealEntry.objects.filter(food=instance))
+        instance.delete()
 
     def _normalize_barcode(self, code: str) -> str:
-        c = re.sub(r'\D', '', str(code or ''))
-        # UPC-A (12) -> EAN-13 (prefix a '0')
-        if len(c) == 12:
-            return '0' + c
-        return c   
+        return off.normalize_barcode(code)
 
     @action(detail=False, methods=['get'], url_path='search', permission_classes=[AllowAny])
     def search(self, request):
@@ -100,7 +303,19 @@ class FoodViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({'error': 'Missing query param q'}, status=400)
         try:
-            results = fdc.search_foods(query)
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'page and page_size must be integers'}, status=400)
+        if request.query_params.get('mode') == 'local':
+            # catalog first (full-text + trigram), FDC only when that comes up short
+            try:
+                foods, source = catalog_search.search_catalog(query, limit=page_size)
+            except Exception as e:
+                return Response({'detail': str(e)}, status=502)
+            return Response({'source': source, 'results': FoodSerializer(foods, many=True).data})
+        try:
+            results = fdc.search_foods(query, page_number=page, page_size=page_size)
         except Exception as e:
             return Response({'detail': str(e)}, status=502)
         return Response(results)
@@ -119,7 +334,7 @@ class FoodViewSet(viewsets.ModelViewSet):
         if not code:
             return Response({'error': 'Missing barcode'}, status=400)
         try:
-            product = off.lookup_barcode(code)
+            product = off.lookup_barcode_cached(code)
         except Exception as e:
             return Response({'detail': str(e)}, status=502)
         return Response(product)
@@ -129,76 +344,34 @@ class FoodViewSet(viewsets.ModelViewSet):
         if not fdc_id:
             return Response({'detail': 'Missing fdc_id'}, status=400)
         try:
-            fdc_data = self._fetch_fdc_details(fdc_id)
-        except ValueError as e:
-            return Response({'detail': str(e)}, status=404)
-        except Exception as e:
-            return Response({'detail': str(e)}, status=502)
-
-        # Normalize fields
-        food_fields, nutrients_fields = self._parse_fdc_to_food_nutrients(fdc_data)
-
-        # 1) Upsert Food first
-        food, _ = Food.objects.update_or_create(
-            fdc_id=str(fdc_data.get('fdcId', '')),
-            defaults=food_fields,
-        )
-
-        # after you have `food` and a dict called `nutrients_fields`
-        if getattr(food, "nutrients_id", None):
-            n = food.nutrients
-            for k, v in nutrients_fields.items():
-                setattr(n, k, v)
-            n.save(update_fields=list(nutrients_fields.keys()))
-        else:
-            n = Nutrients.objects.create(**nutrients_fields)
-            food.nutrients = n
-            food.save(update_fields=["nutrients"])
-
-
+            with singleflight.single_flight('fdc-import', fdc_id) as waited:
+                if waited:
+                    # a concurrent import of this id just finished: share its row
+                    food = Food.objects.select_related('nutrients').filter(fdc_id=str(fdc_id)).first()
+                    if food is not None:
+                        return Response(FoodSerializer(food).data)
+                try:
+                    fdc_data = self._fetch_fdc_details(fdc_id)
+                except ValueError as e:
+                    return Response({'detail': str(e)}, status=404)
+                except Exception as e:
+                    return Response({'detail': str(e)}, status=502)
+
+                # Normalize fields
+                food_fields, nutrients_fields = self._parse_fdc_to_food_nutrients(fdc_data)
+                food = _upsert_fdc_food(fdc_data, food_fields, nutrients_fields)
+        except singleflight.ImportBusy as e:
+            return Response({'detail': str(e)}, status=503)
         return Response(FoodSerializer(food).data)
 
     def _fetch_fdc_details(self, fdc_id):
-        resp = fdc.get_food_details(fdc_id)
-        if isinstance(resp, tuple):
-            # Error from service
-            data, code = resp
-            if code == 501:
-                raise Exception(data.get('error', 'FDC API error'))
-        else:
-            data = resp
-        if not data or 'description' not in data:
-            raise ValueError('Product not found')
-        return data
+        return _checked_fdc_details(fdc.get_food_details(fdc_id))
 
     def _parse_fdc_to_food_nutrients(self, data):
-        # FDC API fields: description, brandOwner, foodNutrients (list of dicts)
-        food_fields = {
-            'name': data.get('description', ''),
-            'brand': data.get('brandOwner', ''),
-            'fdc_id': str(data.get('fdcId', '')),
-            'data_source': 'FDC',
-        }
-        # Map FDC nutrients to our model
-        nut_map = {n['nutrientName'].lower(): n for n in data.get('foodNutrients', [])}
-        def get_nut(name, default=0.0):
-            for key in nut_map:
-                if name in key:
-                    return nut_map[key].get('value', default)
-            return default
-        nutrients_fields = {
-            'calories': get_nut('energy', 0.0),
-            'protein': get_nut('protein', 0.0),
-            'fat': get_nut('fat', 0.0),
-            'carbs': get_nut('carbohydrate', 0.0),
-            'fiber': get_nut('fiber', 0.0),
-            'sugar': get_nut('sugar', 0.0),
-            'sodium': get_nut('sodium', 0.0),
-        }
-        return food_fields, nutrients_fields
+        return fdc.parse_food_payload(data)
 
     def _fetch_off_details(self, code):
-        resp = off.lookup_barcode(code)
+        resp = off.lookup_barcode_cached(code)
         if not resp or resp.get('status') != 1:
             raise ValueError('Product not found')
         product = resp.get('product', {})
@@ -227,9 +400,34 @@ class FoodViewSet(viewsets.ModelViewSet):
         return food_fields, nutrients_fields
 
 class NutrientsViewSet(viewsets.ModelViewSet):
+    """
+    /api/nutrients/: per-100g rows shared by every food and user that logged them, so
+    anyone signed in may read them but only staff may change them.
+    """
     queryset = Nutrients.objects.all()
     serializer_class = NutrientsSerializer
 
+    def get_permissions(self):
+        if self.request.method in SAFE_METHODS:
+            return [IsAuthenticated()]
+        return [IsAdminUser()]
+
+    def perform_update(self, serializer):
+        """
+        Logged entries keep the totals snapshotted when they were written. Pass
+        ?resnapshot=true to apply a correction to them (and their rollups) as well.
+        """
+        nutrients = serializer.save()
+        entries = MealEntry.objects.filter(food__nutrients=nutrients)
+        if self.request.query_params.get("resnapshot", "").lower() in ("1", "true", "yes"):
+            meals.resnapshot_entries(entries)
+        else:
+            meals.bump_data_version(entries.values("user"))  # per100 in meal lists
+
+    def perform_destroy(self, instance):
+        meals.invalidate_daily_totals(MealEntry.objects.filter(food__nutrients=instance))
+        instance.delete()
+
 class MealEntryViewSet(viewsets.ModelViewSet):
     queryset = MealEntry.objects.all()
     permission_classes = [IsAuthenticated]
@@ -246,17 +444,83 @@ class MealEntryViewSet(viewsets.ModelViewSet):
             start_utc, end_utc = _utc_window_for_local_day(date_str, tz_str)
             qs = qs.filter(meal_time__gte=start_utc, meal_time__lt=end_utc)  # half-open
 
+        if self._lean_read():
+            qs = qs.values(*MealEntryReadSerializer.VALUES)
         return qs
-        
 
+    def _lean_read(self):
+        # the browsable API renders its forms with a cloned POST request, which keeps the full serializer
+        return self.action in ("list", "retrieve") and self.request.method in ("GET", "HEAD")
+
+    def get_serializer_class(self):
+        return MealEntryReadSerializer if self._lean_read() else MealEntrySerializer
+
+    def _conditional(self, request, render):
+        """
+        Conditional GET keyed on the user's meal data version: a strong ETag per
+        (version, path, query, media type) plus Last-Modified. A matching
+        If-None-Match / If-Modified-Since gets a 304 after one version lookup,
+        without running the meal queries or serializing anything.
+        """
+        # read before the data: a racing write can only leave the tag older than the body, never newer
+        dv = meals.get_data_version(request.user)
+        variant = "|".join((
+            str(dv.version), request.path, urlencode(sorted(request.query_params.lists()), doseq=True),
+            request.accepted_media_type or "",
+        ))
+        etag = quote_etag(f"{request.user.pk}-{dv.version}-{hashlib.sha1(variant.encode()).hexdigest()[:16]}")
+        last_modified = int(dv.updated_at.timestamp())
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(MealEntryViewSet, self).list(request, *args, **kwargs))
+
+    @property
+    def paginator(self):
+        """?mode=cursor switches the list to keyset pagination (see MealHistoryPagination)."""
+        if not hasattr(self, "_paginator"):
+            if self.action == "list" and self.request.query_params.get("mode") == "cursor":
+                self._paginator = MealHistoryPagination()
+            else:
+                return super().paginator
+        return self._paginator
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        entry = serializer.save(user=self.request.user)
+        meals.apply_entry_changes(self.request.user, added=[meals.entry_snapshot(entry)])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        before = meals.entry_snapshot(instance)
+        food = serializer.validated_data.get("food", instance.food)
+        quantity = serializer.validated_data.get("quantity", instance.quantity)
+        # re-snapshot only when what was eaten changes; a time or notes edit keeps the logged totals
+        changed = (food.pk, quantity) != (instance.food_id, instance.quantity)
+        entry = serializer.save(**(MealEntry.totals_for(food, quantity) if changed else {}))
+        meals.apply_entry_changes(self.request.user, added=[meals.entry_snapshot(entry)], removed=[before])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        before = meals.entry_snapshot(instance)
+        instance.delete()
+        meals.apply_entry_changes(self.request.user, removed=[before])
 
     @action(detail=False, methods=["get"], url_path="summary")
     def summary(self, request):
         """
         GET /api/meals/summary?date=YYYY-MM-DD[&tz=Area/City]
-        Returns per-user totals for the given local calendar date.
+        Returns per-user totals for the given local calendar date, served from the
+        DailyTotals rollup (materialized on first read, maintained on every write).
         Units: calories=kcal, protein=g, carbs=g, fat=g, fiber=g, sugar=g, sodium=mg.
         """
         date_str = request.query_params.get("date")
@@ -265,48 +529,197 @@ class MealEntryViewSet(viewsets.ModelViewSet):
             # keep API strict; your client can always pass today's date
             raise ValidationError({"detail": "Invalid date format. Use YYYY-MM-DD."})
 
-        start_utc, end_utc = _utc_window_for_local_day(date_str, tz_name)
-
-        qs = (
-            self.get_queryset()
-            .filter(meal_time__gte=start_utc, meal_time__lt=end_utc)   # half-open window
-            .select_related("food__nutrients")
+        day, tz = _parse_local_day(date_str, tz_name)
+        return self._conditional(
+            request, lambda: Response(self._day_summary(request.user, day, tz, date_str, tz_name))
         )
 
-        totals = {
-            "calories": 0.0, "protein": 0.0, "carbs": 0.0,
-            "fat": 0.0, "fiber": 0.0, "sugar": 0.0, "sodium": 0.0,
-        }
+    def _day_summary(self, user, day, tz, date_str, tz_name):
+        row = meals.get_daily_totals(user, day, tz)
+        count = row.entries
+        totals = {k: getattr(row, k) for k in meals.NUTRIENT_FIELDS}
 
-        count = 0
-        for me in qs:
-            n = getattr(me.food, "nutrients", None)
-            if not n:
-                continue
-            count += 1
-            factor = float(me.quantity or 0.0) / 100.0  # grams -> per-100g scale
-
-            def add(field: str):
-                val = getattr(n, field, None)
-                if val is not None:
-                    totals[field] += float(val) * factor
-
-            for key in ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium"):
-                add(key)
-
-        # Optional rounding for display
-        rounded = {
-            k: (round(v, 0) if k in ("calories", "sodium") else round(v, 2))
-            for k, v in totals.items()
+        return {
+            "date": date_str,
+            "timezone": tz_name,
+            "entries": count,
+            "units": NUTRIENT_UNITS,
+            "totals": _rounded(totals),
         }
 
+    @action(detail=False, methods=["get"], url_path="trends")
+    def trends(self, request):
+        """
+        GET /api/meals/trends?start=YYYY-MM-DD&end=YYYY-MM-DD[&tz=Area/City][&granularity=day|week|month]
+        Per-bucket totals, days logged and the rolling 7-day average (over logged days,
+        as of the bucket's last day) for the local days start..end inclusive, computed
+        in a single query. Week buckets start on Monday; `start` is each bucket's first
+        day, which for the first week/month may precede the requested range.
+        """
+        tz_name = request.query_params.get("tz") or settings.TIME_ZONE
+        start, tz = _parse_local_day(request.query_params.get("start"), tz_name)
+        end, _ = _parse_local_day(request.query_params.get("end"), tz_name)
+        granularity = request.query_params.get("granularity") or "day"
+        if granularity not in meals.TREND_GRANULARITIES:
+            raise ValidationError({"detail": "granularity must be day, week or month."})
+        if end < start:
+            raise ValidationError({"detail": "end must not be before start."})
+        if (end - start).days >= settings.MEAL_TRENDS_MAX_DAYS:
+            raise ValidationError({"detail": f"At most {settings.MEAL_TRENDS_MAX_DAYS} days per request."})
+
+        def render():
+            buckets = meals.trends(request.user, start, end, tz, granularity)
+            return Response({
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "timezone": tz_name,
+                "granularity": granularity,
+                "units": NUTRIENT_UNITS,
+                "buckets": [
+                    {
+                        "start": b["bucket"].isoformat(),
+                        "days": b["days"],
+                        "days_logged": b["days_logged"],
+                        "entries": b["entries"],
+                        "totals": _rounded(b["totals"]),
+                        "avg7": _rounded(b["avg7"]),
+                    }
+                    for b in buckets
+                ],
+            })
+
+        return self._conditional(request, render)
+
+    @action(detail=False, methods=["post"], url_path="batch")
+    def batch(self, request):
+        """
+        POST /api/meals/batch/[?tz=Area/City]
+        Body: [{"food": id, "quantity": g, "meal_time": iso, "notes": ""}, ...] (or {"entries": [...]})
+        Validates every entry up front (one Food query for all ids), inserts them with a
+        single bulk_create in one transaction and returns the created rows plus the
+        summary of every local day they touched. All-or-nothing: any invalid entry
+        rejects the whole batch with per-index errors.
+        """
+        items = request.data.get("entries") if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"detail": "Provide a non-empty list of entries."})
+        if len(items) > settings.MEAL_BATCH_MAX:
+            raise ValidationError({"detail": f"At most {settings.MEAL_BATCH_MAX} entries per request."})
+
+        serializer = MealEntryBatchItemSerializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
+
+        foods = Food.objects.select_related("nutrients").in_bulk({r["food"] for r in rows})
+        errors = [
+            {} if r["food"] in foods else {"food": ['Invalid pk "%s" - object does not exist.' % r["food"]]}
+            for r in rows
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+
+        entries = [
+            MealEntry(user=request.user, food=foods[r["food"]], quantity=r["quantity"],
+                      meal_time=r["meal_time"], notes=r.get("notes"),
+                      **MealEntry.totals_for(foods[r["food"]], r["quantity"]))
+            for r in rows
+        ]
+        with transaction.atomic():
+            MealEntry.objects.bulk_create(entries)
+            meals.apply_entry_changes(request.user, added=[meals.entry_snapshot(e) for e in entries])
+
+        tz_name = request.query_params.get("tz") or settings.TIME_ZONE
+        tz = _parse_tz(tz_name)
+        days = sorted({e.meal_time.astimezone(tz).date() for e in entries})
         return Response({
-            "date": date_str,
+            "created": MealEntrySerializer(entries, many=True, context=self.get_serializer_context()).data,
+            "days": [self._day_summary(request.user, day, tz, day.isoformat(), tz_name) for day in days],
+        }, status=status.HTTP_201_CREATED)
+
+
+class GoalsViewSet(viewsets.GenericViewSet):
+    """Daily calorie and macro goals: the user's Profile, and intake measured against it."""
+    serializer_class = ProfileSerializer
+
+    @action(detail=False, methods=["get", "put", "patch"], url_path="profile")
+    def profile(self, request):
+        """
+        GET /api/goals/profile; PUT (or PATCH once it exists) with
+        {"weight_kg", "height_cm", "age", "sex", "activity_factor"}. Targets are
+        recomputed on save when any of those change.
+        """
+        instance = Profile.objects.filter(user=request.user).first()
+        if request.method == "GET":
+            if instance is None:
+                raise NotFound("No goals profile yet; PUT one to /api/goals/profile.")
+            return Response(self.get_serializer(instance).data)
+        serializer = self.get_serializer(
+            instance, data=request.data, partial=request.method == "PATCH" and instance is not None,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if instance is None else status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="progress")
+    def progress(self, request):
+        """
+        GET /api/goals/progress?start=YYYY-MM-DD&end=YYYY-MM-DD[&tz=Area/City]
+        For every local day start..end inclusive: calories and macros eaten vs. the
+        profile's stored targets, with each macro's AMDR band and whether intake is
+        below, within or above it. Two queries however long the range: the profile,
+        and the per-day totals (meals.trends).
+        """
+        tz_name = request.query_params.get("tz") or settings.TIME_ZONE
+        start, tz = _parse_local_day(request.query_params.get("start"), tz_name)
+        end, _ = _parse_local_day(request.query_params.get("end"), tz_name)
+        if end < start:
+            raise ValidationError({"detail": "end must not be before start."})
+        if (end - start).days >= settings.MEAL_TRENDS_MAX_DAYS:
+            raise ValidationError({"detail": f"At most {settings.MEAL_TRENDS_MAX_DAYS} days per request."})
+        profile = Profile.objects.filter(user=request.user).first()
+        if profile is None:
+            raise NotFound("No goals profile yet; PUT one to /api/goals/profile.")
+
+        days = [
+            {"date": b["bucket"].isoformat(), "entries": b["entries"], "totals": b["totals"]}
+            for b in meals.trends(request.user, start, end, tz, "day")
+        ]
+        return Response({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
             "timezone": tz_name,
-            "entries": count,
-            "units": {
-                "calories": "kcal", "protein": "g", "carbs": "g",
-                "fat": "g", "fiber": "g", "sugar": "g", "sodium": "mg",
-            },
-            "totals": rounded,
+            "units": {k: NUTRIENT_UNITS[k] for k in ("calories", *goals.MACROS)},
+            "targets": ProfileSerializer(profile).data["targets"],
+            "days": [
+                {
+                    **day,
+                    "calories": {k: round(v) for k, v in day["calories"].items()},
+                    "macros": {
+                        m: {k: round(v, 2) if k != "status" else v for k, v in band.items()}
+                        for m, band in day["macros"].items()
+                    },
+                }
+                for day in goals.progress(profile.targets, days)
+            ],
+        })
+
+
+class TrainerViewSet(viewsets.GenericViewSet):
+    """A trainer's view of their clients (TrainerClient rows where they are the trainer)."""
+
+    @action(detail=False, methods=["get"], url_path="clients/summary")
+    def clients_summary(self, request):
+        """
+        GET /api/trainer/clients/summary?date=YYYY-MM-DD[&tz=Area/City]
+        For every client: totals and entry count for that calendar date in the
+        client's own Profile.timezone (`tz`, else TIME_ZONE, for clients without one),
+        and when they last logged a meal. One grouped query for the whole roster.
+        """
+        tz_name = request.query_params.get("tz") or settings.TIME_ZONE
+        day, tz = _parse_local_day(request.query_params.get("date"), tz_name)
+        clients = meals.clients_summary(request.user, day, tz)
+        return Response({
+            "date": day.isoformat(),
+            "units": NUTRIENT_UNITS,
+            "clients": [{**c, "totals": _rounded(c["totals"])} for c in clients],
         })